@@ -7,15 +7,20 @@ and also servers as a hub for various common functions that
 are used in many of the cogs.
 """
 
+import asyncio
 import datetime
 import logging
 import os
+import re
 import sys
 from typing import Any
-from typing import Awaitable
 from typing import Dict
 from typing import List
+from typing import Match
 from typing import Optional
+from typing import Pattern
+from typing import TYPE_CHECKING
+from typing import Tuple
 from typing import Union
 
 import discord
@@ -28,12 +33,21 @@ from discord.ext import commands
 from discord.ext.commands import Context
 
 # Importing MrFreeze submodules
+from mrfreeze.database.executor import db_executor
+from mrfreeze.database.guild_settings import GuildSettings
+from mrfreeze.database.pool import pool
 from mrfreeze.database.settings import Settings
 from mrfreeze.lib import colors
 from mrfreeze.lib import dbfunctions
 from mrfreeze.lib import greeting
 from mrfreeze.lib import time
 from mrfreeze.lib.checks import MuteCheckFailure
+from mrfreeze.lib.member_resolver import MemberResolver
+from mrfreeze.lib.message_pipeline import MessagePipeline
+from mrfreeze.lib.mute_role_resolver import MuteRoleResolver
+
+if TYPE_CHECKING:
+    from mrfreeze.lib.banish.scheduler import UnbanishScheduler  # noqa: F401
 
 
 # Usage note!
@@ -48,6 +62,17 @@ from mrfreeze.lib.checks import MuteCheckFailure
 #     while not self.bot.is_closed():
 #         await asyncio.sleep(NUMBER)
 #         pass # Do stuff on loop
+#
+# Cogs should not listen for on_message themselves. Instead they register a
+# stage with the message pipeline, which gets the message's Context and the
+# server's settings, and isn't called for messages from bots:
+# bot.message_pipeline.register("name", self.stage)
+# async def stage(self, ctx, settings, matches):
+#     pass # Do stuff with ctx.message
+#
+# Stages which only care about messages matching a pattern should pass it when
+# registering, along with the characters the pattern can't match without.
+# They're then only called for matching messages, with the matches.
 
 
 class MrFreeze(commands.Bot):
@@ -60,14 +85,18 @@ class MrFreeze(commands.Bot):
         self.logger.debug("Setting up MrFreeze")
 
         # Dict in which to save all the background tasks.
-        self.bg_tasks: Dict[str, Awaitable] = dict()
+        self.bg_tasks: Dict[str, asyncio.Task] = dict()
+
+        # Unbanishes members when their mutes expire, set up by the banish cog.
+        self.unbanish_scheduler: Optional["UnbanishScheduler"] = None
+
+        # Looks up members in the gateway cache before asking the API.
+        self.member_resolver = MemberResolver()
 
         # Setting up imported functions so they can be accessed by all cogs
         self.logger.debug("Linking imported functions as own methods")
         self.extract_time = time.extract_time
         self.parse_timedelta = time.parse_timedelta
-        self.db_connect = dbfunctions.db_connect
-        self.db_create = dbfunctions.db_create
         self.db_time = dbfunctions.db_time
 
         # Check that the necessary directories exist and
@@ -80,7 +109,20 @@ class MrFreeze(commands.Bot):
         self.path_setup(self.servers_prefix, "Servers prefix")
 
         self.logger.debug("Instantiating Settings module")
-        self.settings = Settings()
+        self.settings = Settings(
+            write_behind=True,
+            legacy_mutes=f"{self.db_prefix}/mutes.db")
+
+        # Remembers the mute role of every server until its roles change.
+        self.mute_role_resolver = MuteRoleResolver(self.settings, self.logger)
+
+        # Every message goes through the pipeline, which starts with processing commands.
+        # Commands are processed even when muted, so the freezemute command still works.
+        self.prefix_pattern, self.prefix_triggers = self.compile_prefixes()
+        self.message_pipeline = MessagePipeline(self, self.logger)
+        self.message_pipeline.register(
+            "commands", self.invoke_commands, when_freeze_muted=True,
+            pattern=self.prefix_pattern, triggers=self.prefix_triggers)
 
         # Add the mute check
         self.logger.debug("Adding self mute check")
@@ -100,7 +142,37 @@ class MrFreeze(commands.Bot):
     def listener_block_check(self, message: Union[Message, Member, TextChannel]) -> bool:
         """Return True if non-private message and freeze is muted on this server."""
         server = message.guild
-        return bool(server and self.settings.is_freeze_muted(server))
+        return bool(server and self.settings.get_guild(server).freeze_muted)
+
+    async def on_message(self, message: Message) -> None:
+        """Run every message through the message pipeline, rather than just processing commands."""
+        await self.message_pipeline.dispatch(message)
+
+    async def invoke_commands(self, ctx: Context, settings: GuildSettings, matches: List[Match]) -> None:
+        """Invoke the command of a message, if it has one. This is a stage of the message pipeline."""
+        await self.invoke(ctx)
+
+    def compile_prefixes(self) -> Tuple[Optional[Pattern], str]:
+        """
+        Compile a pattern matching messages starting with a command prefix.
+
+        Also return the first characters of the prefixes, used to skip messages
+        that can't be commands. If the prefixes aren't fixed strings, for
+        example if they're given by a function, return None and every message
+        is treated as a possible command.
+        """
+        prefixes = self.command_prefix
+        if isinstance(prefixes, str):
+            prefixes = [ prefixes ]
+
+        if not isinstance(prefixes, (list, tuple)):
+            return None, ""
+        elif not all([ isinstance(prefix, str) and prefix for prefix in prefixes ]):
+            return None, ""
+
+        pattern = re.compile("^(?:" + "|".join([ re.escape(prefix) for prefix in prefixes ]) + ")")
+        triggers = "".join([ prefix[0] for prefix in prefixes ])
+        return pattern, triggers
 
     async def on_ready(self) -> None:
         """Set the bot up, print some greeting messages and stuff."""
@@ -122,6 +194,15 @@ class MrFreeze(commands.Bot):
         # Signal to the terminal that the bot is ready.
         self.logger.info(f"{colors.WHITE_B}READY WHEN YOU ARE CAP'N!{colors.RESET}")
 
+    async def close(self) -> None:
+        """Log out from Discord, flush pending settings, then close all the database connections."""
+        await super().close()
+        self.logger.info("Flushing pending settings changes")
+        self.settings.close()
+        self.logger.info("Closing database connections")
+        db_executor.shutdown()
+        pool.close_all()
+
     def path_setup(self, path: str, trivial_name: str) -> None:
         """Create various directories which the bot needs."""
         if os.path.isdir(path):
@@ -203,10 +284,19 @@ class MrFreeze(commands.Bot):
         If none is specified, try to find one called antarctica.
         If still none is found, return None.
         """
-        for role in guild.roles:
-            if role.name.lower() == "antarctica":
-                return role
-        return None
+        return self.mute_role_resolver.resolve(guild)
+
+    async def on_guild_role_create(self, role: Role) -> None:
+        """Forget the server's mute role, the new role might be called antarctica."""
+        self.mute_role_resolver.invalidate(role.guild)
+
+    async def on_guild_role_update(self, before: Role, after: Role) -> None:
+        """Forget the server's mute role, the updated role might have been renamed."""
+        self.mute_role_resolver.invalidate(after.guild)
+
+    async def on_guild_role_delete(self, role: Role) -> None:
+        """Forget the server's mute role, it might have been deleted."""
+        self.mute_role_resolver.invalidate(role.guild)
 
     def get_self_mute_time(self, guild: Guild) -> Optional[int]:
         """
@@ -8,6 +8,7 @@ they both use the antarctica mechanics.
 Therefor they're both in a cog separate from everything else.
 """
 
+import asyncio
 import logging
 from typing import Dict
 from typing import List
@@ -25,12 +26,11 @@ from mrfreeze.lib import checks
 from mrfreeze.lib import region
 from mrfreeze.lib.banish import banish
 from mrfreeze.lib.banish import banish_time
-from mrfreeze.lib.banish import mute_db
 from mrfreeze.lib.banish import templates as banish_templates
 from mrfreeze.lib.banish import time_settings
 from mrfreeze.lib.banish import unauthorized_banish
 from mrfreeze.lib.banish.roulette import roulette
-from mrfreeze.lib.banish.unbanish_loop import unbanish_loop
+from mrfreeze.lib.banish.scheduler import UnbanishScheduler
 
 mute_templates: banish_templates.TemplateEngine
 template_engine = banish_templates.TemplateEngine()
@@ -63,23 +63,32 @@ class BanishAndRegion(Cog):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.default_mute_interval = 5
         self.default_self_mute_time = 20
+        self.template_reload_interval = 10
 
         self.coginfo = CogInfo(self)
 
-        mute_db.create_table(self.bot)
+        self.bot.unbanish_scheduler = UnbanishScheduler(
+            self.bot, self.logger, default_retry_interval=self.default_mute_interval)
 
     @Cog.listener()
     async def on_ready(self) -> None:
         """
         Once ready, do some setup for all servers.
 
-        This is mostly stuff pertaining to banishes and regions, such as setting up the periodic
-        unbanish and indexing all the servers' regional roles.
+        This is mostly stuff pertaining to banishes and regions, such as starting the
+        unbanish scheduler and indexing all the servers' regional roles.
         """
-        for server in self.bot.guilds:
-            # Add unbanish loop to bot
-            self.bot.add_bg_task(unbanish_loop(server, self.coginfo), f'unbanish@{server.id}')
+        # on_ready is sent again after reconnecting, only start the background tasks once.
+        scheduler = self.bot.unbanish_scheduler
+        scheduler_task = self.bot.bg_tasks.get("unbanish")
+        if scheduler is not None and (scheduler_task is None or scheduler_task.done()):
+            self.bot.add_bg_task(scheduler.run(), "unbanish")
+
+        template_task = self.bot.bg_tasks.get("banish_templates")
+        if template_task is None or template_task.done():
+            self.bot.add_bg_task(self.reload_templates(), "banish_templates")
 
+        for server in self.bot.guilds:
             # Construct region dict
             self.regions[server.id] = dict()
             for region_name in region.regional_aliases.keys():
@@ -89,6 +98,12 @@ class BanishAndRegion(Cog):
                 else:
                     self.regions[server.id][region_name] = None
 
+    async def reload_templates(self) -> None:
+        """Periodically check if the banish template files have changed, and reload them if so."""
+        while not self.bot.is_closed():
+            await asyncio.sleep(self.template_reload_interval)
+            template_engine.reload_if_changed()
+
     @command(name=banish_interval_command, aliases=banish_interval_aliases)
     @discord.ext.commands.check(checks.is_owner_or_mod)
     async def _banishinterval(self, ctx: Context, interval: Optional[int]) -> None:
@@ -1,10 +1,13 @@
 """Cog for logging all issued commands."""
 import logging
+from typing import List
+from typing import Match
 
-from discord import Message
 from discord.ext.commands import Cog
+from discord.ext.commands import Context
 
 from mrfreeze.bot import MrFreeze
+from mrfreeze.database.guild_settings import GuildSettings
 from mrfreeze.lib import colors
 
 
@@ -21,13 +24,18 @@ class CommandLogger(Cog):
         self.bot = bot
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    @Cog.listener()
-    async def on_message(self, message: Message) -> None:
-        """Check if a message is a command, and log if it is."""
-        if message.author.bot:
-            return
+        # Commands are logged even if MrFreeze is muted, just like they're processed.
+        self.bot.message_pipeline.register(
+            "command_log", self.log_command, when_freeze_muted=True,
+            pattern=self.bot.prefix_pattern, triggers=self.bot.prefix_triggers)
+
+    def cog_unload(self) -> None:
+        """Stop logging commands when the cog is unloaded."""
+        self.bot.message_pipeline.unregister("command_log")
 
-        ctx = await self.bot.get_context(message)
+    async def log_command(self, ctx: Context, settings: GuildSettings, matches: List[Match]) -> None:
+        """Check if a message is a command, and log if it is."""
+        message = ctx.message
         if ctx.command is not None:
             author = message.author
             name = f"{colors.YELLOW}{author.name}#{author.discriminator}"
@@ -6,6 +6,7 @@ other tools can only by run by the bot owner.
 """
 
 import logging
+from typing import Optional
 
 import discord
 from discord.ext import commands
@@ -13,6 +14,7 @@ from discord.ext.commands import Cog
 from discord.ext.commands import Context
 
 from mrfreeze.bot import MrFreeze
+from mrfreeze.lib.checks import is_owner
 from mrfreeze.lib.checks import is_owner_or_mod
 
 
@@ -96,3 +98,19 @@ class DevTools(Cog):
 
         if msg:
             await ctx.send(msg)
+
+    @commands.command(name="pipeline", aliases=["stages"])
+    @commands.check(is_owner)
+    async def pipeline_timings(self, ctx: Context, stage: Optional[str] = None) -> None:
+        """Show how long the stages of the message pipeline have taken."""
+        pipeline = self.bot.message_pipeline
+        lines = pipeline.report(stage)
+
+        if lines:
+            report = "\n".join(lines)
+            msg = f"{ctx.author.mention} {pipeline.messages} messages have been handled by the pipeline."
+            msg += f"\n```\n{report}\n```"
+        else:
+            msg = f"{ctx.author.mention} There's no stage called {stage}."
+
+        await ctx.send(msg)
@@ -1,21 +1,26 @@
 """Cog for handling ink lookups via thisisverytricky's ink API."""
 import logging
 import re
+from typing import Any
+from typing import Dict
 from typing import List
+from typing import Match
 from typing import Optional
 from typing import Pattern
 from typing import Set
 
 import discord
-from discord import Message
-from discord import TextChannel
 from discord.ext.commands import Cog
 from discord.ext.commands import Context
+from discord.ext.commands import check
 from discord.ext.commands import command
 
 from mrfreeze.bot import MrFreeze
-
-import requests
+from mrfreeze.database.guild_settings import GuildSettings
+from mrfreeze.lib.checks import is_owner
+from mrfreeze.lib.ink_client import InkClient
+from mrfreeze.lib.ink_client import InkLookupError
+from mrfreeze.lib.ttl_cache import TTLCache
 
 
 def setup(bot: MrFreeze) -> None:
@@ -45,6 +50,12 @@ class Ink:
 class Inkcyclopedia(Cog):
     """Type an ink inside {curly brackets} and I'll tell you what it looks like."""
 
+    # How long, in seconds, found inks and inks that weren't found are cached.
+    found_ttl = 6 * 60 * 60
+    not_found_ttl = 5 * 60
+    # Most inks looked up for a single message.
+    max_queries = 5
+
     def __init__(self, bot: MrFreeze) -> None:
         self.bot: MrFreeze = bot
         self.inkydb: Set[Ink] = set()
@@ -52,17 +63,22 @@ class Inkcyclopedia(Cog):
         self.bracketmatch: Pattern = re.compile(r"[{]([\w\-\s]+)[}]")
 
         self.logger = logging.getLogger(self.__class__.__name__)
-
-    async def search_inks(self, inks: List[str]) -> List[Ink]:
-        """Search for the listed inks in the Inkcyclopedia, return a list of inks."""
-        try:
-            response = requests.post(f"{self.url}/search", json=inks).json()["found"]
-        except Exception:
-            return []
-
-        result: List[Ink] = list()
-        for ink in response:
-            body = response[ink]
+        self.client = InkClient(f"{self.url}/search", self.logger)
+        # Normalised query -> ready-built embed, or None if the ink wasn't found.
+        self.cache = TTLCache(maxsize=512)
+        self.bot.message_pipeline.register(
+            "inkcyclopedia", self.find_inks, pattern=self.bracketmatch, triggers="{")
+
+    def cog_unload(self) -> None:
+        """Stop looking for inks when the cog is unloaded, and close the connections to the API."""
+        self.bot.message_pipeline.unregister("inkcyclopedia")
+        self.bot.loop.create_task(self.client.close())
+
+    def parse_inks(self, response: Dict[str, Any]) -> Dict[str, Ink]:
+        """Read the inks found by a search, keyed by the name they were found under."""
+        result: Dict[str, Ink] = dict()
+        for key in response:
+            body = response[key]
 
             if "fullName" in body and "primaryImage" in body:
                 ink = Ink()
@@ -77,10 +93,107 @@ class Inkcyclopedia(Cog):
                     ink.alternates = alternates
 
                 if ink.name and ink.url:
-                    result.append(ink)
+                    result[key] = ink
 
         return result
 
+    @staticmethod
+    def normalise(query: str) -> str:
+        """Normalise an ink query, so the same ink is always cached under the same key."""
+        return " ".join(query.lower().split())
+
+    async def lookup(self, queries: List[str]) -> Dict[str, Optional[discord.Embed]]:
+        """
+        Get the embeds for a number of inks, keyed by normalised query, None if not found.
+
+        Inks which are cached are answered from the cache, the rest are looked
+        up together in a single search. Found inks are cached for hours and
+        inks that weren't found for a few minutes, failed searches aren't
+        cached at all. If the search fails, such as while the circuit breaker
+        is open, expired results are used.
+        """
+        embeds: Dict[str, Optional[discord.Embed]] = dict()
+        misses: Dict[str, str] = dict()
+        for query in queries:
+            key = self.normalise(query)
+            if key in embeds or key in misses:
+                continue
+
+            entry = self.cache.get(key)
+            if entry is not None:
+                embeds[key] = entry.value
+            else:
+                misses[key] = query
+
+        if not misses:
+            return embeds
+
+        try:
+            inks = self.parse_inks(await self.client.search(list(misses.values())))
+        except InkLookupError:
+            for key in misses:
+                stale = self.cache.get_stale(key)
+                embeds[key] = stale.value if stale is not None else None
+            return embeds
+
+        # Found inks are matched back to the query that was sent for them,
+        # by the key they were found under or failing that by their name.
+        # When only one ink was searched for whatever was found belongs to it.
+        sent = { query: key for key, query in misses.items() }
+        found: Dict[str, discord.Embed] = dict()
+        unmatched = 0
+        for name, ink in inks.items():
+            if len(misses) == 1:
+                key = next(iter(misses))
+            elif name in sent:
+                key = sent[name]
+            elif self.normalise(name) in misses:
+                key = self.normalise(name)
+            elif ink.name is not None and self.normalise(ink.name) in misses:
+                key = self.normalise(ink.name)
+            else:
+                unmatched += 1
+                continue
+
+            if key not in found:
+                found[key] = self.build_embed(ink)
+
+        if unmatched:
+            self.logger.warning(f"Couldn't match {unmatched} found inks to the inks searched for.")
+
+        for key in misses:
+            embed = found.get(key)
+            if embed is not None:
+                self.cache.set(key, embed, self.found_ttl)
+            elif not unmatched:
+                # Only cache inks as not found if we're sure that they weren't.
+                self.cache.set(key, None, self.not_found_ttl)
+            embeds[key] = embed
+
+        return embeds
+
+    def build_embed(self, ink: Ink) -> discord.Embed:
+        """Build the embed showing an ink."""
+        image = discord.Embed()
+        image.title = ink.name
+        image.set_image(url=ink.url)
+        image.description = f"[Primary image link]({ink.url})"
+
+        if ink.alternates:
+            alternateUrls = [f"[[{index}]]({url})" for index, url in enumerate(ink.alternates)]
+            alternativeImageLinks = " ".join(alternateUrls)
+            image.add_field(name="Additional images", value=alternativeImageLinks)
+
+        if ink.review:
+            image.add_field(name="Review", value=ink.review)
+
+        if ink.submitter:
+            image.set_footer(text=f"Submitted by: {ink.submitter}")
+        else:
+            image.set_footer(text="Submitter unknown")
+
+        return image
+
     def get_mute_status(self, ctx: Context, is_muted: bool) -> str:
         """Check if inkcyclopedia is enabled for this server."""
         invocation = ctx.invoked_with
@@ -132,7 +245,7 @@ class Inkcyclopedia(Cog):
 
         elif args[0].lower() == "on" or args[0].lower() == "enable":
             if is_muted:
-                self.bot.settings.toggle_inkcyclopedia_mute(ctx.guild)
+                await self.bot.settings.toggle_inkcyclopedia_mute_async(ctx.guild)
                 is_muted_after = bool(self.bot.settings.is_inkcyclopedia_muted(ctx.guild))
                 msg = self.get_changed_status(ctx, is_muted, is_muted_after, False)
             else:
@@ -142,12 +255,12 @@ class Inkcyclopedia(Cog):
             if is_muted:
                 msg = self.get_changed_status(ctx, is_muted, is_muted, True)
             else:
-                self.bot.settings.toggle_inkcyclopedia_mute(ctx.guild)
+                await self.bot.settings.toggle_inkcyclopedia_mute_async(ctx.guild)
                 is_muted_after = bool(self.bot.settings.is_inkcyclopedia_muted(ctx.guild))
                 msg = self.get_changed_status(ctx, is_muted, is_muted_after, True)
 
         elif args[0].lower() == "toggle":
-            self.bot.settings.toggle_inkcyclopedia_mute(ctx.guild)
+            await self.bot.settings.toggle_inkcyclopedia_mute_async(ctx.guild)
             is_muted_after = bool(self.bot.settings.is_inkcyclopedia_muted(ctx.guild))
             msg = self.get_changed_status(ctx, is_muted, is_muted_after, not is_muted)
 
@@ -157,53 +270,36 @@ class Inkcyclopedia(Cog):
         if msg:
             await ctx.send(msg)
 
-    @Cog.listener()
-    async def on_message(self, message: Message) -> None:
+    async def find_inks(self, ctx: Context, settings: GuildSettings, matches: List[Match]) -> None:
         """Read every message, detect requests for ink pictures."""
-        if message.author.bot:
-            return
-
-        elif self.bot.listener_block_check(message):
-            return  # MrFreeze is muted in this server.
-
-        elif message.guild and self.bot.settings.is_inkcyclopedia_muted(message.guild):
+        message = ctx.message
+        if settings.inkcyclopedia_muted:
             return  # Inkcyclopedia disabled for this server.
 
-        elif message.guild:
-            muted: Optional[bool] = self.bot.settings.is_inkcyclopedia_muted(message.guild)
-
-            ink_channel: TextChannel = self.bot.settings.get_inkcyclopedia_channel(message.guild)
-            wrong_channel = ink_channel and ink_channel != message.channel.id
-
-            if muted or wrong_channel:
-                return
-
-        matches: List[str] = self.bracketmatch.findall(message.content)
-
-        # Stop the function if message was sent by a bot or contains no matches
-        if not matches:
+        ink_channel: Optional[int] = settings.inkcyclopedia_channel
+        if ink_channel and ink_channel != message.channel.id:
             return
 
-        results: List[Ink] = await self.search_inks(matches)
-
-        if results:
-            ink = results[0]
-            image = discord.Embed()
-            image.title = ink.name
-            image.set_image(url=ink.url)
-            image.description = f"[Primary image link]({ink.url})"
-
-            if ink.alternates:
-                alternateUrls = [f"[[{index}]]({url})" for index, url in enumerate(ink.alternates)]
-                alternativeImageLinks = " ".join(alternateUrls)
-                image.add_field(name="Additional images", value=alternativeImageLinks)
-
-            if ink.review:
-                image.add_field(name="Review", value=ink.review)
-
-            if ink.submitter:
-                image.set_footer(text=f"Submitted by: {ink.submitter}")
-            else:
-                image.set_footer(text="Submitter unknown")
-
-            await message.channel.send(embed=image)
+        # The message pipeline only calls this when there are matches.
+        # Each ink is only looked up once, and the first one found is shown.
+        queries: Dict[str, str] = dict()
+        for match in matches:
+            queries.setdefault(self.normalise(match.group(1)), match.group(1))
+        keys: List[str] = list(queries)[:self.max_queries]
+
+        embeds = await self.lookup([ queries[key] for key in keys ])
+        found = [ embeds[key] for key in keys if embeds.get(key) is not None ]
+        if found:
+            await message.channel.send(embed=found[0])
+
+    @command(name="inkcache")
+    @check(is_owner)
+    async def inkcache_command(self, ctx: Context, *args: str) -> None:
+        """Show how well the ink lookup cache works, or clear it with clear."""
+        if args and args[0].lower() == "clear":
+            self.cache.clear()
+
+        msg = f"{ctx.author.mention} Ink lookups:\n```\n"
+        msg += f"Cache: {self.cache}\n"
+        msg += f"Circuit breaker: {self.client.breaker}\n```"
+        await ctx.send(msg)
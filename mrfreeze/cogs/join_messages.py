@@ -52,7 +52,7 @@ class JoinMessages(Cog):
     @commands.check(checks.is_owner_or_mod)
     async def set_welcome_message(self, ctx: Context) -> None:
         """Change the welcome message for the server."""
-        msg = welcome_messages.set_message(ctx, self.bot)
+        msg = await welcome_messages.set_message(ctx, self.bot)
         await ctx.send(msg)
 
     @commands.command(name="getwelcome", aliases=[ "getwelcomemessage", "getwelcomemsg" ])
@@ -66,7 +66,7 @@ class JoinMessages(Cog):
     @commands.check(checks.is_owner_or_mod)
     async def unset_welcome(self, ctx: Context) -> None:
         """Change the welcome message for the server to use bot default."""
-        msg = welcome_messages.unset_message(ctx, self.bot)
+        msg = await welcome_messages.unset_message(ctx, self.bot)
         await ctx.send(msg)
 
     @commands.command(name="simulatewelcome", aliases=[ "simwelcome", "testwelcome" ])
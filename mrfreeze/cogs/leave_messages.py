@@ -48,7 +48,7 @@ class LeaveMessages(Cog):
     @commands.check(checks.is_owner_or_mod)
     async def set_leave_message(self, ctx: Context) -> None:
         """Change the leave message for the server."""
-        msg = leave_messages.set_message(ctx, self.bot)
+        msg = await leave_messages.set_message(ctx, self.bot)
         await ctx.send(msg)
 
     @commands.command(name="getleave", aliases=[ "getleavemessage", "getleavemsg" ])
@@ -62,7 +62,7 @@ class LeaveMessages(Cog):
     @commands.check(checks.is_owner_or_mod)
     async def unset_leave(self, ctx: Context) -> None:
         """Change the leave message for the server to use bot default."""
-        msg = leave_messages.unset_message(ctx, self.bot)
+        msg = await leave_messages.unset_message(ctx, self.bot)
         await ctx.send(msg)
 
     @commands.command(name="simulateleave", aliases=[ "simleave", "testleave" ])
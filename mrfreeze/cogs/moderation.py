@@ -85,7 +85,7 @@ class Moderation(Cog):
             return
 
         # Toggle mute
-        self.bot.settings.toggle_freeze_mute(ctx.guild)
+        await self.bot.settings.toggle_freeze_mute_async(ctx.guild)
 
         # Check if freeze is now muted and respond accordingly
         is_muted = self.bot.settings.is_freeze_muted(ctx.guild)
@@ -106,7 +106,7 @@ class Moderation(Cog):
         new_channel = "something"
 
         old_cid = self.bot.settings.get_trash_channel(ctx.guild)
-        result = self.bot.settings.set_trash_channel(channel)
+        result = await self.bot.settings.set_trash_channel_async(channel)
         new_cid = self.bot.settings.get_trash_channel(ctx.guild)
 
         try:
@@ -135,7 +135,7 @@ class Moderation(Cog):
         new_channel = "something"
 
         old_cid = self.bot.settings.get_mute_channel(ctx.guild)
-        result = self.bot.settings.set_mute_channel(channel)
+        result = await self.bot.settings.set_mute_channel_async(channel)
         new_cid = self.bot.settings.get_mute_channel(ctx.guild)
 
         try:
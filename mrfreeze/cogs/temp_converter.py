@@ -1,16 +1,24 @@
 """Listener that detects and converts temperature statements."""
 
 import re
+import string
 from enum import Enum
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Match
 from typing import Optional
+from typing import Sequence
+from typing import Tuple
 
-import discord
 from discord import Message
 from discord.ext.commands import Cog
 from discord.ext.commands import Context
 from discord.ext.commands import command
 
 from mrfreeze.bot import MrFreeze
+from mrfreeze.database.guild_settings import GuildSettings
+from mrfreeze.lib import assets
 
 
 class TempUnit(Enum):
@@ -22,6 +30,40 @@ class TempUnit(Enum):
     R = "°R"
 
 
+# Every conversion between the units is linear, so a temperature is converted
+# from one unit to another as temperature * scale + offset. The scale and offset
+# of every pair of units is computed once, going through celsius.
+to_celsius = {
+    TempUnit.C: (1.0, 0.0),
+    TempUnit.K: (1.0, -273.15),
+    TempUnit.F: (5.0 / 9.0, -32 * 5.0 / 9.0),
+    TempUnit.R: (5.0 / 9.0, -273.15),
+}
+from_celsius = {
+    TempUnit.C: (1.0, 0.0),
+    TempUnit.K: (1.0, 273.15),
+    TempUnit.F: (9.0 / 5.0, 32.0),
+    TempUnit.R: (9.0 / 5.0, 273.15 * 9.0 / 5.0),
+}
+
+
+def conversion_factors(origin: TempUnit, destination: TempUnit) -> Tuple[float, float]:
+    """Get the scale and offset for converting from origin to destination."""
+    if origin == destination:
+        return (1.0, 0.0)
+
+    to_scale, to_offset = to_celsius[origin]
+    from_scale, from_offset = from_celsius[destination]
+    return (to_scale * from_scale, to_offset * from_scale + from_offset)
+
+
+conversions = {
+    (origin, destination): conversion_factors(origin, destination)
+    for origin in TempUnit
+    for destination in TempUnit
+}
+
+
 class ParsedTemperature:
     """Class for holding the parsed temperature."""
 
@@ -46,66 +88,58 @@ class ParsedTemperature:
 
     def convert(self, dest: Optional[TempUnit] = None) -> float:
         """Convert from origin type to destination type."""
-        origin = self.origin
-        if origin == TempUnit.C or origin == TempUnit.K:
-            return self.from_celsius(dest=dest)
-        else:
-            return self.from_fahrenheit(dest=dest)
-
-    def from_celsius(self, dest: Optional[TempUnit] = None) -> float:
-        """Convert from celsius to other units."""
-        temperature = self.temperature
-        if self.origin == TempUnit.K:
-            temperature -= 273.15
-
         if dest is None:
             dest = self.destination
 
-        if dest == TempUnit.C:
-            return temperature
-        elif dest == TempUnit.F:
-            return temperature * 9.0 / 5.0 + 32
-        elif dest == TempUnit.K:
-            return temperature + 273.15
-        else:  # Has to be rankine
-            return (temperature + 273.15) * 9.0 / 5.0
-
-    def from_fahrenheit(self, dest: Optional[TempUnit] = None) -> float:
-        """Convert from fahrenheit to other units."""
-        temperature = self.temperature
-        if self.origin == TempUnit.R:
-            temperature -= 459.67
+        scale, offset = conversions[(self.origin, dest)]
+        return self.temperature * scale + offset
 
-        if dest is None:
-            dest = self.destination
+    @staticmethod
+    def convert_batch(batch: Sequence["ParsedTemperature"]) -> List[float]:
+        """
+        Convert every temperature in the batch to its destination unit.
+
+        Temperatures are grouped by origin and destination, so the factors
+        of each pair of units are looked up once and applied to the group.
+        """
+        groups: Dict[Tuple[TempUnit, TempUnit], List[int]] = dict()
+        for position, parsed in enumerate(batch):
+            groups.setdefault((parsed.origin, parsed.destination), list()).append(position)
+
+        converted = [ 0.0 ] * len(batch)
+        for units, positions in groups.items():
+            scale, offset = conversions[units]
+            for position in positions:
+                converted[position] = batch[position].temperature * scale + offset
 
-        if dest == TempUnit.C:
-            return (temperature - 32) * 5.0 / 9.0
-        elif dest == TempUnit.F:
-            return temperature
-        elif dest == TempUnit.K:
-            return (temperature + 459.67) * 5.0 / 9.0
-        else:  # Has to be rankine
-            return temperature + 459.67
+        return converted
 
 
 # Space or ° mandatory for kelvin to avoid
 # collision with k as in thousand.
 numbers = r"(?:^|\s)-?(?:[1-9]\d+|\d)(?:[,.]\d+)? ?"
 celsius = r"°?(?:c|cel|celcius|celsius|civili[sz]ed units?)"
-fahrenheit = r"°?(?:fah|fahrenheit|freedom units?)"
+fahrenheit = r"°?(?:f|fah|fahrenheit|freedom units?)"
 kelvin = r"(?:k|kelvin)"
 rankine = r"°?(?:r|rankine)"
+# Degrees are celsius or fahrenheit depending on the roles of the author.
+degrees = r"(?:deg|degrees?)"
 statement_regex = f"({numbers})(?:({celsius})|({fahrenheit})"
-statement_regex += fr"|([ °]{kelvin})|({rankine}))(?:\s|$)"
+statement_regex += fr"|([ °]{kelvin})|({rankine})|({degrees}))(?=\s|$)"
 
 # Regex for finding forced conversions
 force_convert_begin = fr"(?:(?:{numbers}) ?(?:{celsius}|{fahrenheit}|"
-force_convert_begin += fr"[ °]{kelvin}|{rankine})) (?:for|in|as"
+force_convert_begin += fr"[ °]{kelvin}|{rankine}|{degrees})) (?:for|in|as"
 force_convert_begin += r"|(?:convert )?to|convert)"
 find_force_convert = fr"{force_convert_begin} (?:({celsius})|({fahrenheit})"
 find_force_convert += fr"|(°?{kelvin})|({rankine}))(?:\s|$)"
 
+# Compiled once, the statement pattern is run by the message pipeline's content scanner.
+# The whitespace after a statement is only looked ahead at, so it can also be the
+# whitespace before the next one when all statements of a message are found.
+statement_pattern = re.compile(statement_regex, re.IGNORECASE)
+force_convert_pattern = re.compile(find_force_convert, re.IGNORECASE)
+
 
 def setup(bot: MrFreeze) -> None:
     """Add the cog to the bot."""
@@ -115,9 +149,24 @@ def setup(bot: MrFreeze) -> None:
 class TemperatureConverter(Cog):
     """Listener that detects and converts temperature statements."""
 
+    # Most statements converted in a single reply.
+    batch_limit = 10
+
     def __init__(self, bot: MrFreeze) -> None:
         """Initialize the cog."""
         self.bot = bot
+        self.bot.message_pipeline.register(
+            "temp_converter", self.convert_temperatures,
+            pattern=statement_pattern, triggers=string.digits)
+
+    def cog_unload(self) -> None:
+        """Stop converting temperatures when the cog is unloaded."""
+        self.bot.message_pipeline.unregister("temp_converter")
+
+    @staticmethod
+    def within_range(statement: ParsedTemperature) -> bool:
+        """Check if temperature is within acceptable limits, without replying."""
+        return abs(statement.temperature) < 100000
 
     async def is_number_within_range(self, msg: Message, statement: ParsedTemperature) -> bool:
         """
@@ -125,7 +174,7 @@ class TemperatureConverter(Cog):
 
         Return True if it is, return False and send a reply if not.
         """
-        if abs(statement.temperature) >= 100000:
+        if not self.within_range(statement):
             hotcold = "a bit chilly"
             image_path = "images/hellacold.gif"
 
@@ -133,8 +182,9 @@ class TemperatureConverter(Cog):
                 hotcold = "quite warm"
                 image_path = "images/helldog.gif"
 
-            reply = f"{msg.author.mention} That's {hotcold}."
-            await msg.channel.send(reply, file=discord.File(image_path))
+            reply = f"{msg.author.mention} No matter what unit you put that in "
+            reply += f"the answer is still gonna be \"{hotcold}\"."
+            await msg.channel.send(reply, file=assets.registry.file(image_path))
             return False
 
         return True
@@ -190,7 +240,7 @@ class TemperatureConverter(Cog):
 
         elif args[0].lower() == "on":
             if is_muted:
-                self.bot.settings.toggle_tempconverter_mute(ctx.guild)
+                await self.bot.settings.toggle_tempconverter_mute_async(ctx.guild)
                 is_muted_after = bool(self.bot.settings.is_tempconverter_muted(ctx.guild))
                 msg = self.get_changed_status(ctx, is_muted, is_muted_after, False)
             else:
@@ -200,12 +250,12 @@ class TemperatureConverter(Cog):
             if is_muted:
                 msg = self.get_changed_status(ctx, is_muted, is_muted, True)
             else:
-                self.bot.settings.toggle_tempconverter_mute(ctx.guild)
+                await self.bot.settings.toggle_tempconverter_mute_async(ctx.guild)
                 is_muted_after = bool(self.bot.settings.is_tempconverter_muted(ctx.guild))
                 msg = self.get_changed_status(ctx, is_muted, is_muted_after, True)
 
         elif args[0].lower() == "toggle":
-            self.bot.settings.toggle_tempconverter_mute(ctx.guild)
+            await self.bot.settings.toggle_tempconverter_mute_async(ctx.guild)
             is_muted_after = bool(self.bot.settings.is_tempconverter_muted(ctx.guild))
             msg = self.get_changed_status(ctx, is_muted, is_muted_after, not is_muted)
 
@@ -215,37 +265,47 @@ class TemperatureConverter(Cog):
         if msg:
             await ctx.send(msg)
 
-    @Cog.listener()
-    async def on_message(self, message: Message) -> None:
-        """Look through all messages received for temperature statements."""
-        if message.author.bot or self.bot.listener_block_check(message):
+    async def convert_temperatures(self, ctx: Context, settings: GuildSettings, matches: List[Match]) -> None:
+        """Convert every temperature statement in a message, replying to all of them at once."""
+        if settings.tempconverter_muted:
             return
 
-        if message.guild and self.bot.settings.is_tempconverter_muted(message.guild):
-            return
-
-        ctx = await self.bot.get_context(message)
-        author = ctx.author.mention
-        channel = ctx.channel
+        # The content scanner has already found every statement in the message.
+        if not matches:
+            matches = list(statement_pattern.finditer(ctx.message.content))
 
         # Abort if no temperature statement was found.
-        parsed = self.parse_request(ctx)
-        if not parsed:
+        batch = self.parse_batch(ctx, matches)
+        if not batch:
             return
 
-        # Check if input is ridiculously high/low.
-        if not await self.is_number_within_range(message, parsed):
+        # Skip inputs that are ridiculously high/low, only replying
+        # to them if there's nothing else in the message to convert.
+        in_range = [ parsed for parsed in batch if self.within_range(parsed) ]
+        if not in_range:
+            await self.is_number_within_range(ctx.message, batch[0])
             return
+        batch = in_range
 
-        old_temp = round(parsed.temperature, 2)
-        new_temp = round(parsed.convert(), 2)
+        converted = ParsedTemperature.convert_batch(batch)
+        replies = [
+            self.format_conversion(ctx, parsed, new_temp)
+            for parsed, new_temp in zip(batch, converted)
+        ]
 
-        # hot/cold thresholds are defined in celsius
+        # hot/cold thresholds are defined in celsius,
+        # the most extreme temperature decides the image.
         image = None
-        if parsed.in_c >= 35:
-            image = discord.File("images/helldog.gif")
-        elif parsed.in_c <= -20:
-            image = discord.File("images/hellacold.gif")
+        if max([ parsed.in_c for parsed in batch ]) >= 35:
+            image = assets.registry.file("images/helldog.gif")
+        elif min([ parsed.in_c for parsed in batch ]) <= -20:
+            image = assets.registry.file("images/hellacold.gif")
+
+        await ctx.channel.send("\n".join(replies), file=image)
+
+    def format_conversion(self, ctx: Context, parsed: ParsedTemperature, new_temp: float) -> str:
+        """Write the reply for a single converted temperature."""
+        author = ctx.author.mention
 
         # old/new_temp contains the temperature values as floats.
         old_temp = round(parsed.temperature, 2)
@@ -257,7 +317,6 @@ class TemperatureConverter(Cog):
         origin = parsed.origin.value
         destination = parsed.destination.value
 
-        # Time for the reply.
         if no_change:
             if same_unit and parsed.manual:
                 reply = f"Did {author} just try to convert {old_temp}"
@@ -270,12 +329,63 @@ class TemperatureConverter(Cog):
                 reply += f"{new_temp}{destination}! WOOOW!"
         else:
             reply = f"{old_temp}{origin} is around {new_temp}{destination}"
-        await channel.send(reply, file=image)
 
-    def parse_request(self, ctx: Context) -> Optional[ParsedTemperature]:
+        return reply
+
+    def parse_batch(self, ctx: Context, matches: Iterable[Match]) -> List[ParsedTemperature]:
+        """
+        Parse every temperature statement found in a message.
+
+        Statements repeated in the same message are only converted once, and
+        at most batch_limit statements are converted to keep replies short.
+        """
+        batch: List[ParsedTemperature] = list()
+        seen = set()
+
+        for match in matches:
+            parsed = self.parse_request(ctx, match)
+            if parsed is None:
+                continue
+
+            key = (parsed.temperature, parsed.origin, parsed.destination)
+            if key in seen:
+                continue
+
+            seen.add(key)
+            batch.append(parsed)
+            if len(batch) >= self.batch_limit:
+                break
+
+        return batch
+
+    def degrees_unit(self, ctx: Context) -> TempUnit:
+        """
+        Decide if degrees are celsius or fahrenheit, going by the roles of the author.
+
+        Celsius and Fahrenheit roles decide it outright, otherwise North Americans
+        use fahrenheit unless they're from Canada or Mexico. Degrees are always
+        celsius in DMs, where the author has no roles.
+        """
+        if ctx.guild is None:
+            return TempUnit.C
+
+        roles = { role.name.lower() for role in ctx.author.roles }
+        if "celsius" in roles:
+            return TempUnit.C
+        elif "fahrenheit" in roles:
+            return TempUnit.F
+        elif "north america" in roles and not roles & { "canada", "mexico" }:
+            return TempUnit.F
+        return TempUnit.C
+
+    def parse_request(self, ctx: Context, statement_match: Optional[Match] = None) -> Optional[ParsedTemperature]:
         """
         Extract temperature statement from text.
 
+        If the statement has already been found, such as by the content
+        scanner, its match can be passed in to avoid searching for it again.
+        Only a forced conversion directly following the statement applies.
+
         If no temperature statement is found returns false.
         Otherwise returns a dictionary with keys:
             temperature, origin, destination, manual
@@ -286,10 +396,13 @@ class TemperatureConverter(Cog):
         is_manual: bool
 
         text = ctx.message.content
-        statement_match = re.search(statement_regex, text, re.IGNORECASE)
+        if statement_match is None:
+            statement_match = statement_pattern.search(text)
         if not statement_match:
             return None
-        conversion_match = re.search(find_force_convert, text, re.IGNORECASE)
+
+        # A forced conversion applies to the statement it starts with.
+        conversion_match = force_convert_pattern.match(text, statement_match.start())
 
         # Determine the origin unit.
         statement = statement_match.groups()
@@ -301,8 +414,10 @@ class TemperatureConverter(Cog):
             origin = TempUnit.F
         elif statement[3]:
             origin = TempUnit.K
-        else:  # Has to be rankine
+        elif statement[4]:
             origin = TempUnit.R
+        else:  # Has to be degrees
+            origin = self.degrees_unit(ctx)
 
         # Determine destination unit
         if conversion_match:
@@ -11,6 +11,7 @@ from discord.ext.commands import command
 
 from mrfreeze.bot import MrFreeze
 from mrfreeze.lib import activity
+from mrfreeze.lib import assets
 from mrfreeze.lib import vote
 
 
@@ -72,8 +73,7 @@ class UserCommands(Cog):
         author = ctx.author.mention
         server = ctx.guild.name
 
-        with open("config/mrfreezequotes", "r") as f:
-            quote = random.choice(f.read().strip().split('\n'))
+        quote = random.choice(assets.registry.lines("config/mrfreezequotes"))
 
         quote = quote.replace("Batman", author)
         quote = quote.replace("Gotham", f"**{server}**")
@@ -0,0 +1,64 @@
+"""
+Awaitable access to the SQLite databases.
+
+The sqlite3 module is blocking, and calling it straight from a coroutine
+stalls the entire event loop (and with it the gateway heartbeats for every
+server) until the query finishes. A slow disk or a locked database can make
+that a very long time.
+
+The DatabaseExecutor runs database work on a dedicated thread instead, and
+lets coroutines await the result. There's only one worker thread, so all
+database work is carried out in the order it was submitted.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+from mrfreeze.database.helpers import ExecutionResult
+from mrfreeze.database.helpers import db_execute
+
+T = TypeVar("T")
+
+
+class DatabaseExecutor:
+    """Runs blocking database calls on a dedicated thread."""
+
+    executor: Optional[ThreadPoolExecutor]
+
+    def __init__(self, thread_name: str = "mrfreeze-db") -> None:
+        self.thread_name = thread_name
+        self.executor = None
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        """Get the thread pool, starting it if it isn't running."""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=self.thread_name)
+        return self.executor
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run func(*args, **kwargs) on the database thread and await the result."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        return await loop.run_in_executor(self.get_executor(), call)
+
+    async def execute(self, dbpath: str, sql: str, values: Tuple[Any, ...]) -> ExecutionResult:
+        """Execute a database query on the database thread."""
+        return await self.run(db_execute, dbpath, sql, values)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the database thread, by default waiting for queued work to finish."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+
+# The executor used by the bot, coroutines should use this for database work.
+db_executor = DatabaseExecutor()
@@ -0,0 +1,124 @@
+"""
+Per-guild settings records.
+
+The settings tables each keep a dictionary of server id -> value, which
+means that code needing several settings for the same guild has to do one
+lookup per setting. The GuildSettingsIndex keeps a GuildSettings record for
+every guild with all of its settings in one place, so that the listeners on
+the message hot path can get everything they need with a single lookup.
+
+The records are kept in sync by the tables, which update the index whenever
+their own dictionary is loaded or updated. If the settings couldn't be loaded
+the index is marked as unloaded, and the next lookup tries loading them again.
+"""
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from discord import Guild
+
+# The settings stored for each guild, in the same order as the guild_settings table.
+COLUMNS: Tuple[str, ...] = (
+    "mute_interval",
+    "freeze_muted",
+    "inkcyclopedia_muted",
+    "inkcyclopedia_channel",
+    "leave_channel",
+    "leave_message",
+    "mute_channel",
+    "mute_role",
+    "self_mute_time",
+    "tempconverter_muted",
+    "trash_channel",
+    "welcome_channel",
+    "welcome_message",
+)
+
+
+class GuildSettings:
+    """All the settings of a single guild, unset settings are None."""
+
+    __slots__ = ("server",) + COLUMNS
+
+    server: int
+    mute_interval: Optional[int]
+    freeze_muted: Optional[bool]
+    inkcyclopedia_muted: Optional[bool]
+    inkcyclopedia_channel: Optional[int]
+    leave_channel: Optional[int]
+    leave_message: Optional[str]
+    mute_channel: Optional[int]
+    mute_role: Optional[int]
+    self_mute_time: Optional[int]
+    tempconverter_muted: Optional[bool]
+    trash_channel: Optional[int]
+    welcome_channel: Optional[int]
+    welcome_message: Optional[str]
+
+    def __init__(self, server: int) -> None:
+        self.server = server
+        for column in COLUMNS:
+            setattr(self, column, None)
+
+    def __repr__(self) -> str:
+        values = [ f"{column}={getattr(self, column)!r}" for column in COLUMNS ]
+        return f"GuildSettings(server={self.server}, {', '.join(values)})"
+
+
+class GuildSettingsIndex:
+    """Keeps one GuildSettings record per guild, indexed by server id."""
+
+    guilds: Dict[int, GuildSettings]
+    loaded: bool
+    loader: Optional[Callable[[], None]]
+
+    def __init__(self, loader: Optional[Callable[[], None]] = None) -> None:
+        self.guilds = dict()
+        # Returned for guilds without any settings, never written to.
+        self.empty = GuildSettings(0)
+        # Called to fill the index when a lookup is made while it's unloaded.
+        self.loader = loader
+        self.loaded = True
+
+    def get(self, server: Union[Guild, int]) -> GuildSettings:
+        """Get the settings record of a guild, loading the settings first if that has failed before."""
+        if not self.loaded and self.loader is not None:
+            self.loader()
+
+        server_id = server if isinstance(server, int) else server.id
+        return self.guilds.get(server_id, self.empty)
+
+    def set(self, server_id: int, column: str, value: Any) -> None:
+        """Set a single setting for a guild, creating its record if necessary."""
+        record = self.guilds.get(server_id)
+        if record is None:
+            record = GuildSettings(server_id)
+            self.guilds[server_id] = record
+
+        setattr(record, column, value)
+
+    def load(self, values: Dict[str, Dict[int, Any]]) -> None:
+        """Replace every record with the values of each column, given as column -> server id -> value."""
+        guilds: Dict[int, GuildSettings] = dict()
+        for column, column_values in values.items():
+            for server_id, value in column_values.items():
+                record = guilds.get(server_id)
+                if record is None:
+                    record = GuildSettings(server_id)
+                    guilds[server_id] = record
+                setattr(record, column, value)
+
+        self.guilds = guilds
+        self.loaded = True
+
+    def load_column(self, column: str, values: Dict[int, Any]) -> None:
+        """Replace a setting for every guild with the values from a table's dictionary."""
+        for record in self.guilds.values():
+            setattr(record, column, None)
+
+        for server_id, value in values.items():
+            self.set(server_id, column, value)
@@ -4,11 +4,14 @@ import datetime
 import sqlite3
 from sqlite3 import Connection
 from typing import Any
+from typing import ContextManager
+from typing import Iterable
 from typing import List
 from typing import Optional
 from typing import Tuple
 from typing import Union
 
+from mrfreeze.database.pool import pool
 from mrfreeze.lib.colors import CYAN
 from mrfreeze.lib.colors import CYAN_B
 from mrfreeze.lib.colors import GREEN_B
@@ -25,9 +28,14 @@ class ExecutionResult:
         self.error = error
 
 
-def db_connect(dbpath: str) -> Connection:
-    """Create a connection to a database."""
-    return sqlite3.connect(dbpath)
+def db_connect(dbpath: str) -> ContextManager[Connection]:
+    """
+    Get the pooled connection to a database.
+
+    Use as a context manager, the connection is locked for the
+    duration of the block and the transaction committed at the end.
+    """
+    return pool.connection(dbpath)
 
 
 def db_time(in_data: Union[str, datetime.datetime]) -> Optional[Union[str, datetime.datetime]]:
@@ -64,11 +72,28 @@ def db_execute(dbpath: str, sql: str, values: Tuple[Any, ...]) -> ExecutionResul
     return ExecutionResult(output, error)
 
 
+def db_execute_many(dbpath: str, sql: str, values: Iterable[Tuple[Any, ...]]) -> ExecutionResult:
+    """
+    Execute a database query once for every set of values.
+
+    All of the values are written in a single transaction,
+    if any of them fails none of them are written.
+    """
+    error = None
+
+    with db_connect(dbpath) as conn:
+        try:
+            conn.executemany(sql, values)
+        except Exception as e:
+            conn.rollback()
+            error = e
+
+    return ExecutionResult(list(), error)
+
+
 def db_create(dbpath: str, dbname: str, table: str) -> None:
     """Create a database file from the provided tables."""
-    conn = db_connect(dbpath)
-
-    with conn:
+    with db_connect(dbpath) as conn:
         try:
             c = conn.cursor()
             c.execute(table)
@@ -0,0 +1,238 @@
+"""
+Versioned schema migrations for the settings database.
+
+The schema version of a database file is kept in its `user_version` pragma,
+which is 0 for a file that has never been migrated. On startup `migrate()`
+applies every migration newer than that version, in order, each one in its
+own transaction together with the version bump. If a migration fails it is
+rolled back, and the file is left at the last version that was applied.
+
+Migrations must never be edited once they've been released. To change the
+schema, append a new migration to MIGRATIONS with the next version number.
+"""
+
+import logging
+import os
+from sqlite3 import Connection
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from mrfreeze.database import mute_codec
+from mrfreeze.database.pool import pool
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import CYAN_B
+from mrfreeze.lib.colors import GREEN_B
+from mrfreeze.lib.colors import RED
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
+
+
+class Migration(NamedTuple):
+    """A single step in the schema history of the settings database."""
+
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+# The single-value tables used before guild_settings, and the column
+# each of them has been moved to: (table, value column, guild_settings column)
+LEGACY_TABLES: List[Tuple[str, str, str]] = [
+    ("mute_intervals",          "minutes",  "mute_interval"),
+    ("freeze_mutes",            "muted",    "freeze_muted"),
+    ("inkcyclopedia_mutes",     "muted",    "inkcyclopedia_muted"),
+    ("inkcyclopedia_channels",  "channel",  "inkcyclopedia_channel"),
+    ("leave_channels",          "channel",  "leave_channel"),
+    ("leave_messages",          "template", "leave_message"),
+    ("mute_channels",           "channel",  "mute_channel"),
+    ("mute_roles",              "role",     "mute_role"),
+    ("self_mute_times",         "minutes",  "self_mute_time"),
+    ("tempconverter_mutes",     "muted",    "tempconverter_muted"),
+    ("trash_channels",          "channel",  "trash_channel"),
+    ("welcome_channels",        "channel",  "welcome_channel"),
+    ("welcome_messages",        "template", "welcome_message"),
+]
+
+# Other database files which are imported by a migration, if they exist.
+# The migration can access them under the schema name used as the key.
+LEGACY_MUTES = "legacy_mutes"
+
+
+def create_legacy_tables(conn: Connection) -> None:
+    """
+    Create the single-value tables used by earlier versions of the bot.
+
+    These already exist in databases created before migrations were
+    introduced, creating them in new ones as well means that the later
+    migrations can be run on both in the same way.
+    """
+    for table, column, _ in LEGACY_TABLES:
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            server      INTEGER NOT NULL PRIMARY KEY,
+            {column}    {"TEXT" if column == "template" else "INTEGER"}
+        );""")
+
+
+def create_guild_settings(conn: Connection) -> None:
+    """Move all the single-value tables into one table with one row per guild."""
+    conn.execute("""
+    CREATE TABLE guild_settings (
+        server                  INTEGER NOT NULL PRIMARY KEY,
+        mute_interval           INTEGER,
+        freeze_muted            BOOLEAN,
+        inkcyclopedia_muted     BOOLEAN,
+        inkcyclopedia_channel   INTEGER,
+        leave_channel           INTEGER,
+        leave_message           TEXT,
+        mute_channel            INTEGER,
+        mute_role               INTEGER,
+        self_mute_time          INTEGER,
+        tempconverter_muted     BOOLEAN,
+        trash_channel           INTEGER,
+        welcome_channel         INTEGER,
+        welcome_message         TEXT
+    );""")
+
+    for table, column, new_column in LEGACY_TABLES:
+        conn.execute(f"""
+        INSERT INTO guild_settings (server, {new_column})
+            SELECT server, {column} FROM {table} WHERE true
+        ON CONFLICT(server) DO UPDATE SET {new_column} = excluded.{new_column};
+        """)
+        conn.execute(f"DROP TABLE {table}")
+
+
+def create_mutes(conn: Connection) -> None:
+    """Move the mutes from their own database file into the settings database."""
+    conn.execute("""
+    CREATE TABLE mutes (
+        id          INTEGER NOT NULL,
+        server      INTEGER NOT NULL,
+        voluntary   BOOLEAN NOT NULL,
+        until       DATE,
+        CONSTRAINT  server_user PRIMARY KEY (id, server)
+    );""")
+
+    if is_attached(conn, LEGACY_MUTES) and has_table(conn, "mutes", LEGACY_MUTES):
+        conn.execute(f"""
+        INSERT OR REPLACE INTO mutes (id, server, voluntary, until)
+            SELECT id, server, voluntary, until FROM {LEGACY_MUTES}.mutes;
+        """)
+
+
+def index_mutes_by_expiry(conn: Connection) -> None:
+    """Index the mutes on their expiry, so that due mutes can be found without a full scan."""
+    conn.execute("CREATE INDEX mutes_server_until ON mutes (server, until);")
+    conn.execute("CREATE INDEX mutes_until ON mutes (until);")
+
+
+def mutes_until_to_epoch(conn: Connection) -> None:
+    """Store mute expiry times as milliseconds since the epoch rather than formatted strings."""
+    conn.execute("""
+    CREATE TABLE mutes_epoch (
+        id          INTEGER NOT NULL,
+        server      INTEGER NOT NULL,
+        voluntary   BOOLEAN NOT NULL,
+        until       INTEGER,
+        CONSTRAINT  server_user PRIMARY KEY (id, server)
+    );""")
+
+    rows = conn.execute("SELECT id, server, voluntary, until FROM mutes").fetchall()
+    conn.executemany(
+        "INSERT INTO mutes_epoch (id, server, voluntary, until) VALUES (?, ?, ?, ?)",
+        [ (id, server, voluntary, mute_codec.from_legacy(until)) for id, server, voluntary, until in rows ])
+
+    conn.execute("DROP TABLE mutes")
+    conn.execute("ALTER TABLE mutes_epoch RENAME TO mutes")
+    conn.execute("CREATE INDEX mutes_server_until ON mutes (server, until);")
+    conn.execute("CREATE INDEX mutes_until ON mutes (until);")
+
+
+# The full history of the settings database schema, oldest first.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create legacy settings tables", create_legacy_tables),
+    Migration(2, "consolidate settings into guild_settings", create_guild_settings),
+    Migration(3, "move mutes into the settings database", create_mutes),
+    Migration(4, "index mutes by expiry", index_mutes_by_expiry),
+    Migration(5, "store mute expiry as epoch milliseconds", mutes_until_to_epoch),
+]
+
+
+def is_attached(conn: Connection, schema: str) -> bool:
+    """Check if a database is attached to the connection under a given schema name."""
+    return schema in [ row[1] for row in conn.execute("PRAGMA database_list") ]
+
+
+def has_table(conn: Connection, table: str, schema: str = "main") -> bool:
+    """Check if a given table exists in a given schema."""
+    sql = f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?"
+    return conn.execute(sql, (table,)).fetchone() is not None
+
+
+def get_version(conn: Connection) -> int:
+    """Get the schema version of the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(
+    dbpath: str,
+    logger: logging.Logger,
+    attach: Optional[Dict[str, str]] = None,
+    migrations: List[Migration] = MIGRATIONS
+) -> int:
+    """
+    Bring a database file up to the latest schema version.
+
+    `attach` maps schema names to other database files that migrations
+    may import data from, files that don't exist are skipped.
+
+    Return the schema version of the database afterwards.
+    """
+    attach = attach or dict()
+
+    with pool.get_lock(dbpath):
+        conn = pool.get_connection(dbpath)
+        conn.commit()
+
+        version = get_version(conn)
+        pending = [ m for m in migrations if m.version > version ]
+        if not pending:
+            return version
+
+        # Databases can't be attached within a transaction.
+        attached = list()
+        for schema, path in attach.items():
+            if os.path.isfile(path):
+                conn.execute("ATTACH DATABASE ? AS ?", (path, schema))
+                attached.append(schema)
+
+        try:
+            for migration in pending:
+                try:
+                    conn.execute("BEGIN")
+                    migration.apply(conn)
+                    conn.execute(f"PRAGMA user_version = {migration.version:d}")
+                    conn.commit()
+
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(
+                        f"{RED_B}Migrations:{CYAN} failed to apply migration {migration.version} "
+                        f"({migration.description}) to {dbpath}:\n{RED}==> {e}{RESET}")
+                    raise
+
+                version = migration.version
+                logger.info(
+                    f"{GREEN_B}Migrations:{CYAN} applied migration "
+                    f"{CYAN_B}{migration.version}{CYAN} ({migration.description}) to {dbpath}{RESET}")
+
+        finally:
+            for schema in attached:
+                conn.execute(f"DETACH DATABASE {schema}")
+
+    return version
@@ -0,0 +1,71 @@
+"""
+Conversion of mute expiry times to and from the database.
+
+Mutes expire at a point in time stored in the `until` column of the mutes
+table as an integer number of milliseconds since the unix epoch, or NULL
+for mutes which never expire. Integers are cheap to read, keep sub-second
+precision and can be compared directly in SQL.
+
+Everything that converts between these integers and datetime objects
+should go through this module.
+"""
+
+import datetime
+import time
+from typing import Optional
+
+# The latest time we can store, used when a mute is so long it overflows.
+MAX_UNTIL = int(datetime.datetime.max.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+# The format expiry times were stored in before they were integers.
+LEGACY_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def now() -> int:
+    """Get the current time in milliseconds since the epoch."""
+    return time.time_ns() // 1_000_000
+
+
+def encode(date: Optional[datetime.datetime]) -> Optional[int]:
+    """
+    Convert a datetime to milliseconds since the epoch.
+
+    Naive datetimes, such as those from datetime.now(), are taken to be in local time.
+    None is returned as None, as it means that the mute never expires.
+    """
+    if date is None:
+        return None
+
+    try:
+        return min(int(date.timestamp() * 1000), MAX_UNTIL)
+    except (OverflowError, ValueError, OSError):
+        return MAX_UNTIL
+
+
+def decode(until: Optional[int]) -> Optional[datetime.datetime]:
+    """Convert milliseconds since the epoch to a naive datetime in local time."""
+    if until is None:
+        return None
+
+    try:
+        return datetime.datetime.fromtimestamp(until / 1000)
+    except (OverflowError, ValueError, OSError):
+        return datetime.datetime.max
+
+
+def to_timedelta(milliseconds: int) -> datetime.timedelta:
+    """Convert a difference between two expiry times to a timedelta."""
+    return datetime.timedelta(milliseconds=milliseconds)
+
+
+def from_timedelta(delta: datetime.timedelta) -> int:
+    """Convert a timedelta to a number of milliseconds."""
+    return delta // datetime.timedelta(milliseconds=1)
+
+
+def from_legacy(until: Optional[str]) -> Optional[int]:
+    """Convert an expiry time in the legacy string format to milliseconds since the epoch."""
+    if until is None:
+        return None
+
+    return encode(datetime.datetime.strptime(until, LEGACY_FORMAT))
@@ -0,0 +1,98 @@
+"""
+Connection pool for the SQLite databases used by the bot.
+
+Opening a new sqlite3 connection for every query means every query also has
+to pay for opening the file and parsing the schema. Instead the pool keeps
+one long-lived connection per database file around for the lifetime of the
+bot and hands it out to whoever needs it.
+
+SQLite connections can't be used by several threads at the same time, so
+every connection is paired with a lock. Use `pool.connection(dbpath)` as a
+context manager to get exclusive access to a connection; the transaction is
+committed when the block exits, or rolled back if an exception was raised.
+
+Connections are kept by absolute path, so a relative path such as settings.db
+still refers to the same file if the working directory changes later on.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from sqlite3 import Connection
+from typing import Dict
+from typing import Iterator
+
+
+class ConnectionPool:
+    """Keeps one long-lived connection per database file."""
+
+    connections: Dict[str, Connection]
+    locks: Dict[str, threading.RLock]
+
+    def __init__(self) -> None:
+        self.connections = dict()
+        self.locks = dict()
+        self.pool_lock = threading.Lock()
+
+    def key(self, dbpath: str) -> str:
+        """Get the key of a database file, its absolute path."""
+        return os.path.abspath(dbpath)
+
+    def get_lock(self, dbpath: str) -> threading.RLock:
+        """Get the lock guarding the connection to a given database file."""
+        key = self.key(dbpath)
+        with self.pool_lock:
+            if key not in self.locks:
+                self.locks[key] = threading.RLock()
+            return self.locks[key]
+
+    def get_connection(self, dbpath: str) -> Connection:
+        """
+        Get the connection for a given database file, opening it if necessary.
+
+        The connection is shared, so the caller needs to hold the lock
+        returned by get_lock() while using it.
+        """
+        key = self.key(dbpath)
+        with self.pool_lock:
+            conn = self.connections.get(key)
+            if conn is None:
+                # Access is serialised through the locks, so it's safe
+                # to let the connection travel between threads.
+                conn = sqlite3.connect(key, check_same_thread=False)
+                self.connections[key] = conn
+            return conn
+
+    @contextmanager
+    def connection(self, dbpath: str) -> Iterator[Connection]:
+        """
+        Get exclusive access to the connection for a given database file.
+
+        The transaction is committed when the block exits successfully,
+        and rolled back if the block raises an exception.
+        """
+        with self.get_lock(dbpath):
+            conn = self.get_connection(dbpath)
+            with conn:
+                yield conn
+
+    def close(self, dbpath: str) -> None:
+        """Close the connection to a given database file, if there is one."""
+        with self.get_lock(dbpath):
+            with self.pool_lock:
+                conn = self.connections.pop(self.key(dbpath), None)
+            if conn is not None:
+                conn.close()
+
+    def close_all(self) -> None:
+        """Close all the connections in the pool."""
+        with self.pool_lock:
+            dbpaths = list(self.connections.keys())
+
+        for dbpath in dbpaths:
+            self.close(dbpath)
+
+
+# The pool used by the bot, all database access should go through this.
+pool = ConnectionPool()
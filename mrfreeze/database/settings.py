@@ -6,9 +6,18 @@ and provides a single interface for working with them all.
 """
 
 import logging
+import sqlite3
+from time import perf_counter
+from typing import Any
+from typing import Dict
 from typing import List
+from typing import Optional
 
-from mrfreeze.database.tables.abc_table_base import ABCTableBase
+from mrfreeze.database.guild_settings import GuildSettingsIndex
+from mrfreeze.database.migrations import LEGACY_MUTES
+from mrfreeze.database.migrations import migrate
+from mrfreeze.database.pool import pool
+from mrfreeze.database.tables.abc_table_dict import ABCTableDict
 from mrfreeze.database.tables.freeze_mutes import FreezeMutes
 from mrfreeze.database.tables.inkcyclopedia_mutes import InkcyclopediaMutes
 from mrfreeze.database.tables.inkcyclopedia_channels import InkcyclopediaChannels
@@ -22,16 +31,27 @@ from mrfreeze.database.tables.tempconverter_mutes import TempConverterMutes
 from mrfreeze.database.tables.trash_channels import TrashChannels
 from mrfreeze.database.tables.welcome_channels import WelcomeChannels
 from mrfreeze.database.tables.welcome_messages import WelcomeMessages
+from mrfreeze.database.write_behind import WriteBehindQueue
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import GREEN_B
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
 
 
 class Settings:
     """Settings is a class for coordinating all the various settings modules."""
 
-    def __init__(self) -> None:
+    def __init__(self, write_behind: bool = False, legacy_mutes: Optional[str] = None) -> None:
         self.dbpath = "settings.db"
-        self.tables: List[ABCTableBase] = list()
+        self.legacy_mutes = legacy_mutes
+        self.tables: List[ABCTableDict] = list()
         self.logger = logging.getLogger(self.__class__.__name__)
 
+        # With write-behind enabled settings changes are committed in batches.
+        self.write_behind: Optional[WriteBehindQueue] = None
+        if write_behind:
+            self.write_behind = WriteBehindQueue(self.logger)
+
         # Initialize the tables
         self.logger.info("Instantiating tables")
         self.mute_interval = MuteInterval(self.dbpath, self.logger)
@@ -64,76 +84,167 @@ class Settings:
         self.tables.append(self.welcome_channels)
         self.tables.append(self.welcome_messages)
 
+        # Per-guild records with all settings, for when several are needed at once.
+        self.guilds = GuildSettingsIndex(loader=self.load_all)
+
+        for table in self.tables:
+            table.write_behind = self.write_behind
+            table.index = self.guilds
+
         # Initialize all the tables
         self.logger.info("Initializing tables")
         self.initialize()
         self.logger.info("All tables initialized")
 
         # Link all the methods
+        # Guild Settings
+        self.get_guild = self.guilds.get
+
         # Mute Interval
         self.get_mute_interval = self.mute_interval.get
         self.set_mute_interval = self.mute_interval.set_by_id
+        self.set_mute_interval_async = self.mute_interval.set_by_id_async
 
         # Freeze Mutes
         self.is_freeze_muted = self.freeze_mutes.get
         self.toggle_freeze_mute = self.freeze_mutes.toggle
+        self.toggle_freeze_mute_async = self.freeze_mutes.toggle_async
 
         # Inkcyclopedia Mutes
         self.is_inkcyclopedia_muted = self.inkcyclopedia.get
         self.toggle_inkcyclopedia_mute = self.inkcyclopedia.toggle
+        self.toggle_inkcyclopedia_mute_async = self.inkcyclopedia.toggle_async
 
         # Inkcyclopedia Channels
         self.get_inkcyclopedia_channel = self.inkcyclopedia_channels.get
         self.set_inkcyclopedia_channel = self.inkcyclopedia_channels.set
         self.set_inkcyclopedia_channel_by_id = self.inkcyclopedia_channels.set_by_id
+        self.set_inkcyclopedia_channel_async = self.inkcyclopedia_channels.set_async
+        self.set_inkcyclopedia_channel_by_id_async = self.inkcyclopedia_channels.set_by_id_async
 
         # Leave Channels
         self.get_leave_channel = self.leave_channels.get
         self.set_leave_channel = self.leave_channels.set
         self.set_leave_channel_by_id = self.leave_channels.set_by_id
+        self.set_leave_channel_async = self.leave_channels.set_async
+        self.set_leave_channel_by_id_async = self.leave_channels.set_by_id_async
 
         # Leave Messages
         self.get_leave_message = self.leave_messages.get
         self.set_leave_message_by_id = self.leave_messages.set_by_id
+        self.set_leave_message_by_id_async = self.leave_messages.set_by_id_async
 
         # Mute Channels
         self.get_mute_channel = self.mute_channels.get
         self.set_mute_channel = self.mute_channels.set
         self.set_mute_channel_by_id = self.mute_channels.set_by_id
+        self.set_mute_channel_async = self.mute_channels.set_async
+        self.set_mute_channel_by_id_async = self.mute_channels.set_by_id_async
 
         # Mute Roles
         self.get_mute_role = self.mute_roles.get
         self.set_mute_role = self.mute_roles.set
         self.set_mute_role_by_id = self.mute_roles.set_by_id
+        self.set_mute_role_async = self.mute_roles.set_async
+        self.set_mute_role_by_id_async = self.mute_roles.set_by_id_async
 
         # Self mute times
         self.get_self_mute_time = self.self_mute_times.get
         self.set_self_mute_time = self.self_mute_times.set_by_id
+        self.set_self_mute_time_async = self.self_mute_times.set_by_id_async
 
         # Temperature Converter Mutes
         self.is_tempconverter_muted = self.tempconverter_mutes.get
         self.toggle_tempconverter_mute = self.tempconverter_mutes.toggle
+        self.toggle_tempconverter_mute_async = self.tempconverter_mutes.toggle_async
 
         # Trash Channels
         self.get_trash_channel = self.trash_channels.get
         self.set_trash_channel = self.trash_channels.set
         self.set_trash_channel_by_id = self.trash_channels.set_by_id
+        self.set_trash_channel_async = self.trash_channels.set_async
+        self.set_trash_channel_by_id_async = self.trash_channels.set_by_id_async
 
         # Welcome Channels
         self.get_welcome_channel = self.welcome_channels.get
         self.set_welcome_channel = self.welcome_channels.set
         self.set_welcome_channel_by_id = self.welcome_channels.set_by_id
+        self.set_welcome_channel_async = self.welcome_channels.set_async
+        self.set_welcome_channel_by_id_async = self.welcome_channels.set_by_id_async
 
         # Welcome Messages
         self.get_welcome_message = self.welcome_messages.get
         self.set_welcome_message_by_id = self.welcome_messages.set_by_id
+        self.set_welcome_message_by_id_async = self.welcome_messages.set_by_id_async
 
     def initialize(self) -> None:
         """Set up the database and tables necessary for the server settings module."""
-        self.logger.info("Checking that tables exist, create if not.")
-        for module in self.tables:
-            module.create_table()
+        self.logger.info("Migrating database to the latest schema.")
+        attach = dict()
+        if self.legacy_mutes is not None:
+            attach[LEGACY_MUTES] = self.legacy_mutes
+        migrate(self.dbpath, self.logger, attach=attach)
 
         self.logger.info("Load tables into memory.")
+        self.load_all()
+
+    def load_all(self) -> None:
+        """
+        Load all the tables into memory with a single scan of guild_settings.
+
+        Every table is a column of the same guild_settings row, so the rows
+        are fetched once and each table then picks its column out of them
+        for its dictionary and the per-guild index. How many values each
+        table got, and how long it took, is logged. If the load fails the
+        tables and the index are left unloaded, and will try again on first
+        access.
+        """
+        started = perf_counter()
+        values: Dict[str, Dict[int, Any]] = dict()
+        timings: Dict[str, float] = dict()
+
+        try:
+            with pool.connection(self.dbpath) as conn:
+                cursor = conn.execute("SELECT * FROM guild_settings")
+                names = [ description[0] for description in cursor.description ]
+                rows = cursor.fetchall()
+
+            server = names.index("server")
+            for module in self.tables:
+                table_started = perf_counter()
+                position = names.index(module.column)
+                values[module.column] = {
+                    row[server]: row[position]
+                    for row in rows
+                    if row[position] is not None
+                }
+                timings[module.name] = perf_counter() - table_started
+
+        except (sqlite3.Error, ValueError) as e:
+            self.logger.error(f"{RED_B}Settings:{CYAN} failed to load tables: {e}{RESET}")
+            for module in self.tables:
+                module.dict = None
+            self.guilds.loaded = False
+            return
+
         for module in self.tables:
-            module.load_from_db()
+            module.dict = values[module.column]
+            self.logger.info(
+                f"{GREEN_B}Settings:{CYAN} loaded {len(module.dict)} rows for {module.name} "
+                f"in {timings[module.name] * 1000:.2f} ms{RESET}")
+        self.guilds.load(values)
+
+        total = perf_counter() - started
+        self.logger.info(
+            f"{GREEN_B}Settings:{CYAN} loaded {len(rows)} guilds into {len(self.tables)} tables "
+            f"in {total * 1000:.2f} ms{RESET}")
+
+    def flush(self) -> None:
+        """Write any pending settings changes to the database."""
+        if self.write_behind is not None:
+            self.write_behind.flush()
+
+    def close(self) -> None:
+        """Write any pending settings changes to the database and stop the write-behind timer."""
+        if self.write_behind is not None:
+            self.write_behind.close()
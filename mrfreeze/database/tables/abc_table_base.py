@@ -1,14 +1,12 @@
 """Abstract base class for settings."""
 
 import logging
-import sqlite3
 from abc import ABCMeta
 from abc import abstractmethod
 from typing import Any
 from typing import Dict
 from typing import Tuple
 
-from mrfreeze.database.helpers import db_connect
 from mrfreeze.database.helpers import db_execute
 from mrfreeze.lib.colors import GREEN
 from mrfreeze.lib.colors import MAGENTA
@@ -36,7 +34,6 @@ class ABCTableBase(metaclass=ABCMeta):
     # SQL commands
     select_all: str
     insert: str
-    table: str
 
     # Functions
     @abstractmethod
@@ -88,19 +85,6 @@ class ABCTableBase(metaclass=ABCMeta):
             "upsert successful")
         return True
 
-    def create_table(self) -> None:
-        """Create the table for a given module."""
-        conn = db_connect(self.dbpath)
-
-        with conn:
-            try:
-                c = conn.cursor()
-                c.execute(self.table)
-                self.infolog("created database table")
-
-            except sqlite3.Error as e:
-                self.errorlog(f"failed to create database table: {e}")
-
     def infolog(self, msg: str) -> None:
         """Write a message to the log, prefixing it with the module name."""
         self.logger.info(f"{YELLOW_B}{self.name} {GREEN}{msg}{RESET}")
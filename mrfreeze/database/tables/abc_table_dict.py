@@ -1,19 +1,26 @@
 """Abstract base class for settings."""
 
 import logging
-import sqlite3
 from typing import Dict
 from typing import Generic
+from typing import Iterable
+from typing import List
 from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Tuple
 from typing import TypeVar
 from typing import Union
+from typing import cast
 
 from discord import Guild
 from discord import Role
 from discord import TextChannel
 
+from mrfreeze.database.executor import db_executor
+from mrfreeze.database.helpers import ExecutionResult
 from mrfreeze.database.helpers import db_connect
 from mrfreeze.database.helpers import db_execute
+from mrfreeze.database.helpers import db_execute_many
 from mrfreeze.database.tables.abc_table_base import ABCTableBase
 from mrfreeze.lib.colors import GREEN
 from mrfreeze.lib.colors import MAGENTA
@@ -21,7 +28,12 @@ from mrfreeze.lib.colors import RED
 from mrfreeze.lib.colors import RESET
 from mrfreeze.lib.colors import YELLOW_B
 
-KT = TypeVar("KT")
+if TYPE_CHECKING:
+    from mrfreeze.database.guild_settings import GuildSettingsIndex  # noqa: F401
+    from mrfreeze.database.write_behind import WriteBehindQueue  # noqa: F401
+
+# Every table is keyed by server id.
+KT = TypeVar("KT", bound=int)
 VT = TypeVar("VT")
 
 
@@ -37,26 +49,21 @@ class ABCTableDict(Generic[KT, VT], ABCTableBase):
     name: str
     table_name: str
     dbpath: str
+    column: str
     logger: logging.Logger
     dict: Optional[Dict[KT, VT]]
 
+    # When set, upserts update the dictionary right away and leave
+    # the database write to the write-behind queue.
+    write_behind: Optional["WriteBehindQueue"] = None
+
+    # When set, the per-guild records in the index are kept in
+    # sync with self.dict, using self.column as the attribute name.
+    index: Optional["GuildSettingsIndex"] = None
+
     # SQL commands
     select_all: str
     insert: str
-    table: str
-
-    def create_table(self) -> None:
-        """Create the table for a given module."""
-        conn = db_connect(self.dbpath)
-
-        with conn:
-            try:
-                c = conn.cursor()
-                c.execute(self.table)
-                self.infolog("created database table")
-
-            except sqlite3.Error as e:
-                self.errorlog(f"failed to create database table: {e}")
 
     def load_from_db(self) -> None:
         """
@@ -69,16 +76,22 @@ class ABCTableDict(Generic[KT, VT], ABCTableBase):
         query = db_execute(self.dbpath, self.select_all, tuple())
 
         if query.error is None:
-            new_dict = dict()
-            for entry in query.output:
-                new_dict[entry[0]] = entry[1]
-
-            self.dict = new_dict
+            self.load_from_rows(query.output)
             self.infolog("successfully fetched data")
         else:
             self.errorlog(f"failed to fetch data: {query.error}")
             self.dict = None
 
+    def load_from_rows(self, rows: Iterable[Tuple[KT, VT]]) -> None:
+        """Replace the dictionary with the (key, value) rows returned by self.select_all."""
+        new_dict = dict()
+        for entry in rows:
+            new_dict[entry[0]] = entry[1]
+
+        self.dict = new_dict
+        if self.index is not None:
+            self.index.load_column(self.column, cast(Dict[int, VT], new_dict))
+
     def get(self, server: Guild) -> Optional[VT]:
         """Get the value from a given module for a given server."""
         # Check that values are loaded, if not try again.
@@ -105,6 +118,8 @@ class ABCTableDict(Generic[KT, VT], ABCTableBase):
             return False
         else:
             self.dict[key] = value
+            if self.index is not None:
+                self.index.set(key, self.column, value)
             return True
 
     def set(self, object: Union[TextChannel, Role]) -> bool:
@@ -115,10 +130,76 @@ class ABCTableDict(Generic[KT, VT], ABCTableBase):
         """Set the value using a Guild object and a value."""
         return self.upsert(server, value)
 
+    async def set_async(self, object: Union[TextChannel, Role]) -> bool:
+        """Set the value using a TextChannel or Role object, without blocking the event loop."""
+        return await self.upsert_async(object.guild, object.id)
+
+    async def set_by_id_async(self, server: Guild, value: VT) -> bool:
+        """Set the value using a Guild object and a value, without blocking the event loop."""
+        return await self.upsert_async(server, value)
+
     def upsert(self, server: Guild, value: VT) -> bool:
         """Insert or update the value for `server.id` with `value`."""
+        if self.write_behind is not None:
+            return self.upsert_write_behind(server, value)
+
         query = db_execute(self.dbpath, self.insert, (server.id, value, value))
+        return self.upsert_written(server, value, query)
+
+    async def upsert_async(self, server: Guild, value: VT) -> bool:
+        """
+        Insert or update the value for `server.id` with `value`, without blocking the event loop.
+
+        Only the database write runs on the database thread, the dictionary
+        and the index are updated on the event loop where they're read.
+        """
+        if self.write_behind is not None:
+            return self.upsert_write_behind(server, value)
+
+        query = await db_executor.execute(self.dbpath, self.insert, (server.id, value, value))
+        return self.upsert_written(server, value, query)
+
+    async def flip_async(self, server: Guild) -> bool:
+        """
+        Flip a true/false value for `server.id`, unset counting as false, without blocking the event loop.
+
+        The value is read and written in one transaction on the database
+        thread, so flips running at the same time can't both read the old
+        value. With a write-behind queue the dictionary has the latest value,
+        so it's flipped right away instead.
+        """
+        if self.write_behind is not None:
+            return self.upsert_write_behind(server, cast(VT, not self.get(server)))
 
+        query = await db_executor.run(self.flip_blocking, server.id)
+        if query.error is not None:
+            self.errorlog(
+                f"failed to toggle {server.name}\n{query.error}")
+            return False
+
+        return self.upsert_written(server, cast(VT, bool(query.output[0][0])), query)
+
+    def flip_blocking(self, server_id: int) -> ExecutionResult:
+        """Flip the value for `server_id` in the database and return the new value, blocking until done."""
+        flip = f"""
+        INSERT INTO {self.table_name}
+            (server, {self.column}) VALUES (?, 1)
+        ON CONFLICT(server) DO UPDATE SET {self.column} = NOT COALESCE({self.column}, 0);
+        """
+        select = f"SELECT {self.column} FROM {self.table_name} WHERE server = ?;"
+
+        with db_connect(self.dbpath) as conn:
+            try:
+                conn.execute(flip, (server_id,))
+                output = conn.execute(select, (server_id,)).fetchall()
+            except Exception as e:
+                conn.rollback()
+                return ExecutionResult(list(), e)
+
+        return ExecutionResult(output, None)
+
+    def upsert_written(self, server: Guild, value: VT, query: ExecutionResult) -> bool:
+        """Update the dictionary for `server.id` once the upsert query has run."""
         if query.error is not None:
             self.errorlog(
                 f"failed to set {server.name} to {value}\n{query.error}")
@@ -134,6 +215,65 @@ class ABCTableDict(Generic[KT, VT], ABCTableBase):
                 f"set {server.name} to {value}")
             return True
 
+    def upsert_many(self, pairs: Iterable[Tuple[KT, VT]]) -> bool:
+        """
+        Insert or update the values for several servers at once.
+
+        Takes (server id, value) pairs. The values are written in a single
+        transaction, and the dictionary is only replaced with the new values
+        once all of them have been written.
+        """
+        pairs = list(pairs)
+
+        if self.dict is None:
+            self.load_from_db()
+
+        if self.dict is None:
+            self.errorlog(
+                f"failed to update dictionary for {len(pairs)} servers")
+            return False
+
+        if self.write_behind is None:
+            rows: List[Tuple[KT, VT, VT]] = [ (key, value, value) for key, value in pairs ]
+            query = db_execute_many(self.dbpath, self.insert, rows)
+
+            if query.error is not None:
+                self.errorlog(
+                    f"failed to set {len(pairs)} servers\n{query.error}")
+                return False
+
+        # Swap in a new dictionary so readers never see a half updated one.
+        new_dict = dict(self.dict)
+        new_dict.update(pairs)
+        self.dict = new_dict
+
+        for key, value in pairs:
+            if self.index is not None:
+                self.index.set(key, self.column, value)
+            if self.write_behind is not None:
+                self.write_behind.enqueue(self, key, value)
+
+        self.infolog(
+            f"set {len(pairs)} servers")
+        return True
+
+    def upsert_write_behind(self, server: Guild, value: VT) -> bool:
+        """Update the dictionary for `server.id` and queue the database write."""
+        if self.write_behind is None:
+            self.errorlog(
+                f"failed to set {server.name} to {value}, there's no write-behind queue")
+            return False
+
+        if not self.update_dictionary(server.id, value):
+            self.errorlog(
+                f"failed to update dictionary for {server.name} to {value}")
+            return False
+
+        self.write_behind.enqueue(self, server.id, value)
+        self.infolog(
+            f"set {server.name} to {value} (write pending)")
+        return True
+
     def infolog(self, msg: str) -> None:
         """Write a message to the log, prefixing it with the module name."""
         self.logger.info(f"{YELLOW_B}{self.name} {GREEN}{msg}{RESET}")
@@ -26,7 +26,6 @@ class ABCTableList(ABCTableBase):
     # SQL commands
     select_all: str
     insert: str
-    table: str
 
     # Placeholder to make sure the module type checks.
     def upsert(self, key: Any, value: Any) -> bool:
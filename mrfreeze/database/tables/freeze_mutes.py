@@ -13,27 +13,25 @@ class FreezeMutes(ABCTableDict[int, bool]):
     def __init__(self, dbpath: str, logger: logging.Logger) -> None:
         self.dbpath = dbpath
         self.name = "freeze mutes"
-        self.table_name = "freeze_mutes"
+        self.table_name = "guild_settings"
+        self.column = "freeze_muted"
         self.dict = None
         self.logger = logger
         self.primary_keys = ("server",)
-        self.secondary_keys = ("muted",)
+        self.secondary_keys = (self.column,)
 
         # SQL commands
-        self.select_all = f"SELECT server, muted FROM {self.table_name}"
+        self.select_all = f"""
+        SELECT server, {self.column} FROM {self.table_name}
+        WHERE {self.column} IS NOT NULL;
+        """
 
         self.insert = f"""
         INSERT INTO {self.table_name}
-            (server, muted) VALUES (?, ?)
-        ON CONFLICT(server) DO UPDATE SET muted = ?;
+            (server, {self.column}) VALUES (?, ?)
+        ON CONFLICT(server) DO UPDATE SET {self.column} = ?;
         """
 
-        self.table = f"""
-        CREATE TABLE IF NOT EXISTS {self.table_name} (
-            server      INTEGER PRIMARY KEY NOT NULL,
-            muted       BOOLEAN NOT NULL
-        );"""
-
     def toggle(self, server: Guild) -> bool:
         """
         Toggle the freeze mute value for the specified server.
@@ -46,3 +44,7 @@ class FreezeMutes(ABCTableDict[int, bool]):
         """
         new_value = not self.get(server)
         return self.upsert(server, new_value)
+
+    async def toggle_async(self, server: Guild) -> bool:
+        """Toggle the freeze mute value for the specified server, without blocking the event loop."""
+        return await self.flip_async(server)
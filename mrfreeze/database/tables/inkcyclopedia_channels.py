@@ -11,23 +11,21 @@ class InkcyclopediaChannels(ABCTableDict[int, int]):
     def __init__(self, dbpath: str, logger: logging.Logger) -> None:
         self.dbpath = dbpath
         self.name = "inkcyclopedia channels"
-        self.table_name = "inkcyclopedia_channels"
+        self.table_name = "guild_settings"
+        self.column = "inkcyclopedia_channel"
         self.dict = None
         self.logger = logger
         self.primary_keys = ("server",)
-        self.secondary_keys = ("channel",)
+        self.secondary_keys = (self.column,)
 
         # SQL commands
-        self.select_all = f"SELECT server, channel FROM {self.table_name}"
+        self.select_all = f"""
+        SELECT server, {self.column} FROM {self.table_name}
+        WHERE {self.column} IS NOT NULL;
+        """
 
         self.insert = f"""
         INSERT INTO {self.table_name}
-            (server, channel) VALUES (?, ?)
-        ON CONFLICT(server) DO UPDATE SET channel = ?;
+            (server, {self.column}) VALUES (?, ?)
+        ON CONFLICT(server) DO UPDATE SET {self.column} = ?;
         """
-
-        self.table = f"""
-        CREATE TABLE IF NOT EXISTS {self.table_name} (
-            server      INTEGER NOT NULL PRIMARY KEY,
-            channel     INTEGER NOT NULL
-        );"""
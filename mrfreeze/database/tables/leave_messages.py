@@ -12,23 +12,21 @@ class LeaveMessages(ABCTableDict[int, Optional[str]]):
     def __init__(self, dbpath: str, logger: logging.Logger) -> None:
         self.dbpath = dbpath
         self.name = "leave messages"
-        self.table_name = "leave_messages"
+        self.table_name = "guild_settings"
+        self.column = "leave_message"
         self.dict = None
         self.logger = logger
         self.primary_keys = ("server",)
-        self.secondary_keys = ("template",)
+        self.secondary_keys = (self.column,)
 
         # SQL commands
-        self.select_all = f"SELECT server, template FROM {self.table_name}"
+        self.select_all = f"""
+        SELECT server, {self.column} FROM {self.table_name}
+        WHERE {self.column} IS NOT NULL;
+        """
 
         self.insert = f"""
         INSERT INTO {self.table_name}
-            (server, template) VALUES (?, ?)
-        ON CONFLICT(server) DO UPDATE SET template = ?;
+            (server, {self.column}) VALUES (?, ?)
+        ON CONFLICT(server) DO UPDATE SET {self.column} = ?;
         """
-
-        self.table = f"""
-        CREATE TABLE IF NOT EXISTS {self.table_name} (
-            server      INTEGER NOT NULL PRIMARY KEY,
-            template    TEXT
-        );"""
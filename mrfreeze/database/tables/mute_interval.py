@@ -1,4 +1,4 @@
-"""Mute interval stores information about how often to check for users due for unmute."""
+"""Mute interval stores information about how long to wait before retrying a failed unmute."""
 
 import logging
 from typing import Optional
@@ -10,29 +10,27 @@ class MuteInterval(ABCTableDict[int, Optional[int]]):
     """
     Class for handling the mute_intervals table.
 
-    This value is used to determine how often to check for users due for unmute.
+    This value is used to determine how long to wait before retrying a failed unmute.
     """
 
     def __init__(self, dbpath: str, logger: logging.Logger) -> None:
         self.dbpath = dbpath
         self.name = "mute intervals"
-        self.table_name = "mute_intervals"
+        self.table_name = "guild_settings"
+        self.column = "mute_interval"
         self.dict = None
         self.logger = logger
         self.primary_keys = ("server",)
-        self.secondary_keys = ("minutes",)
+        self.secondary_keys = (self.column,)
 
         # SQL commands
-        self.select_all = f"SELECT server, minutes FROM {self.table_name}"
+        self.select_all = f"""
+        SELECT server, {self.column} FROM {self.table_name}
+        WHERE {self.column} IS NOT NULL;
+        """
 
         self.insert = f"""
         INSERT INTO {self.table_name}
-            (server, minutes) VALUES (?, ?)
-        ON CONFLICT(server) DO UPDATE SET minutes = ?;
+            (server, {self.column}) VALUES (?, ?)
+        ON CONFLICT(server) DO UPDATE SET {self.column} = ?;
         """
-
-        self.table = f"""
-        CREATE TABLE IF NOT EXISTS {self.table_name} (
-            server      INTEGER NOT NULL PRIMARY KEY,
-            minutes     INTEGER
-        );"""
@@ -0,0 +1,128 @@
+"""
+Write-behind queue for the settings tables.
+
+Normally every settings change is written and committed on its own, which
+means one fsync per change. In write-behind mode the table updates its
+in-memory dictionary straight away and hands the row to a WriteBehindQueue,
+which writes all pending rows to the database in one transaction per
+database file. The queue is flushed on a timer, as soon as enough rows are
+pending, and when the bot shuts down.
+"""
+
+import logging
+import threading
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Tuple
+
+from mrfreeze.database.pool import pool
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import GREEN_B
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
+
+if TYPE_CHECKING:
+    from mrfreeze.database.tables.abc_table_dict import ABCTableDict  # noqa: F401
+
+
+class WriteBehindQueue:
+    """Collects settings writes and flushes them to the database in batches."""
+
+    pending: Dict[Tuple["ABCTableDict", Any], Any]
+    timer: Optional[threading.Timer]
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        interval: float = 2.0,
+        max_pending: int = 100
+    ) -> None:
+        self.logger = logger
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = dict()
+        self.timer = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    def enqueue(self, table: "ABCTableDict", key: Any, value: Any) -> None:
+        """
+        Queue a row to be written to the database.
+
+        Only the latest value for each key is kept, so changing the same
+        setting several times before a flush only results in one write.
+        """
+        with self.lock:
+            self.pending[(table, key)] = value
+
+            if len(self.pending) >= self.max_pending:
+                self.start_timer(0)
+            elif self.timer is None:
+                self.start_timer(self.interval)
+
+    def start_timer(self, delay: float) -> None:
+        """(Re)start the flush timer, the caller must hold self.lock."""
+        if self.timer is not None:
+            self.timer.cancel()
+
+        self.timer = threading.Timer(delay, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def flush(self) -> int:
+        """Write all pending rows to the database, return the number of rows written."""
+        with self.flush_lock:
+            with self.lock:
+                batch = self.pending
+                self.pending = dict()
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+
+            if not batch:
+                return 0
+
+            # Group the rows by database file and table.
+            databases: Dict[str, Dict["ABCTableDict", List[Tuple[Any, ...]]]] = dict()
+            for (table, key), value in batch.items():
+                tables = databases.setdefault(table.dbpath, dict())
+                tables.setdefault(table, list()).append((key, value, value))
+
+            written = 0
+            for dbpath, tables in databases.items():
+                try:
+                    with pool.connection(dbpath) as conn:
+                        for table, rows in tables.items():
+                            conn.executemany(table.insert, rows)
+                    written += sum([ len(rows) for rows in tables.values() ])
+
+                except Exception as e:
+                    self.logger.error(
+                        f"{RED_B}Write-behind:{CYAN} failed to flush to {dbpath}: {e}{RESET}")
+                    self.requeue(tables)
+
+            if written:
+                self.logger.info(
+                    f"{GREEN_B}Write-behind:{CYAN} flushed {written} pending rows{RESET}")
+            return written
+
+    def requeue(self, tables: Dict["ABCTableDict", List[Tuple[Any, ...]]]) -> None:
+        """Put rows that failed to flush back in the queue, unless they've been superseded."""
+        with self.lock:
+            for table, rows in tables.items():
+                for key, value, _ in rows:
+                    self.pending.setdefault((table, key), value)
+
+            if self.pending and self.timer is None:
+                self.start_timer(self.interval)
+
+    def close(self) -> None:
+        """Flush all pending rows and stop the timer."""
+        self.flush()
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
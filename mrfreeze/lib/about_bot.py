@@ -6,6 +6,8 @@ from discord import Embed
 from discord import File
 from discord.ext.commands import Context
 
+from mrfreeze.lib import assets
+
 
 def get_wiki_message() -> Tuple[Embed, File]:
     """Get a link to the wiki over on Github."""
@@ -16,7 +18,7 @@ def get_wiki_message() -> Tuple[Embed, File]:
         name="Readme",
         value=f"Check out my wiki page [on Github]({url})!")
 
-    image = File("images/readme.png")
+    image = assets.registry.file("images/readme.png")
     embed.set_thumbnail(url="attachment://readme.png")
 
     return embed, image
@@ -28,7 +30,7 @@ def get_source_message() -> Tuple[Embed, File]:
     text = "My source code is available [on Github](https://github.com/terminalnode/mrfreeze)!"
     embed.add_field(name="Source code", value=text)
 
-    image = File("images/source.png")
+    image = assets.registry.file("images/source.png")
     embed.set_thumbnail(url="attachment://source.png")
 
     return embed, image
@@ -73,7 +75,7 @@ def get_dummies_message() -> Tuple[Embed, File]:
     embed = Embed(color=0x00dee9, description=embed_text)
     embed.add_field(name="Dummy Bots", value=invite_text)
 
-    image = File("images/dummies.png")
+    image = assets.registry.file("images/dummies.png")
     embed.set_thumbnail(url="attachment://dummies.png")
 
     return embed, image
@@ -0,0 +1,128 @@
+"""
+In-memory registry of the files MrFreeze sends or quotes from.
+
+Images such as helldog.gif used to be opened from disk every time they were
+attached to a message, and the quote file was read and split on every
+!mrfreeze. The registry reads each file once and keeps its contents as an
+immutable bytes object. Every discord.File it hands out wraps the same bytes
+in a new BytesIO, so no file is opened when a reply is sent.
+
+Files that change on disk are picked up automatically. When an asset is used
+its modification time is checked, at most once every check_interval seconds,
+and the file is read again if it has changed. If it can't be read the old
+contents are kept, so a file that's being replaced doesn't break replies.
+"""
+
+import logging
+import os
+import time
+from io import BytesIO
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from discord import File
+
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import GREEN_B
+from mrfreeze.lib.colors import RED
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
+
+logger = logging.getLogger("Assets")
+
+
+class Asset(NamedTuple):
+    """The contents of a file, and when it was last modified."""
+
+    data: bytes
+    mtime: float
+    lines: Optional[Tuple[str, ...]]  # Set the first time the asset is used as text.
+
+
+class AssetRegistry:
+    """Keeps the contents of files in memory, reloading them when they change."""
+
+    assets: Dict[str, Asset]
+    checked: Dict[str, float]
+
+    def __init__(self, check_interval: float = 10.0) -> None:
+        self.check_interval = check_interval
+        self.assets = dict()
+        self.checked = dict()
+        self.loads = 0
+
+    def read(self, path: str) -> Asset:
+        """Read a file from disk."""
+        mtime = os.stat(path).st_mtime
+        with open(path, "rb") as f:
+            data = f.read()
+
+        self.loads += 1
+        return Asset(data, mtime, None)
+
+    def get(self, path: str) -> Asset:
+        """
+        Get an asset, reading it if it hasn't been read or has changed on disk.
+
+        Raises OSError if the file has never been read and can't be.
+        """
+        asset = self.assets.get(path)
+        if asset is None:
+            asset = self.read(path)
+            self.assets[path] = asset
+            self.checked[path] = time.monotonic()
+            return asset
+
+        now = time.monotonic()
+        if now - self.checked.get(path, 0.0) < self.check_interval:
+            return asset
+
+        self.checked[path] = now
+        return self.reload_if_changed(path) or asset
+
+    def reload_if_changed(self, path: str) -> Optional[Asset]:
+        """Read an asset again if its file has been modified, returning the new asset if it was."""
+        asset = self.assets.get(path)
+        try:
+            if asset is not None and os.stat(path).st_mtime == asset.mtime:
+                return None
+            new_asset = self.read(path)
+        except OSError as e:
+            log = f"{RED_B}Assets:{CYAN} failed to reload {path}, keeping the old one:"
+            log += f"\n{RED}==> {e}{RESET}"
+            logger.error(log)
+            return None
+
+        self.assets[path] = new_asset
+        logger.info(f"{GREEN_B}Assets:{CYAN} reloaded {path}.{RESET}")
+        return new_asset
+
+    def data(self, path: str) -> bytes:
+        """Get the contents of a file."""
+        return self.get(path).data
+
+    def file(self, path: str, filename: Optional[str] = None) -> File:
+        """Get a discord.File with the contents of a file, named after it unless a filename is given."""
+        if filename is None:
+            filename = os.path.basename(path)
+        return File(BytesIO(self.get(path).data), filename=filename)
+
+    def lines(self, path: str) -> Tuple[str, ...]:
+        """Get the lines of a text file, without surrounding whitespace."""
+        asset = self.get(path)
+        if asset.lines is not None:
+            return asset.lines
+
+        # First time this asset is used as text, split it and keep the lines.
+        lines = tuple(asset.data.decode("utf-8").strip().split("\n"))
+        self.assets[path] = asset._replace(lines=lines)
+        return lines
+
+    def __str__(self) -> str:
+        return f"{len(self.assets)} assets, {self.loads} loads"
+
+
+# The registry used by the bot, shared so each file is only kept in memory once.
+registry = AssetRegistry()
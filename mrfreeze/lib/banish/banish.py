@@ -123,32 +123,10 @@ async def attempt_unbanish(
 
     mentions = ctx.message.mentions
     victims = [ u for u in mentions if not u.guild_permissions.administrator and u != bot.user ]
-    success_list: List[Member] = list()
-    fails_list: List[Member] = list()
-    success_string = ""
-    fails_string = ""
-    error_string = ""
-    http_exception = False
-    forbidden_exception = False
-    other_exception = False
-
-    for victim in victims:
-        error = await mute_db.carry_out_unbanish(bot, victim, logger)
-        if isinstance(error, Exception):
-            fails_list.append(victim)
-            if isinstance(error, discord.HTTPException):
-                http_exception = True
-            elif isinstance(error, discord.Forbidden):
-                forbidden_exception = True
-            else:
-                other_exception = True
-
-        else:
-            success_list.append(victim)
-
-        success_string = default.mentions_list(success_list)
-        fails_string = default.mentions_list(fails_list)
-        error_string = get_error_string(http_exception, forbidden_exception, other_exception)
+    errors = await mute_db.carry_out_unbanish_many(bot, victims, logger)
+    success_list, fails_list, error_string = sort_results(victims, errors)
+    success_string = default.mentions_list(success_list)
+    fails_string = default.mentions_list(fails_list)
 
     template = get_mute_response_type(success_list, fails_list, undo=True)
     logger.debug(f"attempt_banish(): Setting template to {template}")
@@ -177,33 +155,12 @@ async def attempt_banish(
     if coginfo.bot:
         bot: MrFreeze = coginfo.bot
 
-    success_list: List[Member] = list()
-    fails_list: List[Member] = list()
-    success_string = ""
-    fails_string = ""
-    error_string = ""
-    http_exception = False
-    forbidden_exception = False
-    other_exception = False
     duration, end_date = get_unbanish_duration(ctx, template_engine, args)
 
-    for victim in victims:
-        error = await mute_db.carry_out_banish(bot, victim, logger, end_date)
-        if isinstance(error, Exception):
-            fails_list.append(victim)
-            if isinstance(error, discord.HTTPException):
-                http_exception = True
-            elif isinstance(error, discord.Forbidden):
-                forbidden_exception = True
-            else:
-                other_exception = True
-
-        else:
-            success_list.append(victim)
-
-        success_string = default.mentions_list(success_list)
-        fails_string = default.mentions_list(fails_list)
-        error_string = get_error_string(http_exception, forbidden_exception, other_exception)
+    errors = await mute_db.carry_out_banish_many(bot, victims, logger, end_date)
+    success_list, fails_list, error_string = sort_results(victims, errors)
+    success_string = default.mentions_list(success_list)
+    fails_string = default.mentions_list(fails_list)
 
     template = get_mute_response_type(success_list, fails_list)
     logger.debug(f"attempt_banish(): Setting template to {template}")
@@ -229,6 +186,29 @@ async def attempt_banish(
         return f"{ctx.author.mention} Something went wrong, I'm literally at a loss for words."
 
 
+def sort_results(
+    victims: List[Member],
+    errors: List[Optional[Exception]]
+) -> Tuple[List[Member], List[Member], str]:
+    """Split victims into successes and fails by their errors, also return a string describing the errors."""
+    success_list = [ victim for victim, error in zip(victims, errors) if error is None ]
+    fails_list = [ victim for victim, error in zip(victims, errors) if error is not None ]
+
+    # Forbidden is a kind of HTTPException, so those are only counted as a lack of privilegies.
+    forbidden_exception = any(isinstance(error, discord.Forbidden) for error in errors)
+    http_exception = any(
+        isinstance(error, discord.HTTPException) and not isinstance(error, discord.Forbidden)
+        for error in errors
+    )
+    other_exception = any(
+        error is not None and not isinstance(error, discord.HTTPException)
+        for error in errors
+    )
+    error_string = get_error_string(http_exception, forbidden_exception, other_exception)
+
+    return success_list, fails_list, error_string
+
+
 def get_mute_response_type(
     muted: List[Member],
     failed: List[Member],
@@ -1,5 +1,4 @@
 """Module for handling the banish time command."""
-import datetime
 from typing import List
 from typing import Optional
 
@@ -9,6 +8,7 @@ from discord.ext.commands import Context
 from mrfreeze.bot import MrFreeze
 from mrfreeze.cogs.coginfo import CogInfo
 from mrfreeze.cogs.coginfo import InsufficientCogInfo
+from mrfreeze.database import mute_codec
 from mrfreeze.lib.banish import mute_db
 
 
@@ -21,7 +21,7 @@ async def run_command(ctx: Context, coginfo: CogInfo, user: Optional[Member]) ->
 
     user = user or ctx.author
     banish_list: List[mute_db.BanishTuple]
-    banish_list = mute_db.mdb_fetch(bot, user)
+    banish_list = await mute_db.mdb_fetch(bot, user)
     mention = user.mention
 
     msg: Optional[str] = None
@@ -30,13 +30,13 @@ async def run_command(ctx: Context, coginfo: CogInfo, user: Optional[Member]) ->
 
     else:
         until = banish_list[0].until
-        now = datetime.datetime.now()
+        now = mute_codec.now()
 
-        if until and until < now:
+        if until is not None and until < now:
             msg = f"{mention} is due for unbanishment. Hold on a sec."
 
         else:
-            left = bot.parse_timedelta(until - now) if until else "an eternity"
+            left = bot.parse_timedelta(mute_codec.to_timedelta(until - now)) if until is not None else "an eternity"
             msg = f"{mention} has about **{left}** left to go."
 
     if msg:
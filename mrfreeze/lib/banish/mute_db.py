@@ -1,10 +1,13 @@
 """Module for handling various database interractions with the mute_db."""
 
+import asyncio
 from datetime import datetime
 from logging import Logger
+from typing import Any
 from typing import List
 from typing import NamedTuple
 from typing import Optional
+from typing import Tuple
 from typing import Union
 
 import discord
@@ -12,37 +15,59 @@ from discord import Guild
 from discord import Member
 from discord.ext.commands import Bot
 
-from mrfreeze.bot import MrFreeze
+from mrfreeze.database import mute_codec
+from mrfreeze.database.executor import db_executor
+from mrfreeze.database.helpers import db_connect
 from mrfreeze.lib.colors import CYAN
 from mrfreeze.lib.colors import CYAN_B
-from mrfreeze.lib.colors import GREEN
 from mrfreeze.lib.colors import GREEN_B
 from mrfreeze.lib.colors import RED
 from mrfreeze.lib.colors import RED_B
 from mrfreeze.lib.colors import RESET
-from mrfreeze.lib.colors import YELLOW
+
+
+class UncachedMember:
+    """
+    Stand-in for a muted member who isn't in the bot's member cache.
+
+    Only the id of the member is known, but that's enough to mention them
+    or to fetch the full member from Discord when it's needed.
+    """
+
+    __slots__ = ("id", "guild")
+
+    def __init__(self, id: int, guild: Guild) -> None:
+        self.id = id
+        self.guild = guild
+
+    @property
+    def mention(self) -> str:
+        """Mention string for the member."""
+        return f"<@{self.id}>"
+
+    def __repr__(self) -> str:
+        return f"<UncachedMember id={self.id} guild={self.guild.id}>"
 
 
 class BanishTuple(NamedTuple):
-    """NamedTuple for holding banish information."""
+    """NamedTuple for holding banish information, until is in milliseconds since the epoch."""
 
-    member: Member
+    member: Union[Member, UncachedMember]
     voluntary: bool
-    until: datetime
+    until: Optional[int]
 
 
-dbname = "mutes"
-dbtable = f"""CREATE TABLE IF NOT EXISTS {dbname} (
-    id          integer NOT NULL,
-    server      integer NOT NULL,
-    voluntary   boolean NOT NULL,
-    until       date,
-    CONSTRAINT  server_user PRIMARY KEY (id, server));"""
+class DueMute(NamedTuple):
+    """NamedTuple for holding a timed mute which has expired, until is in milliseconds since the epoch."""
+
+    member_id: int
+    server_id: int
+    voluntary: bool
+    until: int
 
 
-def create_table(bot: MrFreeze) -> None:
-    """Create the mutes database if it doesn't exist."""
-    bot.db_create(bot, dbname, dbtable)
+# The mutes table lives in the settings database, see mrfreeze.database.migrations.
+table_name = "mutes"
 
 
 async def carry_out_banish(
@@ -55,155 +80,224 @@ async def carry_out_banish(
 
     Return None if successful, Exception otherwise.
     """
-    server = member.guild
-    roles = member.roles
+    errors = await carry_out_banish_many(bot, [ member ], logger, end_date)
+    return errors[0]
+
+
+async def carry_out_banish_many(
+        bot: Bot,
+        members: List[Member],
+        logger: Logger,
+        end_date: Optional[datetime],
+        concurrency: int = 5) -> List[Optional[Exception]]:
+    """
+    Add the antarctica role to several users of a server, then add them to the db.
+
+    The roles are added concurrently, at most `concurrency` at a time, and everyone
+    who got the role is added to the db in a single transaction.
+
+    Return a list with None for every user that was banished, Exception otherwise.
+    """
+    if not members:
+        return list()
+
+    server = members[0].guild
     mute_role = await bot.get_mute_role(server)
-    result = None
+    semaphore = asyncio.Semaphore(concurrency)
 
-    if mute_role not in roles:
-        try:
-            await member.add_roles(mute_role)
-        except Exception as e:
-            result = e
+    async def add_role(member: Member) -> Optional[Exception]:
+        if mute_role in member.roles:
+            return None
 
-    if not isinstance(result, Exception):
-        mdb_add(bot, member, logger, end_date=end_date)
+        async with semaphore:
+            try:
+                await member.add_roles(mute_role)
+            except Exception as e:
+                return e
+        return None
+
+    errors = await asyncio.gather(*[ add_role(member) for member in members ])
+    banished = [ member for member, error in zip(members, errors) if error is None ]
 
-    return result
+    mutes = await mdb_add_many(bot, banished, logger, end_date=end_date)
+    if bot.unbanish_scheduler is not None:
+        for mute in mutes:
+            bot.unbanish_scheduler.schedule(server.id, mute.member.id, mute.until)
 
+    return errors
 
-async def carry_out_unbanish(
+
+async def carry_out_unbanish_many(
         bot: Bot,
-        member: Member,
-        logger: Logger) -> Union[None, Exception]:
+        members: List[Member],
+        logger: Logger,
+        concurrency: int = 5) -> List[Optional[Exception]]:
     """
-    Remove the antarctica role from a user, then remove them from the db.
+    Remove the antarctica role from several users of a server, then remove them from the db.
 
-    Return None if successful, Exception otherwise.
+    The roles are removed concurrently, at most `concurrency` at a time, and everyone
+    who no longer has the role is removed from the db in a single transaction.
+
+    Return a list with None for every user that was unbanished, Exception otherwise.
     """
-    server = member.guild
-    roles = member.roles
+    if not members:
+        return list()
+
+    server = members[0].guild
     mute_role = await bot.get_mute_role(server)
-    result = None
+    semaphore = asyncio.Semaphore(concurrency)
 
-    if mute_role in roles:
-        try:
-            await member.remove_roles(mute_role)
-        except Exception as e:
-            result = e
+    async def remove_role(member: Member) -> Optional[Exception]:
+        if mute_role not in member.roles:
+            return None
+
+        async with semaphore:
+            try:
+                await member.remove_roles(mute_role)
+            except Exception as e:
+                return e
+        return None
+
+    errors = await asyncio.gather(*[ remove_role(member) for member in members ])
+    unbanished = [ member.id for member, error in zip(members, errors) if error is None ]
+
+    await mdb_del_many(bot, server, unbanished, logger)
+    if bot.unbanish_scheduler is not None:
+        for member_id in unbanished:
+            bot.unbanish_scheduler.cancel(server.id, member_id)
+
+    return errors
 
-    if not isinstance(result, Exception):
-        mdb_del(bot, member, logger)
 
-    return result
+# Insert a mute, or update the existing one. When prolonging a timed mute with
+# another timed mute the time remaining of the new mute is added to the old one,
+# otherwise the new mute replaces the old one.
+upsert_sql = f"""
+INSERT INTO {table_name} (id, server, voluntary, until)
+    VALUES (:id, :server, :voluntary, :until)
+ON CONFLICT(id, server) DO UPDATE SET
+    voluntary = excluded.voluntary,
+    until = CASE
+        WHEN :prolong AND excluded.until IS NOT NULL AND {table_name}.until IS NOT NULL
+            THEN MIN({table_name}.until + (excluded.until - :now), :max_until)
+        ELSE excluded.until
+    END;
+"""
 
 
-def mdb_add(
+async def mdb_add_many(
         bot: Bot,
-        user: Member,
+        users: List[Member],
         logger: Logger,
         voluntary: bool = False,
         end_date: Optional[datetime] = None,
-        prolong: bool = True) -> bool:
-    """Add a new user to the mutes database."""
-    uid = user.id
-    server = user.guild.id
-    servername = user.guild.name
-    name = f"{user.name}#{user.discriminator}"
-    error = None
-    until = str()     # this string is filled in if called with an end_date
-    duration = str()  # this string too
-
-    current_mute = mdb_fetch(bot, user)
-    is_muted = len(current_mute) != 0
-    if is_muted:
-        # Always delete existing mutes
-        mdb_del(bot, user, logger)
-
-    if is_muted and end_date is not None and prolong:
-        old_until = current_mute[0].until
-        # if current mute is permanent just replace it with a timed one
-        if old_until is not None:
-            diff = end_date - datetime.now()
-            try:
-                end_date = old_until + diff
-            except OverflowError:
-                end_date = datetime.max
+        prolong: bool = True) -> List[BanishTuple]:
+    """
+    Add several users of the same server to the mutes database, or update their existing mutes.
+
+    Return the mutes as they were stored, or an empty list if they couldn't be stored.
+    """
+    return await db_executor.run(mdb_add_many_blocking, bot, users, logger, voluntary, end_date, prolong)
 
-    with bot.db_connect(bot, dbname) as conn:
-        c = conn.cursor()
-        if end_date is not None:
-            # Collect time info in string format for the log
-            until = bot.db_time(end_date)
-            until = f"\n{GREEN}==> Until: {until} {RESET}"
 
-            duration_delta = end_date - datetime.now()
-            duration_delta = bot.parse_timedelta(duration_delta)
-            duration = f"{YELLOW}(in {duration_delta}){RESET}"
+def mdb_add_many_blocking(
+        bot: Bot,
+        users: List[Member],
+        logger: Logger,
+        voluntary: bool = False,
+        end_date: Optional[datetime] = None,
+        prolong: bool = True) -> List[BanishTuple]:
+    """Add several users of the same server to the mutes database in one transaction, blocking until done."""
+    if not users:
+        return list()
+
+    server = users[0].guild
+    current_time = mute_codec.now()
+    until = mute_codec.encode(end_date)
+    values = [
+        {
+            "id": user.id,
+            "server": server.id,
+            "voluntary": voluntary,
+            "until": until,
+            "prolong": prolong,
+            "now": current_time,
+            "max_until": mute_codec.MAX_UNTIL,
+        }
+        for user in users
+    ]
+
+    with db_connect(bot.settings.dbpath) as conn:
+        c = conn.cursor()
+        try:
+            c.executemany(upsert_sql, values)
+            placeholders = ", ".join("?" * len(users))
+            sql = f"SELECT id, voluntary, until FROM {table_name} WHERE server = ? AND id IN ({placeholders})"
+            rows = c.execute(sql, [ server.id ] + [ user.id for user in users ]).fetchall()
+        except Exception as error:
+            conn.rollback()
+            log = f"{RED_B}Mutes DB:{CYAN} failed adding {len(users)} users to DB: "
+            log += f"{CYAN_B}@ {server.name}{CYAN}:\n{RED}==> {error}{RESET}"
+            logger.info(log)
+            return list()
 
-            # Turn datetime object into string
-            end_date = bot.db_time(end_date)
+    by_id = { user.id: user for user in users }
+    log = f"{GREEN_B}Mutes DB:{CYAN} added {len(rows)} users to DB: "
+    log += f"{CYAN_B}@ {server.name}{CYAN}.{RESET}"
+    logger.info(log)
+    return [ BanishTuple(member=by_id[row[0]], voluntary=bool(row[1]), until=row[2]) for row in rows ]
 
-            sql = f"INSERT INTO {dbname}(id, server, voluntary, until) "
-            sql += "VALUES(?,?,?,?)"
 
-            try:
-                c.execute(sql, (uid, server, voluntary, end_date))
-            except Exception as e:
-                error = e
+async def mdb_del_many(
+        bot: Bot,
+        server: Guild,
+        member_ids: List[int],
+        logger: Logger,
+        expired_by: Optional[int] = None) -> bool:
+    """
+    Remove several users of the same server from the mutes database.
 
-        elif end_date is None:
-            sql = f"INSERT INTO {dbname}(id, server, voluntary) VALUES(?,?,?)"
-            try:
-                c.execute(sql, (uid, server, voluntary))
-            except Exception as e:
-                error = e
+    If expired_by is given, only mutes which had expired by then are removed,
+    so that mutes which were renewed or prolonged in the meantime are kept.
+    """
+    return await db_executor.run(mdb_del_many_blocking, bot, server, member_ids, logger, expired_by)
 
-    if error is None:
-        log = f"{GREEN_B}Mutes DB:{CYAN} added user to DB: "
-        log += f"{CYAN_B}{name} @ {servername}{CYAN}.{RESET}{until}{duration}"
-        logger.info(log)
-        return True
 
-    else:
-        log = f"{RED_B}Mutes DB:{CYAN} failed adding to DB: "
-        log += f"{CYAN_B}{name} @ {servername}{CYAN}:\n{RED}==> {error}{RESET}"
-        logger.info(log)
-        return False
-
-
-def mdb_del(bot: Bot, user: Member, logger: Logger) -> bool:
-    """Remove a user from the mutes database."""
-    uid = user.id
-    server = user.guild.id
-    servername = user.guild.name
-    name = f"{user.name}#{user.discriminator}"
-
-    is_muted = len(mdb_fetch(bot, user)) != 0
-    if not is_muted:
-        log = f"{GREEN_B}Mutes DB:{CYAN} user already not in DB: "
-        log += f"{CYAN_B}{name} @ {servername}{CYAN}.{RESET}"
-        logger.info(log)
+def mdb_del_many_blocking(
+        bot: Bot,
+        server: Guild,
+        member_ids: List[int],
+        logger: Logger,
+        expired_by: Optional[int] = None) -> bool:
+    """Remove several users of the same server from the mutes database in one transaction, blocking until done."""
+    if not member_ids:
         return True
 
-    with bot.db_connect(bot, dbname) as conn:
-        c = conn.cursor()
-        sql = f"DELETE FROM {dbname} WHERE id = ? AND server = ?"
+    values: List[Tuple[int, ...]]
+    with db_connect(bot.settings.dbpath) as conn:
+        if expired_by is None:
+            sql = f"DELETE FROM {table_name} WHERE id = ? AND server = ?"
+            values = [ (member_id, server.id) for member_id in member_ids ]
+        else:
+            sql = f"DELETE FROM {table_name} WHERE id = ? AND server = ? AND until IS NOT NULL AND until <= ?"
+            values = [ (member_id, server.id, expired_by) for member_id in member_ids ]
 
         try:
-            c.execute(sql, (uid, server))
-            log = f"{GREEN_B}Mutes DB:{CYAN} removed user from DB: "
-            log += f"{CYAN_B}{name} @ {servername}{CYAN}.{RESET}"
-            logger.info(log)
-            return True
-
+            conn.executemany(sql, values)
         except Exception as error:
-            log = f"{RED_B}Mutes DB:{CYAN} failed to remove from DB: \n{RED}==> {error}{RESET}"
+            conn.rollback()
+            log = f"{RED_B}Mutes DB:{CYAN} failed to remove {len(member_ids)} users from DB: "
+            log += f"\n{RED}==> {error}{RESET}"
             logger.error(log)
             return False
 
+    log = f"{GREEN_B}Mutes DB:{CYAN} removed {len(member_ids)} users from DB: "
+    log += f"{CYAN_B}@ {server.name}{CYAN}.{RESET}"
+    logger.info(log)
+    return True
+
 
-def mdb_fetch(bot: Bot, in_data: Union[Member, Guild]) -> List[BanishTuple]:
+async def mdb_fetch(bot: Bot, in_data: Union[Member, Guild]) -> List[BanishTuple]:
     """
     Return user or server mute information.
 
@@ -217,26 +311,103 @@ def mdb_fetch(bot: Bot, in_data: Union[Member, Guild]) -> List[BanishTuple]:
         # This should never happen, no point in even logging it.
         raise TypeError(f"Expected discord.Member or discord.Guild, got {type(in_data)}")
 
-    with bot.db_connect(bot, dbname) as conn:
+    if is_member:
+        server = in_data.guild
+        rows = await db_executor.run(mdb_fetch_rows, bot, server.id, in_data.id)
+    else:
+        server = in_data
+        rows = await db_executor.run(mdb_fetch_rows, bot, server.id)
+
+    return [
+        BanishTuple(
+            member = in_data if is_member else resolve_member(server, int(entry[0])),
+            voluntary = bool(entry[2]),
+            until = entry[3]
+        )
+        for entry in rows
+    ]
+
+
+def resolve_member(server: Guild, member_id: int) -> Union[Member, UncachedMember]:
+    """Look a member up in the member cache, falling back to an id-only stand-in."""
+    return server.get_member(member_id) or UncachedMember(member_id, server)
+
+
+def mdb_fetch_rows(bot: Bot, server_id: int, member_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """
+    Return the raw mute rows for a server, blocking until done.
+
+    If a member ID is given, only the row for that member is returned.
+    """
+    with db_connect(bot.settings.dbpath) as conn:
+        c = conn.cursor()
+        if member_id is not None:
+            sql = f' SELECT * FROM {table_name} WHERE id = ? AND server = ? '
+            c.execute(sql, (member_id, server_id))
+        else:
+            sql = f' SELECT * FROM {table_name} WHERE server = ? '
+            c.execute(sql, (server_id,))
+
+        return c.fetchall()
+
+
+async def mdb_fetch_due(
+        bot: Bot,
+        server: Optional[Guild] = None,
+        now: Optional[int] = None) -> List[DueMute]:
+    """
+    Return the timed mutes which have expired, the earliest first.
+
+    If a server is given only mutes from that server are returned,
+    otherwise the expired mutes of all servers are returned.
+    Times are in milliseconds since the epoch, see mute_codec.
+    """
+    now = now if now is not None else mute_codec.now()
+    server_id = server.id if server is not None else None
+    rows = await db_executor.run(mdb_fetch_due_rows, bot, now, server_id)
+
+    return [
+        DueMute(
+            member_id = int(entry[0]),
+            server_id = int(entry[1]),
+            voluntary = bool(entry[2]),
+            until = entry[3]
+        )
+        for entry in rows
+    ]
+
+
+def mdb_fetch_due_rows(bot: Bot, now: int, server_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """Return the raw rows of expired timed mutes, blocking until done."""
+    with db_connect(bot.settings.dbpath) as conn:
+        c = conn.cursor()
+        if server_id is not None:
+            sql = f"""
+            SELECT id, server, voluntary, until FROM {table_name}
+            WHERE server = ? AND until IS NOT NULL AND until < ?
+            ORDER BY until;
+            """
+            c.execute(sql, (server_id, now))
+        else:
+            sql = f"""
+            SELECT id, server, voluntary, until FROM {table_name}
+            WHERE until IS NOT NULL AND until < ?
+            ORDER BY until;
+            """
+            c.execute(sql, (now,))
+
+        return c.fetchall()
+
+
+async def mdb_fetch_expiries(bot: Bot) -> List[Tuple[int, int, int]]:
+    """Return (server id, member id, until) for every timed mute of every server."""
+    return await db_executor.run(mdb_fetch_expiries_rows, bot)
+
+
+def mdb_fetch_expiries_rows(bot: Bot) -> List[Tuple[int, int, int]]:
+    """Return (server id, member id, until) for every timed mute, blocking until done."""
+    with db_connect(bot.settings.dbpath) as conn:
         c = conn.cursor()
-        fetch_id = in_data.id
-        if is_member:
-            server = in_data.guild
-            sql = f' SELECT * FROM {dbname} WHERE id = ? AND server = ? '
-            c.execute(sql, (fetch_id, server.id))
-
-        elif is_server:
-            server = in_data
-            sql = f' SELECT * FROM {dbname} WHERE server = ? '
-            c.execute(sql, (fetch_id,))
-
-        output = [
-            BanishTuple(
-                member = discord.utils.get(server.members, id=int(entry[0])),
-                voluntary = bool(entry[2]),
-                until = bot.db_time(entry[3])
-            )
-            for entry in c.fetchall()
-        ]
-
-    return output
+        sql = f"SELECT server, id, until FROM {table_name} WHERE until IS NOT NULL"
+        c.execute(sql)
+        return c.fetchall()
@@ -0,0 +1,246 @@
+"""
+Scheduler for automatic unbanishments.
+
+All timed mutes are kept in a min-heap ordered by when they expire. The
+scheduler sleeps until the earliest of them is due, unbanishes everyone
+whose mute has expired by then and goes back to sleep, so nothing at all
+happens while nobody is due.
+
+Whenever a mute is added, changed or removed the scheduler is told through
+schedule() or cancel(), which wakes it up so it can recalculate how long
+to sleep. Entries in the heap are never removed when a mute changes.
+Instead the current expiry of every mute is kept in a dict, and entries
+in the heap which don't match it are skipped when they reach the top.
+
+Mutes in servers the bot can't see, for example because it's been removed
+from them, are retried with a delay which doubles every time up to max_sleep.
+"""
+
+import asyncio
+import heapq
+from logging import Logger
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from discord.ext.commands import Bot
+
+from mrfreeze.database import mute_codec
+from mrfreeze.lib.banish import mute_db
+from mrfreeze.lib.banish.unbanish_loop import unbanish_due
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import GREEN_B
+from mrfreeze.lib.colors import RED
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
+
+# (server id, member id)
+MuteKey = Tuple[int, int]
+
+
+class UnbanishScheduler:
+    """Unbanishes members when their mutes expire."""
+
+    heap: List[Tuple[int, int, int]]
+    deadlines: Dict[MuteKey, int]
+    # Server id -> seconds to wait before trying a server that wasn't found again.
+    missing_servers: Dict[int, int]
+    wakeup: Optional[asyncio.Event]
+
+    def __init__(
+        self,
+        bot: Bot,
+        logger: Logger,
+        default_retry_interval: int = 60,
+        max_sleep: int = 3600,
+        catch_up_concurrency: int = 5
+    ) -> None:
+        self.bot = bot
+        self.logger = logger
+        self.default_retry_interval = default_retry_interval
+        self.max_sleep = max_sleep
+        self.catch_up_concurrency = catch_up_concurrency
+
+        self.heap = list()
+        self.deadlines = dict()
+        self.missing_servers = dict()
+        self.wakeup = None
+
+    def schedule(self, server_id: int, member_id: int, until: Optional[int]) -> None:
+        """
+        Schedule (or reschedule) the unbanishment of a member.
+
+        Until is in milliseconds since the epoch, None means that the
+        mute is permanent and that the member should never be unbanished.
+        """
+        key = (server_id, member_id)
+        if until is None:
+            self.deadlines.pop(key, None)
+        else:
+            self.deadlines[key] = until
+            heapq.heappush(self.heap, (until, server_id, member_id))
+
+        self.wake()
+
+    def cancel(self, server_id: int, member_id: int) -> None:
+        """Stop tracking the mute of a member, for example because they've been unbanished."""
+        if self.deadlines.pop((server_id, member_id), None) is not None:
+            self.wake()
+
+    def wake(self) -> None:
+        """Wake the scheduler up so it can recalculate when the next mute is due."""
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def next_deadline(self) -> Optional[int]:
+        """Return the next time a mute expires, discarding stale entries from the heap."""
+        while self.heap:
+            until, server_id, member_id = self.heap[0]
+            if self.deadlines.get((server_id, member_id)) == until:
+                return until
+            heapq.heappop(self.heap)
+
+        return None
+
+    def pop_due(self, now: int) -> Dict[int, List[mute_db.DueMute]]:
+        """Remove all mutes due at the given time from the schedule, grouped by server id."""
+        due: Dict[int, List[mute_db.DueMute]] = dict()
+
+        while True:
+            until = self.next_deadline()
+            if until is None or until > now:
+                break
+
+            until, server_id, member_id = heapq.heappop(self.heap)
+            del self.deadlines[(server_id, member_id)]
+            due.setdefault(server_id, list()).append(
+                mute_db.DueMute(member_id=member_id, server_id=server_id, voluntary=False, until=until))
+
+        return due
+
+    async def load(self) -> None:
+        """Schedule every timed mute in the database."""
+        expiries = await mute_db.mdb_fetch_expiries(self.bot)
+        for server_id, member_id, until in expiries:
+            # Mutes scheduled while loading, or by the catch-up, are more up to date.
+            if (server_id, member_id) in self.deadlines:
+                continue
+            self.deadlines[(server_id, member_id)] = until
+            self.heap.append((until, server_id, member_id))
+
+        heapq.heapify(self.heap)
+        self.logger.info(f"{GREEN_B}Unbanish scheduler:{CYAN} scheduled {len(expiries)} timed mutes{RESET}")
+
+    async def catch_up(self) -> None:
+        """
+        Unbanish everyone whose mute expired while the bot was offline.
+
+        All overdue mutes are fetched in a single query, and several servers
+        are processed at the same time. Mutes which can't be carried out are
+        scheduled to be tried again later.
+        """
+        now = mute_codec.now()
+        overdue = await mute_db.mdb_fetch_due(self.bot, now=now)
+        if not overdue:
+            self.logger.info(f"{GREEN_B}Unbanish scheduler:{CYAN} no overdue mutes to catch up on{RESET}")
+            return
+
+        by_server: Dict[int, List[mute_db.DueMute]] = dict()
+        for mute in overdue:
+            by_server.setdefault(mute.server_id, list()).append(mute)
+
+        semaphore = asyncio.Semaphore(self.catch_up_concurrency)
+
+        async def catch_up_server(server_id: int, due_mutes: List[mute_db.DueMute]) -> int:
+            async with semaphore:
+                return await self.unbanish_server(server_id, due_mutes)
+
+        failed = await asyncio.gather(*[
+            catch_up_server(server_id, due_mutes)
+            for server_id, due_mutes in by_server.items()
+        ])
+
+        lateness = [ now - mute.until for mute in overdue ]
+        most_late = self.bot.parse_timedelta(mute_codec.to_timedelta(max(lateness)))
+        average_late = self.bot.parse_timedelta(mute_codec.to_timedelta(sum(lateness) // len(lateness)))
+
+        log = f"{GREEN_B}Unbanish scheduler:{CYAN} caught up on {len(overdue)} overdue mutes "
+        log += f"in {len(by_server)} servers, {sum(failed)} to be retried. "
+        log += f"They were up to {most_late or 'no time'} late ({average_late or 'no time'} on average). "
+        log += f"Member lookups so far: {self.bot.member_resolver}.{RESET}"
+        self.logger.info(log)
+
+    async def run(self) -> None:
+        """
+        Unbanish members as their mutes expire.
+
+        Mutes which expired while the bot was offline are dealt with first,
+        then the remaining timed mutes are loaded from the database.
+        """
+        self.wakeup = asyncio.Event()
+        await self.start()
+
+        while not self.bot.is_closed():
+            self.wakeup.clear()
+
+            now = mute_codec.now()
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                # Sleep until the next mute is due or the schedule changes.
+                timeout: float = self.max_sleep
+                if deadline is not None:
+                    timeout = min(timeout, (deadline - now) / 1000)
+
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for server_id, due_mutes in self.pop_due(now).items():
+                await self.unbanish_server(server_id, due_mutes)
+
+    async def start(self) -> None:
+        """Catch up on overdue mutes and load the rest, trying again until it works."""
+        while not self.bot.is_closed():
+            try:
+                await self.catch_up()
+                await self.load()
+                return
+            except Exception as e:
+                log = f"{RED_B}Unbanish scheduler:{CYAN} failed to load mutes, "
+                log += f"trying again in {self.default_retry_interval} seconds.\n{RED}==> {e}{RESET}"
+                self.logger.error(log)
+                await asyncio.sleep(self.default_retry_interval)
+
+    async def unbanish_server(self, server_id: int, due_mutes: List[mute_db.DueMute]) -> int:
+        """Unbanish due members of a server, rescheduling those that fail. Return the number of failures."""
+        server = self.bot.get_guild(server_id)
+        if server is None:
+            # We're not in this server anymore, or it's unavailable.
+            interval = self.missing_servers.get(server_id, self.default_retry_interval)
+            self.missing_servers[server_id] = min(interval * 2, self.max_sleep)
+            self.logger.debug(f"Unbanish scheduler: server {server_id} not found, trying again in {interval}s.")
+            self.reschedule(server_id, due_mutes, interval)
+            return len(due_mutes)
+
+        self.missing_servers.pop(server_id, None)
+
+        try:
+            failed = await unbanish_due(self.bot, self.logger, server, due_mutes)
+        except Exception as e:
+            self.logger.error(f"Unbanish scheduler: failed to unbanish members of {server.name}: {e}")
+            failed = due_mutes
+
+        interval = self.bot.settings.get_mute_interval(server) or self.default_retry_interval
+        self.reschedule(server_id, failed, interval)
+        return len(failed)
+
+    def reschedule(self, server_id: int, mutes: List[mute_db.DueMute], seconds: int) -> None:
+        """Schedule mutes which couldn't be carried out to be tried again in a while."""
+        retry_at = mute_codec.now() + seconds * 1000
+        for mute in mutes:
+            # Don't overwrite the mute if it's been changed in the meantime.
+            if (server_id, mute.member_id) not in self.deadlines:
+                self.schedule(server_id, mute.member_id, retry_at)
@@ -1,6 +1,17 @@
-"""Module for reading the string template responses for banish."""
+"""
+Module for reading the string template responses for banish.
+
+All command names are indexed in a single dict, so looking up the template
+and command type for an invocation is one dict lookup. The template files
+can be reloaded while the bot is running; a new set of templates is only
+swapped in once all the files have been parsed successfully. Changes to the
+response texts take effect right away, but since the command names are
+registered as aliases when the cog is loaded, new names require a restart.
+"""
 
 import itertools
+import logging
+import os
 from enum import Enum
 from enum import auto
 from string import Template
@@ -10,11 +21,20 @@ from typing import Iterable
 from typing import List
 from typing import MutableMapping
 from typing import Optional
+from typing import Tuple
+
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import GREEN_B
+from mrfreeze.lib.colors import RED
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
 
 import toml
 
+logger = logging.getLogger("BanishTemplates")
 
-# List of all the template files that should be loaded.
+# Directory the template files are in, and list of all the files that should be loaded.
+directory = "config/banish_templates"
 files = [
     "mute.toml", "banish.toml", "hogtie.toml"
 ]
@@ -89,32 +109,18 @@ class BanishTemplate:
     names_micro: List[str]
     names_super: List[str]
     names_mega: List[str]
+    command_types: Dict[str, MuteCommandType]
     templates: Dict[MuteResponseType, Template]
 
-    def __init__(self, file: str, others: List["BanishTemplate"]) -> None:
-        self.data = toml.load(f"config/banish_templates/{file}")
+    def __init__(self, file: str, others: List["BanishTemplate"], directory: str = directory) -> None:
+        self.data = toml.load(os.path.join(directory, file))
         self.filename = file
         self.parse_names(others)
         self.parse_templates()
 
     def get_command_type(self, invocation: str) -> Optional[MuteCommandType]:
         """Return the appropriate MuteCommandType based on invocation used."""
-        if invocation in self.names_main:
-            return MuteCommandType.MAIN
-
-        elif invocation in self.names_undo:
-            return MuteCommandType.UNDO
-
-        elif invocation in self.names_micro:
-            return MuteCommandType.MICRO
-
-        elif invocation in self.names_super:
-            return MuteCommandType.SUPER
-
-        elif invocation in self.names_mega:
-            return MuteCommandType.MEGA
-
-        return None
+        return self.command_types.get(invocation)
 
     def get_template(self, mute_response: MuteResponseType) -> Optional[Template]:
         """Return the appropriate template."""
@@ -122,11 +128,11 @@ class BanishTemplate:
 
     def has_name(self, name: str) -> bool:
         """Check if this template has this name."""
-        return name in self.names
+        return name in self.command_types
 
     def has_any_name(self, names: List[str]) -> bool:
         """Check if this template has any name in the list."""
-        return any([ name in self.names for name in names ])
+        return any([ name in self.command_types for name in names ])
 
     def parse_names(self, others: List['BanishTemplate']) -> None:
         """Read this template's command names from data."""
@@ -150,6 +156,18 @@ class BanishTemplate:
         self.names = self.names_main + self.names_undo
         self.names += self.names_micro + self.names_super + self.names_mega
 
+        # The first command type a name is listed under wins, like it used to.
+        self.command_types = dict()
+        for command_type, type_names in [
+            (MuteCommandType.MAIN, self.names_main),
+            (MuteCommandType.UNDO, self.names_undo),
+            (MuteCommandType.MICRO, self.names_micro),
+            (MuteCommandType.SUPER, self.names_super),
+            (MuteCommandType.MEGA, self.names_mega),
+        ]:
+            for name in type_names or list():
+                self.command_types.setdefault(name, command_type)
+
         # Check for duplicates
         for other in others:
             if not other.has_any_name(self.names):
@@ -192,14 +210,68 @@ class TemplateEngine:
     """Class for holding all templates."""
 
     templates: List[BanishTemplate]
-
-    def __init__(self, files: Iterable[str] = files) -> None:
-        self.templates = list()
-
-        for file in files:
-            new_template = BanishTemplate(file, self.templates)
-            new_template.parse_names(self.templates)
-            self.templates.append(new_template)
+    index: Dict[str, Tuple[BanishTemplate, MuteCommandType]]
+    mtimes: Dict[str, float]
+
+    def __init__(self, files: Iterable[str] = files, directory: str = directory) -> None:
+        self.files = list(files)
+        self.directory = directory
+        self.mtimes = self.get_mtimes()
+        self.templates, self.index = self.load()
+
+    def load(self) -> Tuple[List[BanishTemplate], Dict[str, Tuple[BanishTemplate, MuteCommandType]]]:
+        """Parse all the template files and index them by command name."""
+        templates: List[BanishTemplate] = list()
+        index: Dict[str, Tuple[BanishTemplate, MuteCommandType]] = dict()
+
+        for file in self.files:
+            new_template = BanishTemplate(file, templates, self.directory)
+            templates.append(new_template)
+            for name, command_type in new_template.command_types.items():
+                index[name] = (new_template, command_type)
+
+        return templates, index
+
+    def get_mtimes(self) -> Dict[str, float]:
+        """Get the modification time of every template file, files that can't be read are left out."""
+        mtimes = dict()
+        for file in self.files:
+            try:
+                mtimes[file] = os.stat(os.path.join(self.directory, file)).st_mtime
+            except OSError:
+                pass
+        return mtimes
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the templates if any of the files have been modified since they were last read.
+
+        If any of the files can't be parsed the current templates are kept.
+        Return True if new templates were swapped in.
+        """
+        mtimes = self.get_mtimes()
+        if mtimes == self.mtimes:
+            return False
+
+        # Remember the new times even if parsing fails, so a broken
+        # file isn't parsed over and over until it's fixed.
+        self.mtimes = mtimes
+        try:
+            templates, index = self.load()
+        except (OSError, toml.TomlDecodeError, DuplicateAliasException,
+                MissingNameException, MissingTemplateException) as e:
+            log = f"{RED_B}Banish templates:{CYAN} failed to reload, keeping the old ones:"
+            log += f"\n{RED}==> {e}{RESET}"
+            logger.error(log)
+            return False
+
+        if index.keys() != self.index.keys():
+            logger.warning("Banish templates: command names have changed, this requires a restart.")
+
+        # Swap both in with a single assignment.
+        self.templates, self.index = templates, index
+        logger.info(f"{GREEN_B}Banish templates:{CYAN} reloaded {len(templates)} template files.{RESET}")
+        return True
 
     def get_aliases(self) -> List[str]:
         """Get a list of all command names."""
@@ -208,21 +280,17 @@ class TemplateEngine:
 
     def get_banish_template(self, invocation: str) -> Optional[BanishTemplate]:
         """Return the appropriate templates based on invocation used."""
-        for template in self.templates:
-            if template.has_name(invocation):
-                return template
-        return None
+        entry = self.index.get(invocation)
+        return entry[0] if entry else None
 
     def get_command_type(self, invocation: str) -> Optional[MuteCommandType]:
         """Return the appropriate MuteCommandType based on invocation used."""
-        template = self.get_banish_template(invocation)
-        if template:
-            return template.get_command_type(invocation)
-        return None
+        entry = self.index.get(invocation)
+        return entry[1] if entry else None
 
     def get_template(self, invocation: str, mute_response: MuteResponseType) -> Optional[Template]:
         """Return the appropriate template."""
-        banish_template = self.get_banish_template(invocation)
-        if banish_template:
-            return banish_template.get_template(mute_response)
+        entry = self.index.get(invocation)
+        if entry:
+            return entry[0].get_template(mute_response)
         return None
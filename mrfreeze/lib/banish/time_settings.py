@@ -27,7 +27,7 @@ async def set_self_mute(ctx: Context, bot: MrFreeze, proposed_time: Optional[int
         msg += f"{new_time} is more than a day!"
 
     else:
-        setting_saved = bot.settings.set_self_mute_time(server, proposed_time)
+        setting_saved = await bot.settings.set_self_mute_time_async(server, proposed_time)
         if setting_saved:
             msg = f"{mention} The self mute time has been changed from "
             msg += f"{old_time} to {new_time}."
@@ -64,7 +64,7 @@ async def set_banish_interval(ctx: Context, bot: MrFreeze, interval: Optional[in
         msg += "You really shouldn't set it that low."
 
     else:
-        setting_saved = bot.settings.set_mute_interval(server, interval)
+        setting_saved = await bot.settings.set_mute_interval_async(server, interval)
 
         if setting_saved:
             msg = f"{mention} The interval has been changed from {old_time} to "
@@ -1,12 +1,16 @@
 """Module for handling automatic unbanishments."""
 import asyncio
-import datetime
 from logging import Logger
+from typing import List
+from typing import Optional
+from typing import Tuple
 
 from discord import Guild
+from discord import Member
+from discord import Role
 
 from mrfreeze.bot import MrFreeze
-from mrfreeze.cogs.coginfo import CogInfo
+from mrfreeze.database import mute_codec
 from mrfreeze.lib import default
 from mrfreeze.lib.banish import mute_db
 from mrfreeze.lib.colors import CYAN
@@ -17,93 +21,127 @@ from mrfreeze.lib.colors import RESET
 from mrfreeze.lib.colors import YELLOW
 
 
-async def unbanish_loop(server: Guild, coginfo: CogInfo) -> None:
-    """Check for people to unbanish every self.banish_interval seconds."""
-    if coginfo.bot and coginfo.logger and coginfo.default_mute_interval:
-        bot: MrFreeze = coginfo.bot
-        logger: Logger = coginfo.logger
-        default_mute_interval: int = coginfo.default_mute_interval
+async def unbanish_due(
+        bot: MrFreeze,
+        logger: Logger,
+        server: Guild,
+        due_mutes: List[mute_db.DueMute],
+        concurrency: int = 5) -> List[mute_db.DueMute]:
+    """
+    Unbanish the members of a server whose mutes have expired.
+
+    Up to `concurrency` members are processed at the same time. Requests which hit
+    Discord's rate limits are held back and retried by discord.py's HTTP client, per
+    rate limit bucket, so the limit here is just to avoid queueing up too much at once.
+    The mutes of all processed members are then removed from the database in one go,
+    and a single message is posted about everyone who was unmuted.
+
+    Return the mutes which couldn't be carried out and should be tried again later.
+    """
+    # Fetch mute role/channel, which might fail.
+    try:
+        mute_role = await bot.get_mute_role(server)
+        mute_channel = await bot.get_mute_channel(server, silent=True)
+    except Exception:
+        logger.warning(f"{server.name} Unbanish failed to fetch mute role or channel.")
+        return due_mutes
+
+    current_time = mute_codec.now()
+    semaphore = asyncio.Semaphore(concurrency)
+    logger.debug(f"{server.name} due mutes: {len(due_mutes)}")
+
+    async def unbanish_one(mute: mute_db.DueMute) -> Tuple[bool, Optional[Member]]:
+        """Remove the mute role from a member, return whether it's done and the member if they were unmuted."""
+        async with semaphore:
+            return await unbanish_member(bot, logger, server, mute_role, mute, current_time)
+
+    results = await asyncio.gather(*[ unbanish_one(mute) for mute in due_mutes ])
+
+    failed = [ mute for mute, (done, _) in zip(due_mutes, results) if not done ]
+    processed = [ mute.member_id for mute, (done, _) in zip(due_mutes, results) if done ]
+    unmuted = [ member for _, member in results if member is not None ]
+    logger.debug(f"{server.name} member lookups: {bot.member_resolver}")
+
+    # Remove from database, unless they've been banished again while we were at it.
+    await mute_db.mdb_del_many(bot, server, processed, logger, expired_by=current_time)
+
+    # Time for some great regrets
+    if len(unmuted) > 0:
+        unmuted_str = default.mentions_list(unmuted)
+
+        if len(unmuted) == 1:
+            msg = "It's with great regret that I must inform you all that "
+            msg += f"{unmuted_str}'s exile has come to an end."
+        else:
+            msg = "It's with great regret that I must inform you all that the exile of "
+            msg += f"{unmuted_str} has come to an end."
+
+        await mute_channel.send(msg)
+
+    return failed
+
+
+async def unbanish_member(
+        bot: MrFreeze,
+        logger: Logger,
+        server: Guild,
+        mute_role: Role,
+        mute: mute_db.DueMute,
+        current_time: int) -> Tuple[bool, Optional[Member]]:
+    """
+    Remove the mute role from a member whose mute has expired.
+
+    Return whether the mute has been dealt with, which it has unless the member
+    couldn't be looked up, and the member if they had the mute role removed.
+    """
+    logger.debug(f"{mute} is due for unbanish!")
+
+    # The member cache is kept up to date by the gateway, so this
+    # only needs to ask the API if the member isn't in it.
+    try:
+        member = await bot.member_resolver.resolve(server, mute.member_id)
+    except Exception as e:
+        logger.error(f"Failed to refresh muted member: {e}")
+        return False, None  # Will try again later
+
+    if member is None:
+        log = f"User {YELLOW}{mute.member_id}{CYAN_B} @ {MAGENTA} {server.name}{CYAN} "
+        log += f"due for unmute but has left the server.{RESET}"
+        logger.info(log)
+        return True, None
+
+    logger.debug(f"Refreshed {member}, they have {len(member.roles)} roles.")
+
+    # Calculate how late we were in unbanishing
+    diff = bot.parse_timedelta(mute_codec.to_timedelta(current_time - mute.until))
+    if diff == "":
+        diff = "now"
     else:
-        raise Exception("Failed to create unbanish loop, insufficient cog info.")
+        diff = f"{diff} ago"
 
-    while not bot.is_closed():
-        # Wait the time specified by the server (or the default time) before running
-        interval = bot.settings.get_mute_interval(server) or default_mute_interval
-        logger.debug(f"Running unbanish loop for {server.name} in {interval}.")
-        await asyncio.sleep(interval)
-        logger.debug(f"Running unbanish loop for {server.name}.")
-
-        # Fetch mute role/channel, which might fail.
+    if mute_role in member.roles:
+        logger.debug(f"{member} has the mute role! Removing it.")
         try:
-            mute_role = await bot.get_mute_role(server)
-            mute_channel = await bot.get_mute_channel(server, silent=True)
-        except Exception:
-            logger.warning(f"{server.name} Unbanish loop failed to fetch mute role or channel.")
-            continue
-        unmuted = list()
-
-        # Create a list of mutes which are due for unmuting
-        current_time = datetime.datetime.now()
-        mutes = mute_db.mdb_fetch(bot, server)
-        timed_mutes = [ i for i in mutes if i.until is not None ]
-        due_mutes = [ i for i in timed_mutes if i.until < current_time ]
-        logger.debug(f"{server.name} mutes: {len(mutes)}/{len(timed_mutes)}/{len(due_mutes)}")
-
-        for mute in due_mutes:
-            logger.debug(f"{mute} is due for unbanish!")
-
-            # Refresh member to make sure we have their latest roles.
-            try:
-                member = await server.fetch_member(mute.member.id)
-                logger.debug(f"Refreshed {member}, they have {len(member.roles)} roles.")
-            except Exception as e:
-                logger.error(f"Failed to refresh muted member: {e}")
-                continue  # Will try again next unbanish loop
-
-            # Calculate how late we were in unbanishing
-            diff = bot.parse_timedelta(current_time - mute.until)
-            if diff == "":
-                diff = "now"
-            else:
-                diff = f"{diff} ago"
-
-            # Remove from database
-            mute_db.mdb_del(bot, member, logger)
-
-            if mute_role in member.roles:
-                logger.debug(f"{member} has the mute role! Removing it.")
-                try:
-                    await member.remove_roles(mute_role)
-                    logger.debug(f"{member} should no longer have the mute role.")
-                    # Members are only considered unmuted if they had the antarctica role
-                    unmuted.append(member)
-
-                    log = f"Auto-unmuted {CYAN_B}{member.name}#"
-                    log += f"{member.discriminator} @ {server.name}."
-                    log += f"{YELLOW} (due {diff}){RESET}"
-                    logger.info(log)
-
-                except Exception as e:
-                    log = f"Failed to remove mute role of {YELLOW}"
-                    log += f"{member.name}#{member.discriminator}"
-                    log += f"{CYAN_B} @ {MAGENTA} {server.name}:"
-                    log += f"\n{RED}==> {RESET}{e}"
-                    logger.error(log)
-            else:
-                log = f"User {YELLOW}{member.name}#{member.discriminator}"
-                log += f"{CYAN_B} @ {MAGENTA} {server.name}{CYAN} "
-                log += f"due for unmute but does not have a mute role!{RESET}"
-                logger.warning(log)
-
-        # Time for some great regrets
-        if len(unmuted) > 0:
-            unmuted_str = default.mentions_list(unmuted)
-
-            if len(unmuted_str) == 1:
-                msg = "It's with great regret that I must inform you all that "
-                msg += f"{unmuted_str}'s exile has come to an end."
-            else:
-                msg = "It's with great regret that I must inform you all that the exile of "
-                msg += f"{unmuted_str} has come to an end."
-
-            await mute_channel.send(msg)
+            await member.remove_roles(mute_role)
+            logger.debug(f"{member} should no longer have the mute role.")
+
+            log = f"Auto-unmuted {CYAN_B}{member.name}#"
+            log += f"{member.discriminator} @ {server.name}."
+            log += f"{YELLOW} (due {diff}){RESET}"
+            logger.info(log)
+            # Members are only considered unmuted if they had the antarctica role
+            return True, member
+
+        except Exception as e:
+            log = f"Failed to remove mute role of {YELLOW}"
+            log += f"{member.name}#{member.discriminator}"
+            log += f"{CYAN_B} @ {MAGENTA} {server.name}:"
+            log += f"\n{RED}==> {RESET}{e}"
+            logger.error(log)
+    else:
+        log = f"User {YELLOW}{member.name}#{member.discriminator}"
+        log += f"{CYAN_B} @ {MAGENTA} {server.name}{CYAN} "
+        log += f"due for unmute but does not have a mute role!{RESET}"
+        logger.warning(log)
+
+    return True, None
@@ -0,0 +1,80 @@
+"""
+Scanning of message content for the patterns listeners are interested in.
+
+Every pattern is compiled once, together with the characters that have to
+be in a message for the pattern to possibly match, such as a digit for
+temperatures or a curly bracket for inks. All of these trigger characters
+are combined into a single character class, so finding out which patterns
+are worth running takes a single pass over the message. Most chat messages
+have none of them and are rejected right away.
+"""
+
+import re
+from typing import Dict
+from typing import FrozenSet
+from typing import List
+from typing import Match
+from typing import NamedTuple
+from typing import Optional
+from typing import Pattern
+from typing import Set
+
+
+class ScanPattern(NamedTuple):
+    """A pattern and the characters that have to be present for it to match."""
+
+    pattern: Pattern
+    triggers: FrozenSet[str]
+
+
+class ContentScanner:
+    """Finds the matches of every registered pattern in a message."""
+
+    patterns: Dict[str, ScanPattern]
+    prefilter: Optional[Pattern]
+
+    def __init__(self) -> None:
+        self.patterns = dict()
+        self.prefilter = None
+
+    def register(self, name: str, pattern: Pattern, triggers: str) -> None:
+        """Add a pattern which is only run if any of the trigger characters are in the message."""
+        self.patterns[name] = ScanPattern(pattern, frozenset(triggers))
+        self.compile_prefilter()
+
+    def unregister(self, name: str) -> None:
+        """Remove a pattern."""
+        self.patterns.pop(name, None)
+        self.compile_prefilter()
+
+    def compile_prefilter(self) -> None:
+        """Combine the trigger characters of every pattern into one character class."""
+        triggers: Set[str] = set()
+        for scan_pattern in self.patterns.values():
+            triggers.update(scan_pattern.triggers)
+
+        if triggers:
+            characters = "".join([ re.escape(c) for c in sorted(triggers) ])
+            self.prefilter = re.compile(f"[{characters}]")
+        else:
+            self.prefilter = None
+
+    def scan(self, content: str) -> Dict[str, List[Match]]:
+        """Return the matches of every pattern with any matches in the content."""
+        if self.prefilter is None:
+            return dict()
+
+        present = set(self.prefilter.findall(content))
+        if not present:
+            return dict()
+
+        matches = dict()
+        for name, scan_pattern in self.patterns.items():
+            if present.isdisjoint(scan_pattern.triggers):
+                continue
+
+            found = list(scan_pattern.pattern.finditer(content))
+            if found:
+                matches[name] = found
+
+        return matches
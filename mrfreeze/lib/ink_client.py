@@ -0,0 +1,196 @@
+"""
+Client for searching the Inkcyclopedia API.
+
+Ink lookups happen in the middle of handling messages, so they must never
+block the event loop or hang for long. All requests go through a single
+aiohttp session, which keeps connections to the API alive between lookups.
+Each attempt has a strict timeout, and failed attempts are retried a couple
+of times after a random (jittered) delay, so a hiccup doesn't cost a reply
+and many lookups failing at once don't retry in lockstep.
+
+If the API keeps failing, a circuit breaker opens and further lookups fail
+right away instead of waiting for timeouts. After a while a single lookup
+is let through to test the API, closing the breaker again if it succeeds.
+"""
+
+import asyncio
+import random
+import time
+from enum import Enum
+from logging import Logger
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import aiohttp
+
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import RED
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
+from mrfreeze.lib.colors import YELLOW
+
+
+class InkLookupError(Exception):
+    """Exception used when the API couldn't be searched."""
+
+
+class CircuitOpenError(InkLookupError):
+    """Exception used when a lookup isn't attempted because the circuit breaker is open."""
+
+
+class RetryableStatus(InkLookupError):
+    """Exception used when the API responded with a status worth retrying, such as 503."""
+
+
+class BreakerState(Enum):
+    """States of the circuit breaker."""
+
+    CLOSED      = "closed"      # Requests are made as usual.
+    OPEN        = "open"        # Requests fail right away.
+    HALF_OPEN   = "half open"   # A single request is let through to test the API.
+
+
+class CircuitBreaker:
+    """Stops requests to a service after too many consecutive failures."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # When the trial request was let through, a trial which never
+        # finishes (for example if it's cancelled) expires after reset_timeout.
+        self.trial_at: Optional[float] = None
+
+    @property
+    def state(self) -> BreakerState:
+        """Get the current state of the breaker."""
+        if self.opened_at is None:
+            return BreakerState.CLOSED
+        elif time.monotonic() - self.opened_at >= self.reset_timeout:
+            return BreakerState.HALF_OPEN
+        return BreakerState.OPEN
+
+    def allow(self) -> bool:
+        """Check if a request may be made, letting only one trial request through when half open."""
+        state = self.state
+        if state == BreakerState.CLOSED:
+            return True
+        elif state == BreakerState.OPEN:
+            return False
+
+        now = time.monotonic()
+        if self.trial_at is not None and now - self.trial_at < self.reset_timeout:
+            return False
+        self.trial_at = now
+        return True
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        self.failures = 0
+        self.opened_at = None
+        self.trial_at = None
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the breaker if there have been too many."""
+        self.failures += 1
+        if self.trial_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.trial_at = None
+
+    def __str__(self) -> str:
+        return f"{self.state.value}, {self.failures} consecutive failures"
+
+
+class InkClient:
+    """Searches the Inkcyclopedia over a pooled, keep-alive HTTP session."""
+
+    session: Optional[aiohttp.ClientSession]
+
+    def __init__(
+        self,
+        url: str,
+        logger: Logger,
+        timeout: float = 5.0,
+        connect_timeout: float = 2.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        breaker: Optional[CircuitBreaker] = None,
+        max_connections: int = 10
+    ) -> None:
+        self.url = url
+        self.logger = logger
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.max_connections = max_connections
+        self.session = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Get the session, creating it the first time. This has to happen in the event loop."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self) -> None:
+        """Close the session and its connections."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def search(self, inks: List[str]) -> Dict[str, Any]:
+        """
+        Search for the listed inks, returning the found section of the response.
+
+        Raises CircuitOpenError right away if the breaker is open, and
+        InkLookupError if the search failed after all the retries.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker is {self.breaker}")
+
+        attempts = self.retries + 1
+        error: Exception = InkLookupError("No attempts were made")
+        for attempt in range(attempts):
+            try:
+                found = await self.post(inks)
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus) as e:
+                error = e
+            except InkLookupError:
+                # The API answered, it just didn't like the request.
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return found
+
+            log = f"{YELLOW}Inkcyclopedia:{CYAN} attempt {attempt + 1}/{attempts} "
+            log += f"failed: {type(error).__name__} {error}{RESET}"
+            self.logger.warning(log)
+
+            if attempt + 1 < attempts:
+                # Full jitter: sleep anywhere between zero and the exponential backoff.
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+        self.breaker.record_failure()
+        log = f"{RED_B}Inkcyclopedia:{CYAN} search failed, circuit breaker is {self.breaker}"
+        log += f"\n{RED}==> {error}{RESET}"
+        self.logger.error(log)
+        raise InkLookupError(str(error)) from error
+
+    async def post(self, inks: List[str]) -> Dict[str, Any]:
+        """Make a single search request."""
+        async with self.get_session().post(self.url, json=inks) as response:
+            if response.status == 429 or response.status >= 500:
+                raise RetryableStatus(f"HTTP {response.status}")
+            elif response.status >= 400:
+                raise InkLookupError(f"HTTP {response.status}")
+
+            try:
+                body = await response.json(content_type=None)
+                return dict(body["found"])
+            except (ValueError, KeyError, TypeError) as e:
+                raise InkLookupError(f"Malformed response: {e}") from e
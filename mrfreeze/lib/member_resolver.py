@@ -0,0 +1,52 @@
+"""
+Cache-first lookup of guild members.
+
+With the members intent enabled the gateway keeps the member cache of every
+guild up to date, roles included, so fetching a member over the REST API is
+only necessary when they're missing from it. The resolver counts how often
+the cache could be used and how often it had to fall back to the API.
+"""
+
+from typing import Optional
+
+import discord
+from discord import Guild
+from discord import Member
+
+
+class MemberResolver:
+    """Look up members in the gateway cache, falling back to the REST API on a miss."""
+
+    hits: int
+    misses: int
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, guild: Guild, member_id: int) -> Optional[Member]:
+        """
+        Get a member of a guild, or None if they're not in it.
+
+        Errors other than the member not being found, such as
+        missing permissions or Discord being down, are raised.
+        """
+        member = guild.get_member(member_id)
+        if member is not None:
+            self.hits += 1
+            return member
+
+        self.misses += 1
+        try:
+            return await guild.fetch_member(member_id)
+        except discord.NotFound:
+            return None
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups which were answered by the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.hits} cache hits, {self.misses} misses ({self.hit_rate:.0%} hit rate)"
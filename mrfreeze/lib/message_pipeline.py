@@ -0,0 +1,189 @@
+"""
+Central handling of incoming messages.
+
+Instead of every cog listening for on_message, checking if the author is a
+bot, looking up the server's settings and building its own Context, the bot
+does all of that once per message and then hands the result to every
+registered stage. Command processing is one of these stages.
+
+Stages can also register a pattern, in which case they're only run for
+messages matching it and get the matches handed to them. The patterns of
+all stages are run by a single ContentScanner, so messages which none of
+the stages are interested in are dropped before a Context is even built.
+
+The stages of a message run concurrently, the same way separate on_message
+listeners would. How long each stage takes is recorded, so slow stages can
+be spotted with the pipeline command or in the logs.
+"""
+
+import asyncio
+import time
+from logging import Logger
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Match
+from typing import NamedTuple
+from typing import Optional
+from typing import Pattern
+
+from discord import Message
+from discord.ext.commands import Bot
+from discord.ext.commands import Context
+
+from mrfreeze.database.guild_settings import GuildSettings
+from mrfreeze.lib.colors import CYAN
+from mrfreeze.lib.colors import RED
+from mrfreeze.lib.colors import RED_B
+from mrfreeze.lib.colors import RESET
+from mrfreeze.lib.colors import YELLOW
+from mrfreeze.lib.content_scanner import ContentScanner
+
+# A stage gets the context of the message, the settings of the server it was
+# sent in and the matches of its pattern. Settings of messages sent in DMs
+# are all None, and stages without a pattern get an empty list of matches.
+StageCallback = Callable[[Context, GuildSettings, List[Match]], Awaitable[None]]
+
+
+class Stage(NamedTuple):
+    """A registered stage of the pipeline."""
+
+    name: str
+    callback: StageCallback
+    when_freeze_muted: bool  # Whether to run when MrFreeze is muted in the server.
+    scanned: bool            # Whether to only run when the stage's pattern matches.
+
+
+class StageTiming:
+    """How many times a stage has run and how long it took."""
+
+    __slots__ = ("runs", "total", "slowest", "errors")
+
+    def __init__(self) -> None:
+        self.runs = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.errors = 0
+
+    def add(self, seconds: float) -> None:
+        """Record a run of the stage."""
+        self.runs += 1
+        self.total += seconds
+        self.slowest = max(self.slowest, seconds)
+
+    @property
+    def average(self) -> float:
+        """Average time of a run, in seconds."""
+        return self.total / self.runs if self.runs else 0.0
+
+
+class MessagePipeline:
+    """Builds the context of every message once and passes it to every stage."""
+
+    stages: List[Stage]
+    timings: Dict[str, StageTiming]
+
+    def __init__(self, bot: Bot, logger: Logger, slow_threshold: float = 1.0) -> None:
+        self.bot = bot
+        self.logger = logger
+        self.slow_threshold = slow_threshold
+        self.scanner = ContentScanner()
+        self.stages = list()
+        self.timings = dict()
+        self.messages = 0
+
+    def register(
+        self,
+        name: str,
+        callback: StageCallback,
+        when_freeze_muted: bool = False,
+        pattern: Optional[Pattern] = None,
+        triggers: str = ""
+    ) -> None:
+        """
+        Add a stage to the pipeline, replacing any earlier stage with the same name.
+
+        If a pattern is given the stage only runs for messages where it matches,
+        and only messages with any of the trigger characters are searched.
+        """
+        self.unregister(name)
+        self.stages.append(Stage(name, callback, when_freeze_muted, pattern is not None))
+        self.timings.setdefault(name, StageTiming())
+        if pattern is not None:
+            self.scanner.register(name, pattern, triggers)
+
+    def unregister(self, name: str) -> None:
+        """Remove a stage from the pipeline, for example because its cog was unloaded."""
+        self.stages = [ stage for stage in self.stages if stage.name != name ]
+        self.scanner.unregister(name)
+
+    async def dispatch(self, message: Message) -> None:
+        """Run a message through the shared filters, then through every stage."""
+        # Messages from bots, including MrFreeze, are never processed.
+        if message.author.bot or not self.stages:
+            return
+
+        if message.guild:
+            settings = self.bot.settings.get_guild(message.guild)
+        else:
+            settings = self.bot.settings.guilds.empty
+
+        stages = self.stages
+        if settings.freeze_muted:
+            stages = [ stage for stage in stages if stage.when_freeze_muted ]
+            if not stages:
+                return
+
+        matches = self.scanner.scan(message.content)
+        stages = [ stage for stage in stages if not stage.scanned or stage.name in matches ]
+        if not stages:
+            return
+
+        self.messages += 1
+        ctx = await self.bot.get_context(message)
+        await asyncio.gather(*[
+            self.run_stage(stage, ctx, settings, matches.get(stage.name, list()))
+            for stage in stages
+        ])
+
+    async def run_stage(
+        self,
+        stage: Stage,
+        ctx: Context,
+        settings: GuildSettings,
+        matches: List[Match]
+    ) -> None:
+        """Run a single stage, timing it and logging any errors."""
+        timing = self.timings.setdefault(stage.name, StageTiming())
+        start = time.perf_counter()
+
+        try:
+            await stage.callback(ctx, settings, matches)
+        except Exception as e:
+            timing.errors += 1
+            log = f"{RED_B}Message pipeline:{CYAN} stage {stage.name} failed:"
+            log += f"\n{RED}==> {e}{RESET}"
+            self.logger.error(log)
+
+        elapsed = time.perf_counter() - start
+        timing.add(elapsed)
+        if elapsed >= self.slow_threshold:
+            log = f"{YELLOW}Message pipeline:{CYAN} stage {stage.name} "
+            log += f"took {elapsed * 1000:.0f} ms{RESET}"
+            self.logger.warning(log)
+
+    def report(self, name: Optional[str] = None) -> List[str]:
+        """Describe how long the stages have taken, one line per stage."""
+        lines = list()
+        for stage_name, timing in self.timings.items():
+            if name is not None and stage_name != name:
+                continue
+
+            line = f"{stage_name}: {timing.runs} runs, "
+            line += f"{timing.average * 1000:.2f} ms average, "
+            line += f"{timing.slowest * 1000:.2f} ms slowest, "
+            line += f"{timing.errors} errors"
+            lines.append(line)
+
+        return lines
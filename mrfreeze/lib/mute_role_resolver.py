@@ -0,0 +1,65 @@
+"""
+Lookup of the role used to mute members of a guild.
+
+Servers can pick their mute role with the mute role setting, otherwise the
+role called antarctica is used. Finding the latter means going through every
+role of the guild, so the id of the role that was found is remembered per
+guild and looked up directly the next time.
+
+The cache is cleared for a guild whenever one of its roles is created,
+updated or deleted, and a cached role is only used as long as the setting
+is the same as when it was found.
+"""
+
+from logging import Logger
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from discord import Guild
+from discord import Role
+
+from mrfreeze.database.settings import Settings
+
+DEFAULT_ROLE_NAME = "antarctica"
+
+
+class MuteRoleResolver:
+    """Find and remember the mute role of every guild."""
+
+    # guild id -> (configured role id, resolved role id)
+    roles: Dict[int, Tuple[Optional[int], Optional[int]]]
+
+    def __init__(self, settings: Settings, logger: Logger) -> None:
+        self.settings = settings
+        self.logger = logger
+        self.roles = dict()
+
+    def resolve(self, guild: Guild) -> Optional[Role]:
+        """Get the mute role of a guild, or None if it doesn't have one."""
+        configured = self.settings.get_mute_role(guild)
+
+        cached = self.roles.get(guild.id)
+        if cached is not None and cached[0] == configured:
+            return guild.get_role(cached[1]) if cached[1] is not None else None
+
+        role = self.find(guild, configured)
+        self.roles[guild.id] = (configured, role.id if role else None)
+        return role
+
+    def find(self, guild: Guild, configured: Optional[int]) -> Optional[Role]:
+        """Look for the mute role of a guild, preferring the configured one over the default name."""
+        if configured is not None:
+            role = guild.get_role(configured)
+            if role is not None:
+                return role
+            self.logger.warning(f"{guild.name} mute role {configured} not found, looking for {DEFAULT_ROLE_NAME}.")
+
+        for role in guild.roles:
+            if role.name.lower() == DEFAULT_ROLE_NAME:
+                return role
+        return None
+
+    def invalidate(self, guild: Guild) -> None:
+        """Forget the mute role of a guild, for example because its roles have changed."""
+        self.roles.pop(guild.id, None)
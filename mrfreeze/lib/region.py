@@ -90,8 +90,8 @@ async def region_antarctica(ctx: Context, cog: CogInfo, spelling: str) -> bool:
         raise InsufficientCogInfo()
 
     # Check if the user is on an indefinite banish.
-    mute_status = mute_db.mdb_fetch(bot, ctx.author)
-    indefinite_mute = mute_status and not mute_status[0].until
+    mute_status = await mute_db.mdb_fetch(bot, ctx.author)
+    indefinite_mute = mute_status and mute_status[0].until is None
 
     # User confirmed to have tried to set region to Antarctica
     # Initiating punishment
@@ -1,62 +1,143 @@
 """Module for converting text to timedelta objects and vice versa."""
 import datetime
+import functools
 import re
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+
+# Time units in the order they're summed up, the first number of each
+# pair is the number of seconds in a unit. Months and years are
+# converted to 30 and 365 days respectively.
+UNITS = (
+    ("seconds", 1),
+    ("minutes", 60),
+    ("hours", 60 * 60),
+    ("days", 24 * 60 * 60),
+    ("weeks", 7 * 24 * 60 * 60),
+    ("months", 30 * 24 * 60 * 60),
+    ("years", 365 * 24 * 60 * 60),
+)
+
+# A single expression for every kind of token, so the arguments can be
+# tokenized in one pass. The three alternatives start with different
+# characters, so they never compete for the same text:
+# - ISO 8601 durations such as P1DT2H or PT30M,
+# - absolute times of day such as "until 18:00",
+# - a number followed by a unit such as "5 minutes" or "2h".
+TIME_TOKEN = re.compile(
+    r"""
+    (?P<iso>\bP(?=\d|T\d)
+        (?:(?P<iso_years>\d+)Y)?
+        (?:(?P<iso_months>\d+)M)?
+        (?:(?P<iso_weeks>\d+)W)?
+        (?:(?P<iso_days>\d+)D)?
+        (?:T
+            (?:(?P<iso_hours>\d+)H)?
+            (?:(?P<iso_minutes>\d+)M)?
+            (?:(?P<iso_seconds>\d+)S)?
+        )?\b)
+    | \buntil\ (?P<clock>\d{1,2}):(?P<clock_minutes>\d{2})(?::(?P<clock_seconds>\d{2}))?\b
+    | (?P<number>-?\d+)\ ?(?:
+        (?P<seconds>seconds?|secs?|s[,\ ])
+        | (?P<minutes>minutes?|mins?|m[,\ ])
+        | (?P<hours>hours?|hrs?|h[,\ ])
+        | (?P<days>days?|d[,\ ])
+        | (?P<weeks>weeks?|w[,\ ])
+        | (?P<months>months?|mnth?s?|mons?)
+        | (?P<years>years?|yrs?|y[,\ ])
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE)
+
+
+class ParsedTime(NamedTuple):
+    """The parts of a time expression that don't depend on the current time."""
+
+    delta: Optional[datetime.timedelta]  # None if the duration overflows
+    clock: Optional[datetime.time]       # Time of day given with "until HH:MM"
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_time(args: Tuple[str, ...], fallback_minutes: bool = True) -> ParsedTime:
+    """
+    Parse time expressions from a set of arguments.
+
+    The result is cached, since the same few expressions are used over and over.
+    If time expressions are not found, assume all digits refer to minutes.
+    """
+    totals = dict.fromkeys([ unit for unit, _ in UNITS ], 0)
+    clock = None
+
+    for match in TIME_TOKEN.finditer(" ".join(args)):
+        if match.group("iso"):
+            for unit, _ in UNITS:
+                value = match.group(f"iso_{unit}")
+                if value:
+                    totals[unit] += int(value)
+
+        elif match.group("clock"):
+            try:
+                clock = datetime.time(
+                    int(match.group("clock")),
+                    int(match.group("clock_minutes")),
+                    int(match.group("clock_seconds") or 0))
+            except ValueError:
+                pass  # Not a valid time of day, such as 25:00
+
+        else:
+            # Every other alternative ends with the group named after its unit.
+            last_unit = match.lastgroup
+            assert last_unit is not None
+            totals[last_unit] += int(match.group("number"))
+
+    try:
+        delta = datetime.timedelta(
+            weeks=totals["weeks"],
+            days=totals["days"] + totals["months"] * 30 + totals["years"] * 365,
+            hours=totals["hours"],
+            minutes=totals["minutes"],
+            seconds=totals["seconds"])
+
+        # If nothing was found, assume all numbers are minutes.
+        if not delta and clock is None and fallback_minutes:
+            no_minutes = sum([ int(arg) for arg in args if arg.isnumeric() ])
+            delta = datetime.timedelta(minutes=no_minutes)
+
+    except OverflowError:
+        return ParsedTime(delta=None, clock=clock)
+
+    return ParsedTime(delta=delta, clock=clock)
 
 
 def extract_time(args, fallback_minutes=True):
     """
     Extract time expressions from a set of arguments.
 
+    Durations can be given as numbers followed by units ("1 hour 30 minutes"),
+    or as ISO 8601 durations ("PT1H30M"). An absolute time ("until 18:00")
+    takes precedence over durations, and refers to the next time the clock
+    shows that time.
+
     If time expressions are not found, assume all digits refer to minutes.
     Return a timedelta and an end time if successful, otherwise (None, None).
     """
-    # Create regular expression
-    seconds = r"seconds?|secs?|s[, ]"
-    minutes = r"minutes?|mins?|m[, ]"
-    hours = r"hours?|hrs?|h[, ]"
-    days = r"days?|d[, ]"
-    weeks = r"weeks?|w[, ]"
-    months = r"months?|mnth?s?|mons?"
-    years = r"years?|yrs?|y[, ]"
-    find_time = fr"(-?\d+) ?(({seconds})|({minutes})|({hours})"
-    find_time += fr"|({days})|({weeks})|({months})|({years}))"
-
-    regex_output = re.findall(
-        find_time,       # Use our newly created regex.
-        " ".join(args),  # Search through the arguments.
-        re.IGNORECASE)   # Ignore case when applying the expression.
-
-    # Sum up all hits for the different time units
-    time_dict = {
-        "seconds": sum([int(row[0]) for row in regex_output if row[2]]),
-        "minutes": sum([int(row[0]) for row in regex_output if row[3]]),
-        "hours": sum([int(row[0]) for row in regex_output if row[4]]),
-        "days": sum([int(row[0]) for row in regex_output if row[5]]),
-        "weeks": sum([int(row[0]) for row in regex_output if row[6]]),
-        "months": sum([int(row[0]) for row in regex_output if row[7]]),
-        "years": sum([int(row[0]) for row in regex_output if row[8]]),
-    }
-
-    # Create a new datetime object based on these numbers.
-    # Months and years are converted to 30 and 365 days respectively.
-    time_dict["days"] += (
-        (time_dict["months"] * 30) + (time_dict["years"] * 365)
-    )
+    parsed = parse_time(tuple(args), fallback_minutes)
     current_time = datetime.datetime.now()
 
     try:
-        add_time = datetime.timedelta(
-            weeks=time_dict["weeks"],
-            days=time_dict["days"],
-            hours=time_dict["hours"],
-            minutes=time_dict["minutes"],
-            seconds=time_dict["seconds"])
-        end_date = current_time + add_time
+        if parsed.clock is not None:
+            end_date = datetime.datetime.combine(current_time.date(), parsed.clock)
+            if end_date <= current_time:
+                end_date += datetime.timedelta(days=1)
+            add_time = end_date - current_time
 
-        # If nothing was found, assume all numbers are minutes.
-        if (end_date == current_time) and fallback_minutes:
-            no_minutes = sum([int(arg) for arg in args if arg.isnumeric()])
-            add_time = datetime.timedelta(minutes=no_minutes)
+        elif parsed.delta is None:
+            raise OverflowError()
+
+        else:
+            add_time = parsed.delta
             end_date = current_time + add_time
 
     except OverflowError:
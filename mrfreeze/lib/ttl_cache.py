@@ -0,0 +1,78 @@
+"""
+Bounded cache where every entry expires after its own time to live.
+
+Entries are kept in least recently used order, so when the cache is full
+the entry which was used the longest time ago is dropped. Expired entries
+aren't removed right away, they're only treated as misses; get_stale can
+still return them, for example while the service they came from is down.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Hashable
+from typing import NamedTuple
+from typing import Optional
+
+
+class CacheEntry(NamedTuple):
+    """A cached value and when it expires, in monotonic time."""
+
+    value: Any
+    expires: float
+
+
+class TTLCache:
+    """Least recently used cache whose entries expire."""
+
+    entries: "OrderedDict[Hashable, CacheEntry]"
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """Get the entry for a key, or None if there isn't one or it has expired."""
+        entry = self.entries.get(key)
+        if entry is None or entry.expires <= time.monotonic():
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get_stale(self, key: Hashable) -> Optional[CacheEntry]:
+        """Get the entry for a key even if it has expired."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.stale_hits += 1
+        return entry
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """Cache a value for ttl seconds, dropping the least recently used entry if full."""
+        self.entries[key] = CacheEntry(value, time.monotonic() + ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry, keeping the counters."""
+        self.entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups which were answered by the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __str__(self) -> str:
+        text = f"{len(self.entries)}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses "
+        text += f"({self.hit_rate:.0%} hit rate), {self.stale_hits} stale hits"
+        return text
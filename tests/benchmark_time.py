@@ -0,0 +1,114 @@
+"""
+Micro-benchmark of time.extract_time against its previous implementation.
+
+The inputs are the argument tuples used in tests/test_time.py. The current
+implementation caches parsed expressions, so it's timed both with a warm cache
+and with the cache cleared before every round. Run from anywhere with:
+    python tests/benchmark_time.py
+"""
+
+import ast
+import datetime
+import os
+import re
+import sys
+import timeit
+
+# Make the mrfreeze package importable when run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mrfreeze.lib import time  # noqa: E402
+
+
+def legacy_extract_time(args, fallback_minutes=True):
+    """Extract time expressions the way extract_time did before the tokenizer."""
+    seconds = r"seconds?|secs?|s[, ]"
+    minutes = r"minutes?|mins?|m[, ]"
+    hours = r"hours?|hrs?|h[, ]"
+    days = r"days?|d[, ]"
+    weeks = r"weeks?|w[, ]"
+    months = r"months?|mnth?s?|mons?"
+    years = r"years?|yrs?|y[, ]"
+    find_time = fr"(-?\d+) ?(({seconds})|({minutes})|({hours})"
+    find_time += fr"|({days})|({weeks})|({months})|({years}))"
+
+    regex_output = re.findall(find_time, " ".join(args), re.IGNORECASE)
+
+    time_dict = {
+        "seconds": sum([int(row[0]) for row in regex_output if row[2]]),
+        "minutes": sum([int(row[0]) for row in regex_output if row[3]]),
+        "hours": sum([int(row[0]) for row in regex_output if row[4]]),
+        "days": sum([int(row[0]) for row in regex_output if row[5]]),
+        "weeks": sum([int(row[0]) for row in regex_output if row[6]]),
+        "months": sum([int(row[0]) for row in regex_output if row[7]]),
+        "years": sum([int(row[0]) for row in regex_output if row[8]]),
+    }
+    time_dict["days"] += (time_dict["months"] * 30) + (time_dict["years"] * 365)
+    current_time = datetime.datetime.now()
+
+    try:
+        add_time = datetime.timedelta(
+            weeks=time_dict["weeks"],
+            days=time_dict["days"],
+            hours=time_dict["hours"],
+            minutes=time_dict["minutes"],
+            seconds=time_dict["seconds"])
+        end_date = current_time + add_time
+
+        if (end_date == current_time) and fallback_minutes:
+            no_minutes = sum([int(arg) for arg in args if arg.isnumeric()])
+            add_time = datetime.timedelta(minutes=no_minutes)
+            end_date = current_time + add_time
+
+    except OverflowError:
+        end_date = datetime.datetime.max
+        add_time = end_date - current_time
+
+    if end_date != current_time:
+        return add_time, end_date
+    else:
+        return None, None
+
+
+def test_inputs():
+    """Collect every `test_args = (...)` tuple from tests/test_time.py."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_time.py")
+    with open(path) as f:
+        tree = ast.parse(f.read())
+
+    inputs = list()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Assign):
+            continue
+        if any([ isinstance(target, ast.Name) and target.id == "test_args" for target in node.targets ]):
+            inputs.append(ast.literal_eval(node.value))
+
+    return inputs
+
+
+def main(rounds: int = 2000) -> int:
+    """Time both implementations over all the inputs, return 0 if the new one is faster even when cold."""
+    inputs = test_inputs()
+
+    def run(function, cold=False):
+        def inner():
+            if cold:
+                time.parse_time.cache_clear()
+            for args in inputs:
+                function(args)
+        return min(timeit.repeat(inner, number=rounds, repeat=5))
+
+    legacy = run(legacy_extract_time)
+    warm = run(time.extract_time)
+    cold = run(time.extract_time, cold=True)
+    per_call = 1_000_000 / (rounds * len(inputs))
+
+    print(f"{len(inputs)} inputs, {rounds} rounds")
+    print(f"legacy:  {legacy * per_call:.2f} µs per call")
+    print(f"warm:    {warm * per_call:.2f} µs per call ({legacy / warm:.1f}x faster)")
+    print(f"cold:    {cold * per_call:.2f} µs per call ({legacy / cold:.1f}x faster)")
+    return 0 if cold < legacy else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
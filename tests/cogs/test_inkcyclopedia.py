@@ -0,0 +1,105 @@
+"""Unittests for the ink lookups of the Inkcyclopedia cog."""
+
+import asyncio
+import logging
+from unittest.mock import AsyncMock
+
+from mrfreeze.cogs.inkcyclopedia import Inkcyclopedia
+from mrfreeze.lib.ink_client import CircuitOpenError
+from mrfreeze.lib.message_pipeline import MessagePipeline
+
+import pytest
+
+from tests import helpers
+
+oxblood = { "fullName": "Diamine Oxblood", "primaryImage": "https://example.com/ox.png" }
+
+
+@pytest.fixture()
+def cog():
+    """Instantiate the cog with a client that finds Diamine Oxblood only."""
+    bot = helpers.MockMrFreeze()
+    bot.message_pipeline = MessagePipeline(bot, logging.getLogger("test"))
+    cog = Inkcyclopedia(bot)
+
+    async def search(inks):
+        return { ink: oxblood for ink in inks if "oxblood" in ink.lower() }
+
+    cog.client.search = AsyncMock(side_effect=search)
+    yield cog
+
+
+def lookup(cog, query):
+    """Look up a single ink, returning its embed."""
+    return asyncio.run(cog.lookup([ query ]))[cog.normalise(query)]
+
+
+def test_lookup_builds_embed_once(cog):
+    """Test that an ink is only searched for once, with the embed built then cached."""
+    first = lookup(cog, "Diamine Oxblood")
+    second = lookup(cog, "  diamine   OXBLOOD ")
+
+    assert first.title == "Diamine Oxblood"
+    assert second is first
+    assert cog.client.search.await_count == 1
+    assert (cog.cache.hits, cog.cache.misses) == (1, 1)
+
+
+def test_not_found_is_cached(cog):
+    """Test that inks which weren't found are cached too."""
+    assert lookup(cog, "Diamine Pumpkin") is None
+    assert lookup(cog, "diamine pumpkin") is None
+    assert cog.client.search.await_count == 1
+
+
+def test_misses_searched_together(cog):
+    """Test that every ink missing from the cache is looked up in a single search."""
+    oxblood_embed = lookup(cog, "Diamine Oxblood")
+    embeds = asyncio.run(cog.lookup([ "diamine oxblood", "Sailor Oxblood", "Diamine Pumpkin", "diamine pumpkin" ]))
+
+    assert cog.client.search.await_count == 2
+    cog.client.search.assert_awaited_with([ "Sailor Oxblood", "Diamine Pumpkin" ])
+    assert embeds["diamine oxblood"] is oxblood_embed
+    assert embeds["sailor oxblood"].title == "Diamine Oxblood"
+    assert embeds["diamine pumpkin"] is None
+    assert cog.cache.get("diamine pumpkin").value is None
+
+
+def test_misses_matched_to_differently_keyed_results(cog):
+    """Test that found inks are matched to their queries even when keyed differently."""
+    sailor = { "fullName": "Sailor Jentle Yama-dori", "primaryImage": "https://example.com/yama.png" }
+
+    async def search(inks):
+        return { "diamine oxblood": oxblood, "unrelated key": sailor }
+
+    cog.client.search.side_effect = search
+    embeds = asyncio.run(cog.lookup([ "Diamine  OXBLOOD", "sailor jentle yama-dori", "Diamine Pumpkin" ]))
+
+    assert embeds["diamine oxblood"].title == "Diamine Oxblood"
+    assert embeds["sailor jentle yama-dori"].title == "Sailor Jentle Yama-dori"
+    assert embeds["diamine pumpkin"] is None
+    assert cog.cache.get("diamine pumpkin").value is None
+
+
+def test_unmatched_results_are_not_cached_as_not_found(cog):
+    """Test that inks aren't cached as not found when results couldn't be matched to them."""
+    async def search(inks):
+        return { "some other key": oxblood }
+
+    cog.client.search.side_effect = search
+    embeds = asyncio.run(cog.lookup([ "Oxblood by Diamine", "Diamine Pumpkin" ]))
+
+    assert embeds == { "oxblood by diamine": None, "diamine pumpkin": None }
+    assert cog.cache.get_stale("oxblood by diamine") is None
+    assert cog.cache.get_stale("diamine pumpkin") is None
+
+
+def test_stale_results_used_when_search_fails(cog):
+    """Test that expired results are used while searches fail, and failures aren't cached."""
+    cog.found_ttl = 0
+    embed = lookup(cog, "Diamine Oxblood")
+
+    cog.client.search.side_effect = CircuitOpenError("open")
+    assert lookup(cog, "Diamine Oxblood") is embed
+    assert lookup(cog, "Diamine Pumpkin") is None
+    assert cog.cache.get_stale("diamine pumpkin") is None
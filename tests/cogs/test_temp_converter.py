@@ -1,12 +1,18 @@
 """Unittest for the TemperatureConverter cog."""
 
 import asyncio
+import logging
 import unittest
 from typing import List
 
 from discord import File
 
+from mrfreeze.cogs.temp_converter import ParsedTemperature
+from mrfreeze.cogs.temp_converter import TempUnit
 from mrfreeze.cogs.temp_converter import TemperatureConverter
+from mrfreeze.cogs.temp_converter import statement_pattern
+from mrfreeze.database.guild_settings import GuildSettings
+from mrfreeze.lib.message_pipeline import MessagePipeline
 
 from tests import helpers
 
@@ -17,6 +23,7 @@ class TemperatureConverterCogUnitTest(unittest.TestCase):
     def setUp(self):
         """Set up a clean environment for each test."""
         self.bot = helpers.MockMrFreeze()
+        self.bot.message_pipeline = MessagePipeline(self.bot, logging.getLogger("test"))
         self.cog = TemperatureConverter(self.bot)
 
         self.msg = helpers.MockMessage()
@@ -34,6 +41,9 @@ class TemperatureConverterCogUnitTest(unittest.TestCase):
 
         self.bot.get_context.return_value = self.ctx
 
+        # Every server has the default settings, so nothing is muted.
+        self.bot.settings.get_guild.return_value = GuildSettings(1)
+
         self.files: List[File] = list()
 
     def tearDown(self):
@@ -51,7 +61,7 @@ class TemperatureConverterCogUnitTest(unittest.TestCase):
         to ensure that it's closed after the test finish running.
         """
         self.msg.content = content
-        coroutine = self.cog.on_message(self.msg)
+        coroutine = self.bot.message_pipeline.dispatch(self.msg)
         self.assertIsNone(asyncio.run(coroutine))
 
         text, kwargs = self.channel.send.call_args
@@ -72,7 +82,7 @@ class TemperatureConverterCogUnitTest(unittest.TestCase):
         self.msg.author.bot = True
 
         self.msg.content = "10 c"
-        coroutine = self.cog.on_message(self.msg)
+        coroutine = self.bot.message_pipeline.dispatch(self.msg)
         self.assertIsNone(asyncio.run(coroutine))
         self.channel.send.assert_not_called()
 
@@ -83,7 +93,7 @@ class TemperatureConverterCogUnitTest(unittest.TestCase):
         Should return nothing at all.
         """
         self.msg.content = "10"
-        coroutine = self.cog.on_message(self.msg)
+        coroutine = self.bot.message_pipeline.dispatch(self.msg)
         self.assertIsNone(asyncio.run(coroutine))
         self.channel.send.assert_not_called()
 
@@ -518,3 +528,73 @@ class TemperatureConverterCogUnitTest(unittest.TestCase):
         self.assertEqual(
             len(self.files),
             0, msg="self.files should be empty.")
+
+    def convert_batch_with(self, content: str) -> str:
+        """Run convert_temperatures() directly with every statement found in content."""
+        self.msg.content = content
+        matches = list(statement_pattern.finditer(content))
+        coroutine = self.cog.convert_temperatures(self.ctx, GuildSettings(1), matches)
+        self.assertIsNone(asyncio.run(coroutine))
+
+        text, kwargs = self.channel.send.call_args
+        attachment = kwargs.get("file")
+        if attachment is not None:
+            self.files.append(attachment)
+
+        return text[0]
+
+    def test_convert_temperatures_replies_once_to_every_statement(self):
+        """All statements in a message are converted in a single reply."""
+        result = self.convert_batch_with("it was 30C yesterday, 12C today, 5F at night")
+
+        expected = "\n".join([
+            "30.0°C is around 86.0°F",
+            "12.0°C is around 53.6°F",
+            "5.0°F is around -15.0°C",
+        ])
+        self.assertEqual(expected, result)
+        self.channel.send.assert_called_once()
+
+    def test_convert_temperatures_skips_repeated_statements(self):
+        """The same statement is only converted once."""
+        result = self.convert_batch_with("20c, yes 20c")
+        self.assertEqual("20.0°C is around 68.0°F", result)
+
+    def test_convert_temperatures_skips_out_of_range_statements(self):
+        """A statement that's out of range doesn't stop the rest from being converted."""
+        result = self.convert_batch_with("20 c and 100000 c")
+        self.assertEqual("20.0°C is around 68.0°F", result)
+        self.channel.send.assert_called_once()
+
+    def test_convert_temperatures_only_out_of_range_statements(self):
+        """A message with nothing but out of range statements gets the warm/chilly reply."""
+        result = self.convert_batch_with("100000 c and 200000 c")
+        expected = "@member No matter what unit you put that in the answer is still gonna be \"quite warm\"."
+        self.assertEqual(expected, result)
+        self.channel.send.assert_called_once()
+
+    def test_convert_temperatures_forced_conversion_per_statement(self):
+        """A forced conversion only applies to the statement it follows."""
+        result = self.convert_batch_with("10 c is 50 f to k")
+
+        expected = "10.0°C is around 50.0°F\n50.0°F is around 283.15K"
+        self.assertEqual(expected, result)
+
+    def test_convert_temperatures_most_extreme_decides_gif(self):
+        """The gif is picked by the most extreme temperature in the batch."""
+        self.convert_batch_with("20 c and 40 c")
+
+        self.assertEqual(len(self.files), 1)
+        self.assertEqual(self.files[0].filename, "helldog.gif")
+
+    def test_convert_batch_matches_convert(self):
+        """Converting a batch gives the same results as converting one by one."""
+        batch = [
+            ParsedTemperature(origin, destination, temperature, False)
+            for origin in TempUnit
+            for destination in TempUnit
+            for temperature in [ -40.0, 0.0, 36.6, 451.0 ]
+        ]
+
+        expected = [ parsed.convert() for parsed in batch ]
+        self.assertEqual(expected, ParsedTemperature.convert_batch(batch))
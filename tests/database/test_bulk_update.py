@@ -0,0 +1,49 @@
+"""Unittests for the bulk update methods of the settings tables."""
+
+import logging
+import sqlite3
+
+from mrfreeze.database.migrations import migrate
+from mrfreeze.database.pool import pool
+from mrfreeze.database.tables.mute_channels import MuteChannels
+
+import pytest
+
+
+@pytest.fixture()
+def table(tmp_path):
+    """Create a loaded MuteChannels table in a temporary database."""
+    dbpath = str(tmp_path / "settings.db")
+    migrate(dbpath, logging.getLogger("test"))
+    table = MuteChannels(dbpath, logging.getLogger("test"))
+    table.load_from_db()
+    yield table
+    pool.close(dbpath)
+
+
+def stored(dbpath):
+    """Read the mute channels straight from the database file."""
+    conn = sqlite3.connect(dbpath)
+    rows = dict(conn.execute("SELECT server, mute_channel FROM guild_settings").fetchall())
+    conn.close()
+    return rows
+
+
+def test_upsert_many(table):
+    """Test that all pairs are written to the database and the dictionary."""
+    pairs = [ (server, server * 10) for server in range(500) ]
+    assert table.upsert_many(pairs)
+
+    assert stored(table.dbpath) == dict(pairs)
+    assert table.dict == dict(pairs)
+
+
+def test_upsert_many_is_atomic(table):
+    """Test that nothing is written if one of the values can't be written."""
+    table.upsert_many([ (1, 10) ])
+    old_dict = table.dict
+
+    assert not table.upsert_many([ (1, 11), (2, 20), (3, object()) ])
+    assert stored(table.dbpath) == { 1: 10 }
+    assert table.dict is old_dict
+    assert table.dict == { 1: 10 }
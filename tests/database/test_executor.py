@@ -0,0 +1,69 @@
+"""Unittests for the DatabaseExecutor."""
+
+import asyncio
+import sqlite3
+
+from mrfreeze.database.executor import DatabaseExecutor
+from mrfreeze.database.pool import pool
+
+import pytest
+
+
+@pytest.fixture()
+def dbpath(tmp_path):
+    """Create a database with a single table, close its pooled connection afterwards."""
+    path = str(tmp_path / "executor.db")
+    with pool.connection(path) as conn:
+        conn.execute("CREATE TABLE numbers (number INTEGER)")
+    yield path
+    pool.close(path)
+
+
+@pytest.fixture()
+def executor():
+    """Create a DatabaseExecutor, shut it down afterwards."""
+    executor = DatabaseExecutor(thread_name="test-db")
+    yield executor
+    executor.shutdown()
+
+
+def test_execute_returns_query_output(dbpath, executor):
+    """Test that queries run on the executor return their output."""
+    async def run():
+        await executor.execute(dbpath, "INSERT INTO numbers VALUES (?)", (42,))
+        return await executor.execute(dbpath, "SELECT number FROM numbers", tuple())
+
+    result = asyncio.run(run())
+    assert result.error is None
+    assert result.output == [ (42,) ]
+
+
+def test_event_loop_stays_responsive_while_write_is_blocked(dbpath, executor):
+    """
+    Test that the event loop keeps running while a write is waiting for a locked database.
+
+    Another connection holds an exclusive lock on the database for half a second. While
+    the write is waiting for that lock to be released the loop should keep ticking.
+    """
+    blocker = sqlite3.connect(dbpath, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.5, blocker.rollback)
+
+        write = asyncio.ensure_future(
+            executor.execute(dbpath, "INSERT INTO numbers VALUES (?)", (1,)))
+
+        ticks = 0
+        while not write.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+        return ticks, write.result()
+
+    ticks, result = asyncio.run(run())
+    blocker.close()
+
+    assert result.error is None
+    assert ticks >= 20, "Event loop was stalled while waiting for the database"
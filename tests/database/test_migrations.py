@@ -0,0 +1,115 @@
+"""Unittests for the settings database migrations."""
+
+import logging
+import sqlite3
+from datetime import datetime
+
+from mrfreeze.database import mute_codec
+from mrfreeze.database.migrations import LEGACY_MUTES
+from mrfreeze.database.migrations import MIGRATIONS
+from mrfreeze.database.migrations import Migration
+from mrfreeze.database.migrations import get_version
+from mrfreeze.database.migrations import migrate
+from mrfreeze.database.pool import pool
+
+import pytest
+
+logger = logging.getLogger("test")
+latest = MIGRATIONS[-1].version
+
+
+@pytest.fixture()
+def dbpath(tmp_path):
+    """Path to a temporary settings database, close its pooled connection afterwards."""
+    path = str(tmp_path / "settings.db")
+    yield path
+    pool.close(path)
+
+
+@pytest.fixture()
+def legacy_mutes(tmp_path):
+    """Create a mutes database the way earlier versions of the bot did."""
+    path = str(tmp_path / "mutes.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS mutes (
+        id          integer NOT NULL,
+        server      integer NOT NULL,
+        voluntary   boolean NOT NULL,
+        until       date,
+        CONSTRAINT  server_user PRIMARY KEY (id, server));""")
+    conn.execute("INSERT INTO mutes VALUES (1, 100, 0, '2020-01-01 12:00:00')")
+    conn.execute("INSERT INTO mutes (id, server, voluntary) VALUES (2, 100, 1)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def query(dbpath, sql):
+    """Run a query against a database file outside of the pool."""
+    conn = sqlite3.connect(dbpath)
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+
+def test_new_database_is_created_at_latest_version(dbpath):
+    """Test that migrating an empty file creates the whole schema."""
+    assert migrate(dbpath, logger) == latest
+    assert query(dbpath, "SELECT * FROM guild_settings") == list()
+    assert query(dbpath, "SELECT * FROM mutes") == list()
+
+
+def test_legacy_database_is_upgraded_in_place(dbpath, legacy_mutes):
+    """Test that settings and mutes from before migrations are carried over."""
+    conn = sqlite3.connect(dbpath)
+    conn.execute("CREATE TABLE mute_channels (server INTEGER NOT NULL PRIMARY KEY, channel INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE freeze_mutes (server INTEGER PRIMARY KEY NOT NULL, muted BOOLEAN NOT NULL)")
+    conn.execute("CREATE TABLE welcome_messages (server INTEGER NOT NULL PRIMARY KEY, template TEXT)")
+    conn.execute("INSERT INTO mute_channels VALUES (100, 1000), (200, 2000)")
+    conn.execute("INSERT INTO freeze_mutes VALUES (100, 1)")
+    conn.execute("INSERT INTO welcome_messages VALUES (300, 'Welcome {username}!')")
+    conn.commit()
+    conn.close()
+
+    assert migrate(dbpath, logger, attach={ LEGACY_MUTES: legacy_mutes }) == latest
+
+    rows = query(dbpath, """
+        SELECT server, mute_channel, freeze_muted, welcome_message
+        FROM guild_settings ORDER BY server""")
+    assert rows == [
+        (100, 1000, 1, None),
+        (200, 2000, None, None),
+        (300, None, None, "Welcome {username}!"),
+    ]
+
+    assert query(dbpath, "SELECT * FROM mutes ORDER BY id") == [
+        (1, 100, 0, mute_codec.encode(datetime(2020, 1, 1, 12, 0, 0))),
+        (2, 100, 1, None),
+    ]
+
+    tables = [ row[0] for row in query(dbpath, "SELECT name FROM sqlite_master WHERE type = 'table'") ]
+    assert "mute_channels" not in tables
+
+
+def test_migrate_is_idempotent(dbpath, legacy_mutes):
+    """Test that migrating an up to date database doesn't change anything."""
+    migrate(dbpath, logger, attach={ LEGACY_MUTES: legacy_mutes })
+    migrate(dbpath, logger, attach={ LEGACY_MUTES: legacy_mutes })
+    assert len(query(dbpath, "SELECT * FROM mutes")) == 2
+
+
+def test_failed_migration_is_rolled_back(dbpath):
+    """Test that a failing migration leaves the database at the previous version."""
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        conn.execute("SELECT * FROM no_such_table")
+
+    migrations = MIGRATIONS + [ Migration(latest + 1, "broken", broken) ]
+    with pytest.raises(sqlite3.Error):
+        migrate(dbpath, logger, migrations=migrations)
+
+    with pool.connection(dbpath) as conn:
+        assert get_version(conn) == latest
+
+    tables = [ row[0] for row in query(dbpath, "SELECT name FROM sqlite_master WHERE type = 'table'") ]
+    assert "half_done" not in tables
@@ -0,0 +1,36 @@
+"""Unittests for the mute expiry codec."""
+
+import datetime
+
+from mrfreeze.database import mute_codec
+
+
+def test_round_trip_keeps_milliseconds():
+    """Test that encoding and decoding a datetime keeps millisecond precision."""
+    date = datetime.datetime(2020, 6, 1, 12, 30, 15, 250000)
+    assert mute_codec.decode(mute_codec.encode(date)) == date
+
+
+def test_none_means_permanent():
+    """Test that permanent mutes are stored and read back as None."""
+    assert mute_codec.encode(None) is None
+    assert mute_codec.decode(None) is None
+
+
+def test_overflow_is_clamped():
+    """Test that dates too far in the future are stored as the latest possible time."""
+    assert mute_codec.encode(datetime.datetime.max) == mute_codec.MAX_UNTIL
+
+
+def test_from_legacy():
+    """Test that the old string format is converted to the same instant."""
+    legacy = mute_codec.from_legacy("2020-06-01 12:30:15")
+    assert legacy == mute_codec.encode(datetime.datetime(2020, 6, 1, 12, 30, 15))
+    assert mute_codec.from_legacy(None) is None
+
+
+def test_timedelta_conversion():
+    """Test converting between millisecond differences and timedeltas."""
+    delta = datetime.timedelta(minutes=5, milliseconds=1)
+    assert mute_codec.from_timedelta(delta) == 300001
+    assert mute_codec.to_timedelta(300001) == delta
@@ -0,0 +1,22 @@
+"""Unittests for the ConnectionPool."""
+
+from mrfreeze.database.pool import ConnectionPool
+
+
+def test_relative_paths_follow_working_directory(tmp_path, monkeypatch):
+    """Test that the same relative path in another directory gets its own connection."""
+    pool = ConnectionPool()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+
+    monkeypatch.chdir(tmp_path / "a")
+    with pool.connection("test.db") as conn:
+        conn.execute("CREATE TABLE a (x INTEGER)")
+
+    monkeypatch.chdir(tmp_path / "b")
+    with pool.connection("test.db") as conn:
+        tables = conn.execute("SELECT name FROM sqlite_master").fetchall()
+
+    assert tables == []
+    assert len(pool.connections) == 2
+    pool.close_all()
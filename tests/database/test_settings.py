@@ -0,0 +1,144 @@
+"""Unittests for the Settings class."""
+
+import asyncio
+import logging
+import re
+import threading
+
+from mrfreeze.database.pool import pool
+from mrfreeze.database.settings import Settings
+
+import pytest
+
+from tests import helpers
+
+
+@pytest.fixture()
+def settings(tmp_path, monkeypatch):
+    """Create Settings in a temporary directory, close its connection afterwards."""
+    monkeypatch.chdir(tmp_path)
+    settings = Settings()
+    yield settings
+    settings.close()
+    pool.close(settings.dbpath)
+
+
+def test_load_all_loads_every_table(settings, caplog):
+    """Test that the bulk load fills every table and logs how many values each one got, and how fast."""
+    with pool.connection(settings.dbpath) as conn:
+        conn.execute("""
+        INSERT INTO guild_settings (server, mute_channel, freeze_muted, welcome_message)
+        VALUES (1, 10, 1, 'hello'), (2, 20, NULL, NULL)
+        """)
+
+    with caplog.at_level(logging.INFO):
+        settings.load_all()
+
+    assert settings.get_mute_channel(helpers.MockGuild(id=1)) == 10
+    assert settings.get_mute_channel(helpers.MockGuild(id=2)) == 20
+    assert settings.is_freeze_muted(helpers.MockGuild(id=1))
+    assert settings.is_freeze_muted(helpers.MockGuild(id=2)) is None
+    assert settings.get_welcome_message(helpers.MockGuild(id=1)) == "hello"
+    assert settings.get_guild(helpers.MockGuild(id=1)).mute_channel == 10
+    assert settings.get_guild(helpers.MockGuild(id=2)).freeze_muted is None
+
+    timings = dict()
+    for record in caplog.records:
+        match = re.search(r"loaded (\d+) rows for (.+) in ([\d.]+) ms", record.getMessage())
+        if match:
+            timings[match.group(2)] = (int(match.group(1)), float(match.group(3)))
+
+    assert set(timings) == { table.name for table in settings.tables }
+    assert timings[settings.mute_channels.name][0] == 2
+    assert timings[settings.welcome_messages.name][0] == 1
+    assert all([ ms >= 0 for _, ms in timings.values() ])
+
+
+def test_load_all_failure_leaves_tables_unloaded(settings):
+    """Test that a failed bulk load leaves the tables to load themselves on first access."""
+    with pool.connection(settings.dbpath) as conn:
+        conn.execute("ALTER TABLE guild_settings RENAME TO moved_settings")
+    settings.load_all()
+
+    assert all([ table.dict is None for table in settings.tables ])
+
+
+def test_guild_records_reload_after_failed_load(settings):
+    """Test that looking up a guild after a failed load tries loading the settings again."""
+    with pool.connection(settings.dbpath) as conn:
+        conn.execute("INSERT INTO guild_settings (server, tempconverter_muted) VALUES (1, 1)")
+        conn.execute("ALTER TABLE guild_settings RENAME TO moved_settings")
+    settings.load_all()
+    assert settings.get_guild(helpers.MockGuild(id=1)) is settings.guilds.empty
+
+    with pool.connection(settings.dbpath) as conn:
+        conn.execute("ALTER TABLE moved_settings RENAME TO guild_settings")
+    assert settings.get_guild(helpers.MockGuild(id=1)).tempconverter_muted
+    assert settings.guilds.loaded
+
+
+def test_guild_record_follows_table_updates(settings):
+    """Test that the per-guild record is kept in sync with the tables."""
+    with pool.connection(settings.dbpath) as conn:
+        conn.execute("INSERT INTO guild_settings (server, inkcyclopedia_channel) VALUES (1, 10)")
+    settings.load_all()
+
+    record = settings.get_guild(helpers.MockGuild(id=1))
+    assert record.inkcyclopedia_channel == 10
+    assert record.inkcyclopedia_muted is None
+
+    settings.toggle_inkcyclopedia_mute(helpers.MockGuild(id=1))
+    settings.set_inkcyclopedia_channel_by_id(helpers.MockGuild(id=1), 20)
+    assert settings.get_guild(helpers.MockGuild(id=1)) is record
+    assert record.inkcyclopedia_muted
+    assert record.inkcyclopedia_channel == 20
+    assert settings.get_inkcyclopedia_channel(helpers.MockGuild(id=1)) == 20
+
+
+def test_guild_record_for_unknown_guild(settings):
+    """Test that guilds without settings get a record with everything unset."""
+    record = settings.get_guild(helpers.MockGuild(id=404))
+    assert record.freeze_muted is None
+    assert record.tempconverter_muted is None
+
+
+def test_async_setters_update_memory_on_calling_thread(settings, monkeypatch):
+    """Test that only the database write of the async setters leaves the event loop's thread."""
+    threads = list()
+    index_set = settings.guilds.set
+
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        index_set(*args)
+
+    monkeypatch.setattr(settings.guilds, "set", record_thread)
+
+    async def change_settings():
+        await settings.set_mute_channel_by_id_async(helpers.MockGuild(id=1), 10)
+        await settings.toggle_freeze_mute_async(helpers.MockGuild(id=1))
+
+    asyncio.run(change_settings())
+
+    assert threads == [ threading.get_ident() ] * 2
+    assert settings.get_guild(helpers.MockGuild(id=1)).mute_channel == 10
+    assert settings.is_freeze_muted(helpers.MockGuild(id=1))
+    with pool.connection(settings.dbpath) as conn:
+        row = conn.execute("SELECT mute_channel, freeze_muted FROM guild_settings WHERE server = 1").fetchone()
+    assert row == (10, 1)
+
+
+def test_concurrent_toggles_both_apply(settings):
+    """Test that toggles running at the same time each flip the value once."""
+    server = helpers.MockGuild(id=1)
+
+    async def toggle(times):
+        await asyncio.gather(*[ settings.toggle_freeze_mute_async(server) for _ in range(times) ])
+
+    asyncio.run(toggle(2))
+    assert settings.is_freeze_muted(server) is False
+
+    asyncio.run(toggle(3))
+    assert settings.is_freeze_muted(server) is True
+    with pool.connection(settings.dbpath) as conn:
+        row = conn.execute("SELECT freeze_muted FROM guild_settings WHERE server = 1").fetchone()
+    assert row == (1,)
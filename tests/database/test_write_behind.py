@@ -0,0 +1,94 @@
+"""Unittests for the WriteBehindQueue."""
+
+import logging
+import sqlite3
+import time
+
+from mrfreeze.database.migrations import migrate
+from mrfreeze.database.pool import pool
+from mrfreeze.database.tables.mute_interval import MuteInterval
+from mrfreeze.database.write_behind import WriteBehindQueue
+
+import pytest
+
+from tests import helpers
+
+
+@pytest.fixture()
+def dbpath(tmp_path):
+    """Path to a temporary database, close its pooled connection afterwards."""
+    path = str(tmp_path / "settings.db")
+    yield path
+    pool.close(path)
+
+
+@pytest.fixture()
+def queue():
+    """Create a WriteBehindQueue that only flushes when told to."""
+    queue = WriteBehindQueue(logging.getLogger("test"), interval=60, max_pending=1000)
+    yield queue
+    queue.close()
+
+
+@pytest.fixture()
+def table(dbpath, queue):
+    """Create a MuteInterval table using the write-behind queue."""
+    migrate(dbpath, logging.getLogger("test"))
+    table = MuteInterval(dbpath, logging.getLogger("test"))
+    table.load_from_db()
+    table.write_behind = queue
+    return table
+
+
+def stored(dbpath):
+    """Read the mute intervals straight from the database file."""
+    conn = sqlite3.connect(dbpath)
+    rows = dict(conn.execute("SELECT server, mute_interval FROM guild_settings").fetchall())
+    conn.close()
+    return rows
+
+
+def test_upsert_updates_dictionary_before_flush(dbpath, table):
+    """Test that upserts are visible right away, but only written on flush."""
+    assert table.set_by_id(helpers.MockGuild(id=1), 5)
+    assert table.get(helpers.MockGuild(id=1)) == 5
+    assert stored(dbpath) == dict()
+
+    table.write_behind.flush()
+    assert stored(dbpath) == { 1: 5 }
+
+
+def test_flush_keeps_latest_value_per_key(dbpath, table):
+    """Test that several changes to the same key are written as one row."""
+    for server in range(10):
+        table.set_by_id(helpers.MockGuild(id=server), 1)
+    table.set_by_id(helpers.MockGuild(id=3), 7)
+
+    assert table.write_behind.flush() == 10
+    assert stored(dbpath)[3] == 7
+    assert len(stored(dbpath)) == 10
+
+
+def test_size_threshold_triggers_flush(dbpath, table):
+    """Test that the queue flushes on its own when enough rows are pending."""
+    table.write_behind.max_pending = 3
+    for server in range(3):
+        table.set_by_id(helpers.MockGuild(id=server), server)
+
+    deadline = time.monotonic() + 5
+    while table.write_behind.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    with table.write_behind.flush_lock:
+        # Wait for the flush that emptied the queue to finish.
+        pass
+    assert stored(dbpath) == { 0: 0, 1: 1, 2: 2 }
+
+
+def test_close_flushes_pending_rows(dbpath, table):
+    """Test that closing the queue writes whatever is still pending."""
+    table.set_by_id(helpers.MockGuild(id=1), 10)
+    table.write_behind.close()
+
+    assert stored(dbpath) == { 1: 10 }
+    assert table.write_behind.timer is None
@@ -0,0 +1,82 @@
+"""Unittests for the AssetRegistry."""
+
+import os
+
+from mrfreeze.lib.assets import AssetRegistry
+
+
+def touch(path, text):
+    """Write a file and make sure it looks modified."""
+    path.write_text(text)
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_files_are_read_once(tmp_path):
+    """Test that an asset is only read from disk the first time it's used."""
+    path = tmp_path / "image.gif"
+    path.write_bytes(b"GIF89a")
+    registry = AssetRegistry()
+
+    first = registry.file(str(path))
+    second = registry.file(str(path))
+
+    assert registry.loads == 1
+    assert first.filename == "image.gif"
+    assert first.fp.read() == second.fp.read() == b"GIF89a"
+    assert first.fp is not second.fp
+
+
+def test_file_with_other_name(tmp_path):
+    """Test that the filename of the discord.File can be changed."""
+    path = tmp_path / "image.gif"
+    path.write_bytes(b"GIF89a")
+    registry = AssetRegistry()
+
+    assert registry.file(str(path), filename="other.gif").filename == "other.gif"
+
+
+def test_lines(tmp_path):
+    """Test that text files are split into lines once."""
+    path = tmp_path / "quotes"
+    path.write_text("first\nsecond\n")
+    registry = AssetRegistry()
+
+    lines = registry.lines(str(path))
+    assert lines == ("first", "second")
+    assert registry.lines(str(path)) is lines
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    """Test that a file changed on disk is read again."""
+    path = tmp_path / "quotes"
+    path.write_text("first")
+    registry = AssetRegistry(check_interval=0)
+    assert registry.lines(str(path)) == ("first",)
+
+    touch(path, "second")
+    assert registry.lines(str(path)) == ("second",)
+    assert registry.loads == 2
+
+
+def test_changes_checked_at_interval(tmp_path):
+    """Test that files aren't checked for changes more often than the interval."""
+    path = tmp_path / "quotes"
+    path.write_text("first")
+    registry = AssetRegistry(check_interval=3600)
+    registry.data(str(path))
+
+    touch(path, "second")
+    assert registry.data(str(path)) == b"first"
+    assert registry.reload_if_changed(str(path)).data == b"second"
+
+
+def test_removed_file_keeps_old_contents(tmp_path):
+    """Test that a file which can't be read again leaves the old contents in place."""
+    path = tmp_path / "image.gif"
+    path.write_bytes(b"GIF89a")
+    registry = AssetRegistry(check_interval=0)
+    registry.data(str(path))
+
+    path.unlink()
+    assert registry.data(str(path)) == b"GIF89a"
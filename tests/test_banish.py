@@ -0,0 +1,22 @@
+"""Unittests for the banish command module."""
+
+from unittest.mock import MagicMock
+
+import discord
+
+from mrfreeze.lib.banish import banish
+
+
+def test_sort_results():
+    """Test that victims are split by their errors, and that Forbidden isn't mistaken for other HTTP errors."""
+    victims = [ MagicMock(id=id) for id in range(3) ]
+    forbidden = discord.Forbidden(MagicMock(status=403), "Missing permissions")
+
+    success, fails, errors = banish.sort_results(victims, [ None, forbidden, None ])
+    assert success == [ victims[0], victims[2] ]
+    assert fails == [ victims[1] ]
+    assert errors == "**a lack of privilegies**"
+
+    http = discord.HTTPException(MagicMock(status=500), "Internal server error")
+    _, _, errors = banish.sort_results(victims, [ http, forbidden, ValueError() ])
+    assert errors == "**a wild mix of crazy exceptions**"
@@ -0,0 +1,37 @@
+"""Unittests for the ContentScanner."""
+
+import re
+
+from mrfreeze.lib.content_scanner import ContentScanner
+
+
+def test_scan_runs_only_triggered_patterns():
+    """Test that patterns are only run when their trigger characters are present."""
+    scanner = ContentScanner()
+    digits = re.compile(r"\d+")
+    scanner.register("numbers", digits, "0123456789")
+    scanner.register("inks", re.compile(r"{(\w+)}"), "{")
+
+    assert scanner.scan("nothing interesting here") == dict()
+
+    result = scanner.scan("{sailor} costs 25")
+    assert [ m.group(1) for m in result["inks"] ] == [ "sailor" ]
+    assert [ m.group(0) for m in result["numbers"] ] == [ "25" ]
+
+    # Triggers without a match don't show up.
+    assert scanner.scan("a { but no ink") == dict()
+
+
+def test_unregister_rebuilds_prefilter():
+    """Test that the trigger characters of removed patterns are no longer looked for."""
+    scanner = ContentScanner()
+    scanner.register("inks", re.compile(r"{(\w+)}"), "{")
+    scanner.register("commands", re.compile(r"^!\w+"), "!")
+    scanner.unregister("inks")
+
+    assert scanner.prefilter.pattern == "[!]"
+    assert scanner.scan("{ink}") == dict()
+
+    scanner.unregister("commands")
+    assert scanner.prefilter is None
+    assert scanner.scan("!mute") == dict()
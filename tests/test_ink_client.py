@@ -0,0 +1,166 @@
+"""Unittests for the Inkcyclopedia client, run against a local stand-in for the API."""
+
+import asyncio
+import logging
+import time
+
+from aiohttp import web
+
+from mrfreeze.lib.ink_client import BreakerState
+from mrfreeze.lib.ink_client import CircuitBreaker
+from mrfreeze.lib.ink_client import CircuitOpenError
+from mrfreeze.lib.ink_client import InkClient
+from mrfreeze.lib.ink_client import InkLookupError
+
+import pytest
+
+logger = logging.getLogger("test")
+found = { "diamine oxblood": { "fullName": "Diamine Oxblood", "primaryImage": "https://example.com/ox.png" } }
+
+
+class StandIn:
+    """A local server answering search requests with the given statuses, then with found."""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = 0
+        self.peers = set()
+
+    async def search(self, request):
+        """Answer a search request."""
+        self.requests += 1
+        self.peers.add(request.transport.get_extra_info("peername"))
+        await request.json()
+        await asyncio.sleep(self.delay)
+
+        if self.statuses:
+            return web.Response(status=self.statuses.pop(0))
+        return web.json_response({ "found": found })
+
+    async def run(self, test, **client_args):
+        """Start the server, run test with a client pointed at it, then stop everything."""
+        app = web.Application()
+        app.router.add_post("/search", self.search)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        client_args.setdefault("backoff", 0.0)
+        client = InkClient(f"http://127.0.0.1:{port}/search", logger, **client_args)
+        try:
+            return await test(client)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+
+def test_search_reuses_connection():
+    """Test that searches return what was found, over a single kept-alive connection."""
+    server = StandIn()
+
+    async def test(client):
+        return [ await client.search([ "diamine oxblood" ]) for _ in range(3) ]
+
+    assert asyncio.run(server.run(test)) == [ found ] * 3
+    assert server.requests == 3
+    assert len(server.peers) == 1
+
+
+def test_search_retries_server_errors():
+    """Test that 5xx responses are retried."""
+    server = StandIn(statuses=[ 503, 500 ])
+
+    async def test(client):
+        return await client.search([ "diamine oxblood" ])
+
+    assert asyncio.run(server.run(test, retries=2)) == found
+    assert server.requests == 3
+
+
+def test_search_gives_up_after_retries():
+    """Test that a search fails once all retries have failed."""
+    server = StandIn(statuses=[ 503 ] * 3)
+
+    async def test(client):
+        with pytest.raises(InkLookupError):
+            await client.search([ "diamine oxblood" ])
+        return client.breaker.failures
+
+    assert asyncio.run(server.run(test, retries=2)) == 1
+    assert server.requests == 3
+
+
+def test_client_errors_are_not_retried():
+    """Test that 4xx responses fail right away without counting against the API."""
+    server = StandIn(statuses=[ 400 ])
+
+    async def test(client):
+        with pytest.raises(InkLookupError):
+            await client.search([ "diamine oxblood" ])
+        return client.breaker.failures
+
+    assert asyncio.run(server.run(test, retries=2)) == 0
+    assert server.requests == 1
+
+
+def test_search_times_out():
+    """Test that a slow API makes the search fail within the timeout."""
+    server = StandIn(delay=1.0)
+
+    async def test(client):
+        start = time.monotonic()
+        with pytest.raises(InkLookupError):
+            await client.search([ "diamine oxblood" ])
+        return time.monotonic() - start
+
+    assert asyncio.run(server.run(test, timeout=0.1, retries=1)) < 0.9
+    assert server.requests == 2
+
+
+def test_open_breaker_fails_fast():
+    """Test that no requests are made while the circuit breaker is open."""
+    server = StandIn(statuses=[ 503 ] * 2)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    async def test(client):
+        for _ in range(2):
+            with pytest.raises(InkLookupError):
+                await client.search([ "diamine oxblood" ])
+
+        with pytest.raises(CircuitOpenError):
+            await client.search([ "diamine oxblood" ])
+
+    asyncio.run(server.run(test, retries=0, breaker=breaker))
+    assert server.requests == 2
+    assert breaker.state == BreakerState.OPEN
+
+
+def test_breaker_lets_one_trial_through():
+    """Test that a half open breaker allows a single trial, and closes if it succeeds."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_opens_breaker():
+    """Test that a failed trial opens the breaker again."""
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
@@ -0,0 +1,52 @@
+"""Unittests for the cache-first MemberResolver."""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import discord
+
+from mrfreeze.lib.member_resolver import MemberResolver
+
+import pytest
+
+from tests import helpers
+
+
+@pytest.fixture()
+def guild():
+    """Create a mock guild with member 1 in the cache, member 2 only available from the API."""
+    cached = helpers.MockMember(id=1)
+    fetched = helpers.MockMember(id=2)
+    guild = helpers.MockGuild(id=1)
+    guild.get_member.side_effect = lambda id: cached if id == 1 else None
+
+    async def fetch_member(id):
+        if id == 2:
+            return fetched
+        raise discord.NotFound(MagicMock(status=404), "Unknown member")
+
+    guild.fetch_member.side_effect = fetch_member
+    return guild
+
+
+def api_calls(guild):
+    """List the ids of the members fetched from the API."""
+    return [ call.args[0] for call in guild.fetch_member.await_args_list ]
+
+
+def test_cached_member_is_not_fetched(guild):
+    """Test that members in the cache are returned without asking the API."""
+    resolver = MemberResolver()
+    assert asyncio.run(resolver.resolve(guild, 1)).id == 1
+    assert api_calls(guild) == list()
+    assert (resolver.hits, resolver.misses) == (1, 0)
+
+
+def test_cache_miss_falls_back_to_api(guild):
+    """Test that members missing from the cache are fetched, and that departed members are None."""
+    resolver = MemberResolver()
+    assert asyncio.run(resolver.resolve(guild, 2)).id == 2
+    assert asyncio.run(resolver.resolve(guild, 3)) is None
+    assert api_calls(guild) == [ 2, 3 ]
+    assert (resolver.hits, resolver.misses) == (0, 2)
+    assert str(resolver) == "0 cache hits, 2 misses (0% hit rate)"
@@ -0,0 +1,123 @@
+"""Unittests for the MessagePipeline."""
+
+import asyncio
+import logging
+import re
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+from mrfreeze.database.guild_settings import GuildSettings
+from mrfreeze.lib.message_pipeline import MessagePipeline
+
+import pytest
+
+
+@pytest.fixture()
+def bot():
+    """Create a mock bot with a server where MrFreeze is muted and one where it isn't."""
+    muted = GuildSettings(2)
+    muted.freeze_muted = True
+    settings = { 1: GuildSettings(1), 2: muted }
+
+    bot = MagicMock()
+    bot.settings.get_guild.side_effect = lambda guild: settings[guild.id]
+    bot.settings.guilds.empty = GuildSettings(0)
+    bot.get_context = AsyncMock(side_effect=lambda message: MagicMock(message=message))
+    return bot
+
+
+def message(guild_id, is_bot=False, content="hello"):
+    """Create a mock message sent in a server, or in DMs if guild_id is None."""
+    message = MagicMock()
+    message.content = content
+    message.author.bot = is_bot
+    message.guild = MagicMock(id=guild_id) if guild_id else None
+    return message
+
+
+def test_context_is_built_once_for_all_stages(bot):
+    """Test that every stage gets the same context, built once."""
+    pipeline = MessagePipeline(bot, logging.getLogger("test"))
+    received = list()
+
+    async def stage(ctx, settings, matches):
+        received.append((ctx, settings.server))
+
+    pipeline.register("first", stage)
+    pipeline.register("second", stage)
+    asyncio.run(pipeline.dispatch(message(1)))
+
+    assert bot.get_context.await_count == 1
+    assert len(received) == 2
+    assert received[0] == received[1]
+    assert received[0][1] == 1
+
+
+def test_shared_filters(bot):
+    """Test that bots are ignored, and that only some stages run when MrFreeze is muted."""
+    pipeline = MessagePipeline(bot, logging.getLogger("test"))
+    called = list()
+
+    def stage(name):
+        async def callback(ctx, settings, matches):
+            called.append(name)
+        return callback
+
+    pipeline.register("commands", stage("commands"), when_freeze_muted=True)
+    pipeline.register("listener", stage("listener"))
+
+    asyncio.run(pipeline.dispatch(message(1, is_bot=True)))
+    assert called == list()
+    assert bot.get_context.await_count == 0
+
+    asyncio.run(pipeline.dispatch(message(2)))
+    assert called == [ "commands" ]
+
+    asyncio.run(pipeline.dispatch(message(None)))
+    assert sorted(called) == [ "commands", "commands", "listener" ]
+
+
+def test_stage_timings_and_errors(bot):
+    """Test that each stage is timed, and that a failing stage doesn't stop the others."""
+    pipeline = MessagePipeline(bot, logging.getLogger("test"))
+
+    async def slow(ctx, settings, matches):
+        await asyncio.sleep(0.02)
+
+    async def broken(ctx, settings, matches):
+        raise ValueError("oops")
+
+    pipeline.register("slow", slow)
+    pipeline.register("broken", broken)
+    asyncio.run(pipeline.dispatch(message(1)))
+    asyncio.run(pipeline.dispatch(message(1)))
+
+    assert pipeline.timings["slow"].runs == 2
+    assert pipeline.timings["slow"].slowest >= 0.02
+    assert pipeline.timings["broken"].errors == 2
+    assert pipeline.report("broken")[0].startswith("broken: 2 runs")
+
+    pipeline.unregister("slow")
+    assert [ stage.name for stage in pipeline.stages ] == [ "broken" ]
+
+
+def test_scanned_stages_only_run_on_matches(bot):
+    """Test that stages with a pattern get their matches, and that no context is built if nobody is interested."""
+    pipeline = MessagePipeline(bot, logging.getLogger("test"))
+    received = dict()
+
+    def stage(name):
+        async def callback(ctx, settings, matches):
+            received[name] = [ match.group(1) for match in matches ]
+        return callback
+
+    pipeline.register("commands", stage("commands"), pattern=re.compile(r"^!(\w+)"), triggers="!")
+    pipeline.register("inks", stage("inks"), pattern=re.compile(r"{(\w+)}"), triggers="{")
+
+    asyncio.run(pipeline.dispatch(message(1, content="just chatting, nothing to see!")))
+    assert received == dict()
+    assert bot.get_context.await_count == 0
+
+    asyncio.run(pipeline.dispatch(message(1, content="look at {diamine} and {pilot}")))
+    assert received == { "inks": [ "diamine", "pilot" ] }
+    assert bot.get_context.await_count == 1
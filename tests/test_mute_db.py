@@ -0,0 +1,207 @@
+"""Unittests for the mute queries in mute_db."""
+
+import asyncio
+import logging
+from unittest.mock import MagicMock
+
+import discord
+
+from mrfreeze.database.migrations import migrate
+from mrfreeze.database.pool import pool
+from mrfreeze.lib.banish import mute_db
+
+import pytest
+
+from tests import helpers
+
+now = 1_591_012_800_000
+minute = 60_000
+
+
+@pytest.fixture()
+def bot(tmp_path):
+    """Create a mock bot with a migrated settings database containing some mutes."""
+    dbpath = str(tmp_path / "settings.db")
+    migrate(dbpath, logging.getLogger("test"))
+
+    mutes = [
+        (1, 100, False, now - 5 * minute),
+        (2, 100, False, now - 10 * minute),
+        (3, 100, True,  now + 5 * minute),
+        (4, 100, False, None),
+        (5, 200, False, now - minute),
+        (6, 200, False, now + minute),
+    ]
+    with pool.connection(dbpath) as conn:
+        conn.executemany(
+            "INSERT INTO mutes (id, server, voluntary, until) VALUES (?, ?, ?, ?)",
+            mutes)
+
+    bot = MagicMock()
+    bot.settings.dbpath = dbpath
+    yield bot
+    pool.close(dbpath)
+
+
+def test_fetch_due_for_server(bot):
+    """Test that only expired timed mutes for the server are returned, earliest first."""
+    due = asyncio.run(mute_db.mdb_fetch_due(bot, helpers.MockGuild(id=100), now=now))
+    assert [ mute.member_id for mute in due ] == [ 2, 1 ]
+    assert due[0].until == now - 10 * minute
+
+
+def test_fetch_due_for_all_servers(bot):
+    """Test that expired mutes from every server are returned when no server is given."""
+    due = asyncio.run(mute_db.mdb_fetch_due(bot, now=now))
+    assert [ (mute.server_id, mute.member_id) for mute in due ] == [ (100, 2), (100, 1), (200, 5) ]
+
+
+def test_due_query_uses_index(bot):
+    """Test that the due mutes are looked up through an index rather than a full scan."""
+    statements = list()
+    conn = pool.get_connection(bot.settings.dbpath)
+    conn.set_trace_callback(statements.append)
+    try:
+        mute_db.mdb_fetch_due_rows(bot, now, 100)
+        mute_db.mdb_fetch_due_rows(bot, now)
+    finally:
+        conn.set_trace_callback(None)
+
+    queries = [ sql for sql in statements if "SELECT" in sql ]
+    assert len(queries) == 2
+
+    with pool.connection(bot.settings.dbpath) as conn:
+        for sql in queries:
+            plan = " ".join([ row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}") ])
+            assert "USING INDEX" in plan, plan
+
+
+def test_fetch_resolves_members_through_cache(bot):
+    """Test that members are looked up by id, with a stand-in for uncached members."""
+    server = MagicMock(spec=discord.Guild)
+    server.id = 200
+    cached = MagicMock()
+    cached.id = 5
+    server.get_member.side_effect = lambda id: cached if id == 5 else None
+
+    mutes = asyncio.run(mute_db.mdb_fetch(bot, server))
+    members = { mute.member.id: mute.member for mute in mutes }
+
+    assert members[5] is cached
+    assert isinstance(members[6], mute_db.UncachedMember)
+    assert members[6].mention == "<@6>"
+    assert members[6].guild is server
+
+
+def test_add_prolongs_timed_mute(bot):
+    """Test that adding a timed mute to a timed mute adds the time that was left."""
+    bot.parse_timedelta = str
+    logger = logging.getLogger("test")
+    victim = helpers.MockMember(id=10, guild=helpers.MockGuild(id=100))
+    start = mute_db.mute_codec.now()
+
+    end_date = mute_db.mute_codec.decode(start + 5 * minute)
+    first, = mute_db.mdb_add_many_blocking(bot, [ victim ], logger, end_date=end_date)
+    second, = mute_db.mdb_add_many_blocking(bot, [ victim ], logger, end_date=end_date)
+
+    assert first.member is victim
+    assert abs(first.until - (start + 5 * minute)) < 1000
+    assert abs(second.until - (start + 10 * minute)) < 1000
+    assert mute_db.mdb_fetch_rows(bot, 100, 10) == [ (10, 100, 0, second.until) ]
+
+
+def test_add_replaces_permanent_mute(bot):
+    """Test that timed mutes replace permanent ones, and permanent mutes replace timed ones."""
+    bot.parse_timedelta = str
+    logger = logging.getLogger("test")
+
+    # Member 4 is permanently muted.
+    muted = helpers.MockMember(id=4, guild=helpers.MockGuild(id=100))
+    timed, = mute_db.mdb_add_many_blocking(bot, [ muted ], logger, end_date=mute_db.mute_codec.decode(now))
+    assert timed.until == now
+
+    permanent, = mute_db.mdb_add_many_blocking(bot, [ muted ], logger, voluntary=True)
+    assert permanent.until is None
+    assert permanent.voluntary
+
+
+def test_del(bot):
+    """Test that deleting a mute removes it, and that deleting a missing mute succeeds."""
+    logger = logging.getLogger("test")
+    assert mute_db.mdb_del_many_blocking(bot, helpers.MockGuild(id=100), [ 1 ], logger)
+    assert mute_db.mdb_fetch_rows(bot, 100, 1) == list()
+    assert mute_db.mdb_del_many_blocking(bot, helpers.MockGuild(id=100), [ 1 ], logger)
+
+
+def test_del_many(bot):
+    """Test that several mutes of a server are removed at once, leaving other servers alone."""
+    assert asyncio.run(mute_db.mdb_del_many(bot, helpers.MockGuild(id=100), [ 1, 2, 5 ], logging.getLogger("test")))
+    rows = mute_db.mdb_fetch_rows(bot, 100) + mute_db.mdb_fetch_rows(bot, 200)
+    assert sorted(row[0] for row in rows) == [ 3, 4, 5, 6 ]
+
+
+def test_del_many_keeps_renewed_mutes(bot):
+    """Test that only mutes which had expired are removed when an expiry time is given."""
+    logger = logging.getLogger("test")
+    server = helpers.MockGuild(id=100)
+    assert asyncio.run(mute_db.mdb_del_many(bot, server, [ 1, 2, 3, 4 ], logger, expired_by=now - 6 * minute))
+    assert sorted(row[0] for row in mute_db.mdb_fetch_rows(bot, 100)) == [ 1, 3, 4 ]
+
+
+def test_add_many(bot):
+    """Test that several mutes are added or prolonged together."""
+    logger = logging.getLogger("test")
+    start = mute_db.mute_codec.now()
+    end_date = mute_db.mute_codec.decode(start + 5 * minute)
+
+    # Member 1 has a timed mute which expired five minutes before now, member 11 has no mute.
+    server = helpers.MockGuild(id=100)
+    victims = [ helpers.MockMember(id=1, guild=server), helpers.MockMember(id=11, guild=server) ]
+    mutes = mute_db.mdb_add_many_blocking(bot, victims, logger, end_date=end_date)
+    until = { mute.member.id: mute.until for mute in mutes }
+
+    assert abs(until[1] - now) < 1000
+    assert abs(until[11] - (start + 5 * minute)) < 1000
+    assert mute_db.mdb_fetch_rows(bot, 100, 11) == [ (11, 100, 0, until[11]) ]
+
+
+def test_carry_out_banish_many(bot):
+    """Test that roles are added concurrently, and only those who got the role are stored and scheduled."""
+    mute_role = object()
+    server = helpers.MockGuild(id=100)
+    running = list()
+    peak = list()
+
+    async def get_mute_role(server):
+        return mute_role
+
+    def victim(id):
+        async def add_roles(role):
+            running.append(id)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(id)
+            if id == 13:
+                raise discord.Forbidden(MagicMock(status=403), "Missing permissions")
+
+        victim = MagicMock()
+        victim.id = id
+        victim.guild = server
+        victim.roles = list()
+        victim.add_roles = add_roles
+        return victim
+
+    bot.get_mute_role = get_mute_role
+    victims = [ victim(id) for id in range(10, 20) ]
+    end_date = mute_db.mute_codec.decode(now)
+
+    errors = asyncio.run(mute_db.carry_out_banish_many(
+        bot, victims, logging.getLogger("test"), end_date, concurrency=4))
+
+    assert max(peak) == 4
+    assert [ id for id, error in zip(range(10, 20), errors) if error is not None ] == [ 13 ]
+    assert len(mute_db.mdb_fetch_rows(bot, 100, 13)) == 0
+    assert len(mute_db.mdb_fetch_rows(bot, 100, 14)) == 1
+
+    scheduled = [ call.args[1] for call in bot.unbanish_scheduler.schedule.call_args_list ]
+    assert sorted(scheduled) == [ 10, 11, 12, 14, 15, 16, 17, 18, 19 ]
@@ -0,0 +1,69 @@
+"""Unittests for the MuteRoleResolver."""
+
+import logging
+from unittest.mock import MagicMock
+
+from mrfreeze.lib.mute_role_resolver import MuteRoleResolver
+
+import pytest
+
+from tests import helpers
+
+
+@pytest.fixture()
+def guild():
+    """Create a mock guild with a few roles, one of them called Antarctica."""
+    guild = helpers.MockGuild(id=1)
+    guild.roles = [
+        helpers.MockRole(id=10, name="everyone"),
+        helpers.MockRole(id=11, name="Mods"),
+        helpers.MockRole(id=12, name="Antarctica"),
+        helpers.MockRole(id=13, name="Muted"),
+    ]
+    guild.get_role.side_effect = lambda id: next((r for r in guild.roles if r.id == id), None)
+    return guild
+
+
+@pytest.fixture()
+def settings():
+    """Create mock settings where no server has a mute role configured."""
+    settings = MagicMock()
+    settings.get_mute_role.return_value = None
+    return settings
+
+
+def test_default_role_is_found_once(guild, settings):
+    """Test that the antarctica role is found by name, and then looked up by id."""
+    resolver = MuteRoleResolver(settings, logging.getLogger("test"))
+    assert resolver.resolve(guild).id == 12
+
+    # Renaming the roles doesn't matter while the cache is valid.
+    for r in guild.roles:
+        r.name = "something else"
+    assert resolver.resolve(guild).id == 12
+
+
+def test_configured_role_is_preferred(guild, settings):
+    """Test that the configured role is used, and that changing the setting takes effect immediately."""
+    resolver = MuteRoleResolver(settings, logging.getLogger("test"))
+    assert resolver.resolve(guild).id == 12
+
+    settings.get_mute_role.return_value = 13
+    assert resolver.resolve(guild).id == 13
+
+    # A configured role which no longer exists falls back to antarctica.
+    settings.get_mute_role.return_value = 99
+    assert resolver.resolve(guild).id == 12
+
+
+def test_invalidate(guild, settings):
+    """Test that role changes are picked up after the guild is invalidated."""
+    resolver = MuteRoleResolver(settings, logging.getLogger("test"))
+    guild.roles = guild.roles[:2]
+    assert resolver.resolve(guild) is None
+
+    guild.roles.append(helpers.MockRole(id=14, name="antarctica"))
+    assert resolver.resolve(guild) is None
+
+    resolver.invalidate(guild)
+    assert resolver.resolve(guild).id == 14
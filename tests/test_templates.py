@@ -0,0 +1,59 @@
+"""Unittests for the banish TemplateEngine."""
+
+import os
+import shutil
+
+from mrfreeze.lib.banish import templates
+from mrfreeze.lib.banish.templates import MuteCommandType
+from mrfreeze.lib.banish.templates import MuteResponseType
+from mrfreeze.lib.banish.templates import TemplateEngine
+
+import pytest
+
+
+@pytest.fixture()
+def directory(tmp_path):
+    """Copy the template files to a temporary directory."""
+    for file in templates.files:
+        shutil.copy(os.path.join(templates.directory, file), tmp_path / file)
+    return tmp_path
+
+
+def edit(path, old, new):
+    """Replace text in a template file, and make sure it looks modified."""
+    text = path.read_text().replace(old, new)
+    path.write_text(text)
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_index(directory):
+    """Test that every command name maps to its template and command type."""
+    engine = TemplateEngine(directory=str(directory))
+
+    assert engine.get_command_type("mute") == MuteCommandType.MAIN
+    assert engine.get_command_type("unmute") == MuteCommandType.UNDO
+    assert engine.get_command_type("SUPERMUTE") == MuteCommandType.SUPER
+    assert engine.get_command_type("no such command") is None
+    assert engine.get_banish_template("megamute").filename == "mute.toml"
+    assert set(engine.index.keys()) == set(engine.get_aliases())
+
+
+def test_reload_swaps_in_changed_templates(directory):
+    """Test that edited response texts are picked up without creating a new engine."""
+    engine = TemplateEngine(directory=str(directory))
+    assert not engine.reload_if_changed()
+
+    edit(directory / "mute.toml", 'single = "About time!', 'single = "Finally!')
+    assert engine.reload_if_changed()
+    assert engine.get_template("mute", MuteResponseType.SINGLE).template.startswith("Finally!")
+
+
+def test_broken_reload_keeps_old_templates(directory):
+    """Test that a file which can't be parsed leaves the current templates in place."""
+    engine = TemplateEngine(directory=str(directory))
+    old = engine.get_template("mute", MuteResponseType.SINGLE)
+
+    edit(directory / "mute.toml", "[templates]", "[templates")
+    assert not engine.reload_if_changed()
+    assert engine.get_template("mute", MuteResponseType.SINGLE) is old
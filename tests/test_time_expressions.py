@@ -0,0 +1,46 @@
+"""Unittests for absolute times, ISO durations and caching in the time module."""
+
+import datetime
+
+from mrfreeze.lib import time
+
+
+def test_iso_durations():
+    """Test that ISO 8601 durations are understood, alone or mixed with other expressions."""
+    delta, _ = time.extract_time(("PT1H30M",))
+    assert delta == datetime.timedelta(hours=1, minutes=30)
+
+    delta, _ = time.extract_time(("P1Y2M3W4DT5H6M7S",))
+    assert delta == datetime.timedelta(days=365 + 60 + 21 + 4, hours=5, minutes=6, seconds=7)
+
+    delta, _ = time.extract_time(("p1d", "and", "2", "hours"))
+    assert delta == datetime.timedelta(days=1, hours=2)
+
+
+def test_words_starting_with_p_are_not_durations():
+    """Test that only complete ISO durations are picked up."""
+    assert time.extract_time(("P", "PT", "P5", "please"), fallback_minutes=False) == (None, None)
+
+
+def test_until_time_of_day():
+    """Test that "until HH:MM" ends at the next time the clock shows that time."""
+    delta, end_date = time.extract_time(("until", "18:00"))
+    assert end_date.time() == datetime.time(18, 0)
+    assert datetime.timedelta(0) < delta <= datetime.timedelta(days=1)
+
+
+def test_until_takes_precedence_over_durations():
+    """Test that an absolute time wins over durations, and that invalid times are ignored."""
+    _, end_date = time.extract_time(("5", "minutes", "until", "06:30:15"))
+    assert end_date.time() == datetime.time(6, 30, 15)
+
+    delta, _ = time.extract_time(("5", "minutes", "until", "25:00"))
+    assert delta == datetime.timedelta(minutes=5)
+
+
+def test_parse_is_cached():
+    """Test that parsing the same expression twice is answered by the cache."""
+    time.parse_time.cache_clear()
+    time.extract_time(("3", "hours"))
+    time.extract_time(("3", "hours"))
+    assert time.parse_time.cache_info().hits == 1
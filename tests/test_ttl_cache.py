@@ -0,0 +1,50 @@
+"""Unittests for the TTLCache."""
+
+import time
+
+from mrfreeze.lib.ttl_cache import TTLCache
+
+
+def test_get_counts_hits_and_misses():
+    """Test that lookups are counted as hits or misses."""
+    cache = TTLCache()
+    assert cache.get("oxblood") is None
+
+    cache.set("oxblood", "embed", ttl=60)
+    assert cache.get("oxblood").value == "embed"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_none_is_cached():
+    """Test that None can be cached, telling it apart from a miss."""
+    cache = TTLCache()
+    cache.set("no such ink", None, ttl=60)
+
+    entry = cache.get("no such ink")
+    assert entry is not None
+    assert entry.value is None
+
+
+def test_expired_entries_are_misses_but_stale():
+    """Test that expired entries are misses, but can still be read as stale."""
+    cache = TTLCache()
+    cache.set("oxblood", "embed", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("oxblood") is None
+    assert cache.get_stale("oxblood").value == "embed"
+    assert cache.stale_hits == 1
+
+
+def test_least_recently_used_is_dropped():
+    """Test that the least recently used entry is dropped when the cache is full."""
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+
+    assert len(cache) == 2
+    assert cache.get_stale("b") is None
+    assert cache.get("a").value == 1
+    assert cache.get("c").value == 3
@@ -0,0 +1,115 @@
+"""Unittests for unbanishing members whose mutes have expired."""
+
+import asyncio
+import logging
+from unittest.mock import MagicMock
+
+import discord
+
+from mrfreeze.database import mute_codec
+from mrfreeze.lib.banish import unbanish_loop
+from mrfreeze.lib.banish.mute_db import DueMute
+from mrfreeze.lib.member_resolver import MemberResolver
+
+import pytest
+
+
+class FakeMember:
+    """Member whose role removal takes a while, recording how many run at once."""
+
+    def __init__(self, id, roles, running, peak, fail=False):
+        self.id = id
+        self.name = f"member{id}"
+        self.discriminator = "0001"
+        self.mention = f"<@{id}>"
+        self.roles = roles
+        self.running = running
+        self.peak = peak
+        self.fail = fail
+
+    async def remove_roles(self, role):
+        self.running.append(self.id)
+        self.peak.append(len(self.running))
+        await asyncio.sleep(0.01)
+        self.running.remove(self.id)
+        if self.fail:
+            raise Exception("Missing permissions")
+
+
+@pytest.fixture()
+def setup(monkeypatch):
+    """Create a mock bot and server, and record batched database deletes."""
+    mute_role = object()
+    running = list()
+    peak = list()
+    deleted = list()
+    sent = list()
+
+    members = {
+        id: FakeMember(id, [ mute_role ], running, peak, fail=(id == 3))
+        for id in range(1, 9)
+    }
+    members[4].roles = list()
+
+    async def fetch_member(id):
+        if id == 9:
+            raise discord.HTTPException(MagicMock(status=500), "Internal server error")
+        if id == 10:
+            raise discord.NotFound(MagicMock(status=404), "Unknown member")
+        return members[id]
+
+    # Only odd members are in the cache.
+    def get_member(id):
+        return members[id] if id in members and id % 2 else None
+
+    async def send(msg):
+        sent.append(msg)
+
+    async def get_mute_role(server):
+        return mute_role
+
+    async def get_mute_channel(server, silent=False):
+        return MagicMock(send=send)
+
+    async def del_many(bot, server, member_ids, logger, expired_by=None):
+        assert expired_by is not None
+        deleted.append(sorted(member_ids))
+        return True
+
+    bot = MagicMock()
+    bot.get_mute_role = get_mute_role
+    bot.get_mute_channel = get_mute_channel
+    bot.parse_timedelta = lambda delta: ""
+    bot.member_resolver = MemberResolver()
+    server = MagicMock()
+    server.fetch_member = fetch_member
+    server.get_member = get_member
+    monkeypatch.setattr(unbanish_loop.mute_db, "mdb_del_many", del_many)
+
+    return bot, server, peak, deleted, sent
+
+
+def test_unbanish_due_is_concurrent_and_batched(setup):
+    """Test that members are unbanished a few at a time, with one delete and one message."""
+    bot, server, peak, deleted, sent = setup
+    now = mute_codec.now()
+    due = [ DueMute(member_id=id, server_id=1, voluntary=False, until=now) for id in range(1, 11) ]
+
+    failed = asyncio.run(unbanish_loop.unbanish_due(bot, logging.getLogger("test"), server, due, concurrency=3))
+
+    # Member 9 couldn't be fetched and should be retried.
+    assert [ mute.member_id for mute in failed ] == [ 9 ]
+    assert max(peak) == 3
+
+    # Cached members aren't fetched from the API.
+    assert bot.member_resolver.hits == 4
+    assert bot.member_resolver.misses == 6
+
+    # Everyone else is removed from the database in one go, including member 10 who has left.
+    assert deleted == [ [ 1, 2, 3, 4, 5, 6, 7, 8, 10 ] ]
+
+    # Member 3 couldn't have their role removed, member 4 didn't have it.
+    assert len(sent) == 1
+    for id in (1, 2, 5, 6, 7, 8):
+        assert f"<@{id}>" in sent[0]
+    assert "<@3>" not in sent[0] and "<@4>" not in sent[0]
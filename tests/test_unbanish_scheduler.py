@@ -0,0 +1,170 @@
+"""Unittests for the UnbanishScheduler."""
+
+import asyncio
+import logging
+from unittest.mock import MagicMock
+
+from mrfreeze.database import mute_codec
+from mrfreeze.lib.banish import scheduler as scheduler_module
+from mrfreeze.lib.banish.scheduler import UnbanishScheduler
+
+import pytest
+
+
+@pytest.fixture()
+def unbanished(monkeypatch):
+    """Replace unbanish_due with a function recording who was unbanished and when."""
+    calls = list()
+
+    async def fake_unbanish_due(bot, logger, server, due_mutes):
+        calls.append((mute_codec.now(), server.id, [ mute.member_id for mute in due_mutes ]))
+        return list()
+
+    async def no_mutes(bot, now=None):
+        return list()
+
+    monkeypatch.setattr(scheduler_module, "unbanish_due", fake_unbanish_due)
+    monkeypatch.setattr(scheduler_module.mute_db, "mdb_fetch_expiries", no_mutes)
+    monkeypatch.setattr(scheduler_module.mute_db, "mdb_fetch_due", no_mutes)
+    return calls
+
+
+@pytest.fixture()
+def scheduler():
+    """Create a scheduler for a mock bot which is in every server it's asked about."""
+    bot = MagicMock()
+    bot.is_closed.return_value = False
+    bot.get_guild.side_effect = lambda id: MagicMock(id=id)
+    return UnbanishScheduler(bot, logging.getLogger("test"))
+
+
+def test_pop_due_skips_stale_entries(scheduler):
+    """Test that rescheduled and cancelled mutes are only popped at their current deadline."""
+    scheduler.schedule(1, 10, 1000)
+    scheduler.schedule(1, 11, 2000)
+    scheduler.schedule(2, 20, 1500)
+    scheduler.schedule(1, 10, 5000)  # Prolonged
+    scheduler.cancel(2, 20)          # Unbanished
+
+    due = scheduler.pop_due(3000)
+    assert { server: [ m.member_id for m in mutes ] for server, mutes in due.items() } == { 1: [ 11 ] }
+    assert scheduler.next_deadline() == 5000
+
+
+def test_permanent_mute_is_not_scheduled(scheduler):
+    """Test that scheduling a permanent mute removes any earlier deadline."""
+    scheduler.schedule(1, 10, 1000)
+    scheduler.schedule(1, 10, None)
+    assert scheduler.next_deadline() is None
+
+
+def test_run_unbanishes_on_time(scheduler, unbanished):
+    """Test that the scheduler sleeps until the deadline, and wakes up for new mutes."""
+    async def run():
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.05)
+
+        start = mute_codec.now()
+        scheduler.schedule(1, 10, start + 300)
+        scheduler.schedule(2, 20, start + 100)
+        await asyncio.sleep(0.6)
+
+        task.cancel()
+        return start
+
+    start = asyncio.run(run())
+
+    assert [ (server, members) for _, server, members in unbanished ] == [ (2, [ 20 ]), (1, [ 10 ]) ]
+    assert 100 <= unbanished[0][0] - start < 250
+    assert 300 <= unbanished[1][0] - start < 450
+
+
+def test_failed_unbanish_is_retried(scheduler, monkeypatch):
+    """Test that mutes which couldn't be carried out are scheduled again."""
+    async def failing_unbanish_due(bot, logger, server, due_mutes):
+        return due_mutes
+
+    monkeypatch.setattr(scheduler_module, "unbanish_due", failing_unbanish_due)
+    scheduler.bot.settings.get_mute_interval.return_value = 30
+
+    scheduler.schedule(1, 10, 1000)
+    due = scheduler.pop_due(1000)
+    asyncio.run(scheduler.unbanish_server(1, due[1]))
+
+    retry_at = scheduler.next_deadline()
+    assert abs(retry_at - (mute_codec.now() + 30_000)) < 1000
+
+
+def test_missing_server_is_retried_with_backoff(scheduler):
+    """Test that mutes in servers the bot can't see are retried less and less often."""
+    scheduler.bot.get_guild.side_effect = lambda id: None
+    scheduler.max_sleep = 200
+
+    retries = list()
+    for _ in range(4):
+        scheduler.schedule(1, 10, 1000)
+        due = scheduler.pop_due(1000)
+        asyncio.run(scheduler.unbanish_server(1, due[1]))
+        retries.append(round((scheduler.next_deadline() - mute_codec.now()) / 1000))
+
+    assert retries == [ 60, 120, 200, 200 ]
+
+
+def test_run_retries_failed_startup(scheduler, unbanished, monkeypatch):
+    """Test that the scheduler keeps going if the mutes can't be loaded at first."""
+    attempts = list()
+
+    async def flaky_fetch_due(bot, now=None):
+        attempts.append(now)
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+        return list()
+
+    monkeypatch.setattr(scheduler_module.mute_db, "mdb_fetch_due", flaky_fetch_due)
+    scheduler.default_retry_interval = 0
+
+    async def run():
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.05)
+        scheduler.schedule(1, 10, mute_codec.now() + 50)
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(attempts) == 2
+    assert [ (server, members) for _, server, members in unbanished ] == [ (1, [ 10 ]) ]
+
+
+def test_catch_up_handles_overdue_mutes_with_bounded_concurrency(scheduler, monkeypatch, caplog):
+    """Test that overdue mutes are handled at startup, a limited number of servers at a time."""
+    now = mute_codec.now()
+    overdue = [
+        scheduler_module.mute_db.DueMute(member_id=server * 10, server_id=server, voluntary=False, until=now - 60_000)
+        for server in range(10)
+    ]
+    running = list()
+    peak = list()
+
+    async def fetch_due(bot, now=None):
+        return overdue
+
+    async def slow_unbanish_due(bot, logger, server, due_mutes):
+        running.append(server.id)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(server.id)
+        return due_mutes if server.id == 0 else list()
+
+    monkeypatch.setattr(scheduler_module.mute_db, "mdb_fetch_due", fetch_due)
+    monkeypatch.setattr(scheduler_module, "unbanish_due", slow_unbanish_due)
+    scheduler.catch_up_concurrency = 3
+    scheduler.bot.parse_timedelta = str
+    scheduler.bot.settings.get_mute_interval.return_value = None
+
+    with caplog.at_level(logging.INFO):
+        asyncio.run(scheduler.catch_up())
+
+    assert max(peak) == 3
+    assert len(peak) == 10
+    assert list(scheduler.deadlines.keys()) == [ (0, 0) ]
+    assert "caught up on 10 overdue mutes in 10 servers, 1 to be retried" in caplog.text